@@ -7,7 +7,9 @@ from app.config.pipeline import (
     OPENAI_IMAGE_MODEL,
     OPENAI_IMAGE_QUALITY,
 )
-from app.runner import RunConfig, run_pipeline
+from app.gpt_planner import PLAN_MODES
+from app.render_pool import RENDER_BACKENDS
+from app.runner import ENGINES, RunConfig, run_pipeline
 
 
 def parse_args() -> argparse.Namespace:
@@ -36,12 +38,64 @@ def parse_args() -> argparse.Namespace:
         help="Numero unico de workers (nucleos e imagens).",
     )
     ap.add_argument("--force", action="store_true")
+    ap.add_argument(
+        "--engine",
+        choices=list(ENGINES),
+        default="threads",
+        help=(
+            "Executor dos nucleos: threads (um por nucleo), async (event loop "
+            "unico) ou stages (DAG de etapas com pools separados)."
+        ),
+    )
+    ap.add_argument(
+        "--render-backend",
+        choices=list(RENDER_BACKENDS),
+        default="threads",
+        help=(
+            "Onde renderizar os PPTX: threads (mesmo processo) ou processes "
+            "(pool de processos com o template pre-carregado)."
+        ),
+    )
+    ap.add_argument(
+        "--plan-mode",
+        choices=list(PLAN_MODES),
+        default="files",
+        help=(
+            "Como o LLM recebe os DOCX: files (upload + code_interpreter), "
+            "inline (texto extraido no input, sem container) ou auto (inline "
+            "ate PLAN_INLINE_MAX_TOKENS, files acima)."
+        ),
+    )
+    ap.add_argument(
+        "--stream-plan",
+        action="store_true",
+        help=(
+            "Receber o plano em streaming e gerar as imagens de cada slide "
+            "assim que ele fica completo (sobrepoe LLM e imagens)."
+        ),
+    )
+    ap.add_argument(
+        "--fused-split",
+        action="store_true",
+        help=(
+            "Gerar os DOCX tagueados e os assets no mesmo passe do split "
+            "(um unico parse do DOCX do curso)."
+        ),
+    )
     ap.add_argument(
         "--image-provider",
         choices=["gamma", "openai"],
         default="openai",
         help="Provedor de imagens: gamma ou openai.",
     )
+    ap.add_argument(
+        "--gamma-batch",
+        action="store_true",
+        help=(
+            "Com --image-provider gamma, juntar os cards de varios nucleos "
+            "nas mesmas geracoes (menos chamadas e esperas no Gamma)."
+        ),
+    )
     ap.add_argument(
         "--image-model",
         choices=["gpt-image-1-mini", "gpt-image-1.5"],
@@ -87,6 +141,12 @@ def main() -> None:
         reuse_assets=args.reuse_assets,
         verbose=args.verbose,
         openai_api_key=None,
+        engine=args.engine,
+        render_backend=args.render_backend,
+        fused_split=args.fused_split,
+        plan_mode=args.plan_mode,
+        stream_plan=args.stream_plan,
+        gamma_batch=args.gamma_batch,
     )
     run_pipeline(config=config)
 
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+
+class AssetStore:
+    """
+    Store de mídias do curso endereçado por conteúdo (SHA-256).
+
+    Cada blob é gravado uma única vez em <root>/<sha[:2]>/<sha><ext>; os
+    caminhos por núcleo (assets/<núcleo>/img_0001.png...) são hardlinks para
+    ele, ou cópias quando o sistema de arquivos não suporta hardlink.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def put(self, blob: bytes, ext: str) -> Path:
+        """Grava o blob (se ainda não existir) e retorna o caminho no store."""
+        digest = hashlib.sha256(blob).hexdigest()
+        path = self.root / digest[:2] / f"{digest}{ext}"
+        if path.exists():
+            return path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(blob)
+        os.replace(tmp, path)
+        return path
+
+    def link(self, stored: Path, dest: Path) -> None:
+        """Materializa `stored` em `dest` (hardlink; cópia como fallback)."""
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if dest.exists():
+            if os.path.samefile(stored, dest):
+                return
+            dest.unlink()
+        try:
+            os.link(stored, dest)
+        except OSError:
+            shutil.copyfile(stored, dest)
+
+    def materialize(self, blob: bytes, dest: Path) -> Path:
+        """put + link: grava dest apontando para o conteúdo deduplicado."""
+        stored = self.put(blob, dest.suffix)
+        self.link(stored, dest)
+        return stored
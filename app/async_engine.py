@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+from openai import AsyncOpenAI
+
+from app.config.paths import ASSETS_DIRNAME
+from app.config.pipeline import (
+    ASYNC_CPU_CONCURRENCY,
+    ASYNC_GAMMA_CONCURRENCY,
+    ASYNC_IMAGE_CONCURRENCY,
+    ASYNC_PLAN_CONCURRENCY,
+)
+from app.gamma.batcher import GammaBatcher
+from app.gpt_planner import agenerate_plan_for_dir
+from app.image_generator import (
+    AsyncImagePrefetcher,
+    amaterialize_generated_images_for_plan,
+)
+from app.logging_utils import log_step
+from app.openai_clients import create_async_openai_client
+from app.render_pool import RenderPool
+from app.nucleus_processor import (
+    NucleusJob,
+    accept_plan,
+    streamed_slide_handler,
+    images_up_to_date,
+    log_openai_images,
+    prepare_nucleus,
+    render_nucleus,
+    save_plan,
+    submit_gamma_images,
+)
+
+log = logging.getLogger(__name__)
+
+
+class _NotStarted(Exception):
+    """Cancelamento pedido antes de o núcleo começar (ver process_nucleus_async)."""
+
+
+@dataclass
+class ProviderSemaphores:
+    """Limites de concorrência por provedor, compartilhados por todos os núcleos."""
+
+    plan: asyncio.Semaphore
+    images: asyncio.Semaphore
+    gamma: asyncio.Semaphore
+    cpu: asyncio.Semaphore
+
+    @classmethod
+    def create(
+        cls,
+        *,
+        plan: int = ASYNC_PLAN_CONCURRENCY,
+        images: int = ASYNC_IMAGE_CONCURRENCY,
+        gamma: int = ASYNC_GAMMA_CONCURRENCY,
+        cpu: int = ASYNC_CPU_CONCURRENCY,
+    ) -> "ProviderSemaphores":
+        return cls(
+            plan=asyncio.Semaphore(max(1, plan)),
+            images=asyncio.Semaphore(max(1, images)),
+            gamma=asyncio.Semaphore(max(1, gamma)),
+            cpu=asyncio.Semaphore(max(1, cpu)),
+        )
+
+
+async def process_nucleus_async(
+    client: AsyncOpenAI,
+    semaphores: ProviderSemaphores,
+    *,
+    nucleus_dir: Path,
+    course_dir: Path,
+    prompt_md: str,
+    model: str,
+    image_model: str,
+    image_size: str,
+    image_quality: str | None,
+    template_path: Path,
+    force: bool,
+    generate_images: bool = True,
+    image_provider: str = "openai",
+    render_pool: RenderPool | None = None,
+    tagged_in_split: bool = False,
+    plan_mode: str = "files",
+    stream_plan: bool = False,
+    gamma_batcher: GammaBatcher | None = None,
+    cancelled: Callable[[], bool] | None = None,
+) -> NucleusJob | None:
+    """
+    Equivalente assíncrono de process_nucleus_dir (tag -> JSON -> imagens -> render).
+
+    `cancelled` é consultado depois de obter o primeiro semáforo, isto é, no
+    momento em que o núcleo de fato começaria; se for True, nada é feito.
+    """
+    async with semaphores.cpu:
+        if cancelled is not None and cancelled():
+            raise _NotStarted
+        job = await asyncio.to_thread(
+            prepare_nucleus, nucleus_dir, course_dir, force, tagged_in_split
+        )
+    if job is None:
+        return None
+
+    prefetcher = None
+    if stream_plan and generate_images and image_provider == "openai":
+        prefetcher = AsyncImagePrefetcher(
+            client=client,
+            semaphore=semaphores.images,
+            course_dir=job.course_dir,
+            nucleus_name=job.name,
+            assets_dirname=ASSETS_DIRNAME,
+            model=image_model,
+            size=image_size,
+            quality=image_quality,
+        )
+    try:
+        async with semaphores.plan:
+            plan = await agenerate_plan_for_dir(
+                client,
+                content_docx=job.tagged_docx,
+                roteiro_docx=job.roteiro_docx,
+                prompt_md=prompt_md,
+                model=model,
+                output_json=job.plan_json,
+                force=force,
+                plan_mode=plan_mode,
+                on_slide=streamed_slide_handler(job, prefetcher) if prefetcher else None,
+            )
+    finally:
+        if prefetcher is not None:
+            await prefetcher.wait()
+    if not accept_plan(job, plan):
+        return job
+
+    if not images_up_to_date(
+        job,
+        image_provider=image_provider,
+        image_model=image_model,
+        image_size=image_size,
+        image_quality=image_quality,
+        generate_images=generate_images,
+    ):
+        await _materialize_images_async(
+            client,
+            semaphores,
+            job,
+            image_model=image_model,
+            image_size=image_size,
+            image_quality=image_quality,
+            generate_images=generate_images,
+            image_provider=image_provider,
+            gamma_batcher=gamma_batcher,
+        )
+
+    async with semaphores.cpu:
+        await asyncio.to_thread(render_nucleus, job, template_path, render_pool)
+    return job
+
+
+async def _materialize_images_async(
+    client: AsyncOpenAI,
+    semaphores: ProviderSemaphores,
+    job: NucleusJob,
+    *,
+    image_model: str,
+    image_size: str,
+    image_quality: str | None,
+    generate_images: bool,
+    image_provider: str,
+    gamma_batcher: GammaBatcher | None = None,
+) -> None:
+    log_step(
+        log,
+        job.name,
+        "materialize_generated_images_for_plan",
+        "Gerando imagens",
+    )
+    if image_provider == "gamma":
+        async with semaphores.gamma:
+            submitted = await asyncio.to_thread(
+                submit_gamma_images,
+                job,
+                generate_images=generate_images,
+                gamma_batcher=gamma_batcher,
+            )
+        await asyncio.wrap_future(submitted)
+
+    created_openai = await amaterialize_generated_images_for_plan(
+        job.plan,
+        client=client,
+        semaphore=semaphores.images,
+        course_dir=job.course_dir,
+        nucleus_name=job.name,
+        assets_dirname=ASSETS_DIRNAME,
+        model=image_model,
+        size=image_size,
+        quality=image_quality,
+        generate_images=generate_images,
+    )
+    log_openai_images(job, created_openai, generate_images)
+    save_plan(job)
+
+
+async def run_nuclei_async(
+    nuclei: list[Path],
+    *,
+    api_key_override: str | None,
+    nucleus_kwargs: dict[str, Any],
+    progress_cb: Callable[[int, int, str], None] | None = None,
+    log_cb: Callable[[str], None] | None = None,
+    cancel_event=None,
+) -> None:
+    """
+    Processa todos os núcleos como corrotinas num único event loop.
+
+    Mantém o contrato do executor por threads: progress_cb é chamado a cada
+    núcleo concluído e cancel_event impede o início de novos núcleos.
+    """
+
+    def _log(msg: str) -> None:
+        if log_cb:
+            log_cb(msg)
+
+    semaphores = ProviderSemaphores.create()
+    total = len(nuclei)
+    completed = 0
+    cancel_logged = False
+
+    def _cancelled() -> bool:
+        nonlocal cancel_logged
+        if cancel_event is None or not cancel_event.is_set():
+            return False
+        if not cancel_logged:
+            cancel_logged = True
+            _log("Cancelamento solicitado. Parando envio de novos núcleos.")
+        return True
+
+    async def _run_one(entry: Path) -> tuple[str, bool]:
+        try:
+            await process_nucleus_async(
+                client,
+                semaphores,
+                nucleus_dir=entry,
+                cancelled=_cancelled,
+                **nucleus_kwargs,
+            )
+        except _NotStarted:
+            return entry.name, False
+        except Exception:
+            log.exception("[%s] Falha no processamento", entry.name)
+            _log(f"[{entry.name}] falha no processamento")
+            raise
+        return entry.name, True
+
+    async with create_async_openai_client(api_key_override) as client:
+        tasks = [asyncio.create_task(_run_one(entry)) for entry in nuclei]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                name, processed = await next_done
+                if not processed:
+                    continue
+                _log(f"[{name}] concluído")
+                completed += 1
+                if progress_cb:
+                    progress_cb(completed, total, name)
+
+                if cancel_event is not None and cancel_event.is_set():
+                    _log("Cancelamento solicitado. Aguardando tarefas em andamento.")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
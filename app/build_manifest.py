@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterable
+
+from app.config.paths import BUILD_MANIFEST_NAME
+from app.hashing import combine_fingerprints, sha256_file
+
+log = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+def _file_state(path: Path, previous: dict[str, Any] | None = None) -> dict[str, Any]:
+    """
+    Hash + tamanho/mtime de um arquivo de saída.
+
+    Se tamanho e mtime não mudaram desde o registro anterior, o hash é
+    reaproveitado sem reler o arquivo.
+    """
+    stat = path.stat()
+    if (
+        previous
+        and previous.get("size") == stat.st_size
+        and previous.get("mtime_ns") == stat.st_mtime_ns
+        and previous.get("sha256")
+    ):
+        return previous
+    return {
+        "sha256": sha256_file(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+class BuildManifest:
+    """
+    Manifesto de build de um núcleo (build_manifest.json, ao lado do plano).
+
+    Para cada etapa guarda o fingerprint das entradas e o hash das saídas. Uma
+    etapa está atualizada quando as entradas são as mesmas do último build e as
+    saídas continuam no disco sem alteração; do contrário ela (e, pelo
+    encadeamento dos fingerprints, as etapas seguintes) é refeita.
+
+    O arquivo é relido a cada operação: etapas diferentes do mesmo núcleo podem
+    usar instâncias diferentes.
+    """
+
+    _locks: dict[Path, threading.Lock] = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, nucleus_dir: Path) -> None:
+        self.path = nucleus_dir / BUILD_MANIFEST_NAME
+        with self._locks_guard:
+            self._lock = self._locks.setdefault(self.path.resolve(), threading.Lock())
+
+    def _load(self) -> dict[str, Any]:
+        if not self.path.exists():
+            return {"version": MANIFEST_VERSION, "stages": {}}
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            log.warning(f"[build_manifest] Manifesto ilegivel, recriando: {self.path}")
+            data = {}
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return {"version": MANIFEST_VERSION, "stages": {}}
+        data.setdefault("stages", {})
+        return data
+
+    def _save(self, data: dict[str, Any]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def stage(self, name: str) -> dict[str, Any] | None:
+        with self._lock:
+            return self._load()["stages"].get(name)
+
+    def inputs(self, name: str) -> str | None:
+        entry = self.stage(name)
+        return entry.get("inputs") if entry else None
+
+    def outputs_fingerprint(self, name: str) -> str | None:
+        """Fingerprint combinado das saídas da etapa (entrada das seguintes)."""
+        entry = self.stage(name)
+        if not entry:
+            return None
+        outputs = entry.get("outputs") or {}
+        return combine_fingerprints(
+            *(f"{key}={outputs[key].get('sha256')}" for key in sorted(outputs))
+        )
+
+    def up_to_date(
+        self,
+        name: str,
+        inputs: str,
+        outputs: Iterable[Path],
+        *,
+        adopt_existing: bool = False,
+    ) -> bool:
+        """
+        Indica se a etapa pode ser pulada.
+
+        adopt_existing: sem registro da etapa mas com todas as saídas no disco
+        (builds anteriores ao manifesto), registra o estado atual e pula.
+        """
+        outputs = list(outputs)
+        with self._lock:
+            data = self._load()
+            entry = data["stages"].get(name)
+            if entry is None:
+                if not adopt_existing or not outputs or not all(p.exists() for p in outputs):
+                    return False
+                self._record(data, name, inputs, outputs)
+                return True
+
+            if entry.get("inputs") != inputs:
+                return False
+            recorded = entry.get("outputs") or {}
+            if set(recorded) != {self._key(p) for p in outputs}:
+                return False
+            for path in outputs:
+                previous = recorded[self._key(path)]
+                if not path.exists():
+                    return False
+                if _file_state(path, previous)["sha256"] != previous.get("sha256"):
+                    return False
+            return True
+
+    def record(self, name: str, inputs: str, outputs: Iterable[Path] = ()) -> None:
+        """Registra entradas e saídas da etapa recém-executada."""
+        with self._lock:
+            self._record(self._load(), name, inputs, list(outputs))
+
+    def _key(self, path: Path) -> str:
+        # Relativo ao núcleo (assets ficam em ../assets/<núcleo>/...).
+        return Path(os.path.relpath(path.resolve(), self.path.parent.resolve())).as_posix()
+
+    def _record(
+        self, data: dict[str, Any], name: str, inputs: str, outputs: list[Path]
+    ) -> None:
+        previous = (data["stages"].get(name) or {}).get("outputs") or {}
+        data["stages"][name] = {
+            "inputs": inputs,
+            "outputs": {
+                self._key(p): _file_state(p, previous.get(self._key(p)))
+                for p in outputs
+                if p.exists()
+            },
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        self._save(data)
@@ -10,12 +10,25 @@ TEMPLATE_CATALOG = {
 }
 TEMPLATE_PPTX = TEMPLATE_CATALOG["graduacao"]
 USER_INPUT_SLIDES = "prompts/user_input_slides.j2"
+USER_INPUT_SLIDES_INLINE = "prompts/user_input_slides_inline.j2"
 USER_INPUT_IMAGE = "prompts/user_input_imagem.j2"
 OPENAI_KEY_PATH = "prompts/openai_api_key"
 
 ASSETS_DIRNAME = "assets"
+ASSET_STORE_DIRNAME = ".store"
+GAMMA_BATCH_DIRNAME = ".gamma"
 ROTEIROS_DIRNAME = "roteiros"
 PLAN_JSON_NAME = "slides_plan.json"
+BUILD_MANIFEST_NAME = "build_manifest.json"
+PLAN_SCHEMA = "prompts/schemas/slide_plan_v1.json"
+
+CACHE_DIR = PROJECT_ROOT / ".cache"
+UPLOAD_LEDGER_PATH = CACHE_DIR / "openai_uploads.json"
+PLAN_CACHE_DIR = CACHE_DIR / "plans"
+IMAGE_CACHE_DIR = CACHE_DIR / "images"
+FITTED_IMAGE_CACHE_DIR = CACHE_DIR / "fitted"
+GAMMA_CACHE_DIR = CACHE_DIR / "gamma"
+GAMMA_LEDGER_PATH = CACHE_DIR / "gamma_generations.sqlite3"
 
 if __name__ == "__main__":
     print(
@@ -25,8 +38,16 @@ if __name__ == "__main__":
         TEMPLATE_CATALOG,
         TEMPLATE_PPTX,
         USER_INPUT_SLIDES,
+        USER_INPUT_SLIDES_INLINE,
         USER_INPUT_IMAGE,
         ASSETS_DIRNAME,
+        ASSET_STORE_DIRNAME,
         ROTEIROS_DIRNAME,
         PLAN_JSON_NAME,
+        BUILD_MANIFEST_NAME,
+        CACHE_DIR,
+        UPLOAD_LEDGER_PATH,
+        PLAN_CACHE_DIR,
+        IMAGE_CACHE_DIR,
+        FITTED_IMAGE_CACHE_DIR,
     )
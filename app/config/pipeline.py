@@ -7,12 +7,72 @@ _CPU = os.cpu_count() or 1
 _WORKERS_70P = max(1, int(_CPU * 0.7))
 NUCLEUS_WORKERS = _WORKERS_70P
 IMAGE_WORKERS = _WORKERS_70P
+ASYNC_PLAN_CONCURRENCY = 32
+ASYNC_IMAGE_CONCURRENCY = 16
+ASYNC_GAMMA_CONCURRENCY = 8
+ASYNC_CPU_CONCURRENCY = _WORKERS_70P
+STAGE_DOCX_WORKERS = _WORKERS_70P
+SPLIT_WORKERS = _WORKERS_70P
+STAGE_PLAN_WORKERS = _WORKERS_70P
+STAGE_GAMMA_WORKERS = 4
+STAGE_IMAGE_WORKERS = _WORKERS_70P
+STAGE_RENDER_WORKERS = _WORKERS_70P
+RENDER_PROCESS_WORKERS = _CPU
+# Modo de plano "auto": texto no input até este tamanho (conteúdo + roteiro);
+# acima disso, upload dos DOCX + code_interpreter.
+PLAN_INLINE_MAX_TOKENS = 100_000
 OPENAI_IMAGE_MODEL = "gpt-image-1.5"
 OPENAI_IMAGE_SIZE = "1024x1536"
 OPENAI_IMAGE_QUALITY = "low"
+# Imagens no PPTX: redimensionadas para a caixa do placeholder nesta resolução.
+RENDER_IMAGE_DPI = 150
+RENDER_IMAGE_JPEG_QUALITY = 85
 GAMMA_POLL_INTERVAL_SECONDS = 15
 GAMMA_POLL_TIMEOUT_SECONDS = 600
+# Consultas de status em lote (um poller por processo para todos os núcleos).
+GAMMA_POLL_WORKERS = 4
+# Download do export em streaming (retomado via Range após quedas de conexão).
+GAMMA_DOWNLOAD_CHUNK_BYTES = 64 * 1024
+GAMMA_DOWNLOAD_ATTEMPTS = 3
+# Modo em lote (--gamma-batch): cards de vários núcleos numa mesma geração,
+# respeitando o limite de cards/caracteres por geração do Gamma.
+GAMMA_BATCH_MAX_CARDS = 60
+GAMMA_BATCH_MAX_CHARS = 100_000
+GAMMA_BATCH_LINGER_SECONDS = 20.0
+# Gerações pendentes no ledger são retomadas (sem reenviar) até esta idade.
+GAMMA_LEDGER_RESUME_HOURS = 24
 GAMMA_COST_BRL_PER_CREDIT = 2.0
+# Engine de geração do pipeline de cards: envios simultâneos, uma sessão HTTP
+# e consulta adaptativa por generationId (mais espaçada nos jobs lentos, mais
+# frequente perto do tempo esperado de conclusão).
+GAMMA_SUBMIT_WORKERS = 4
+GAMMA_HTTP_POOL_SIZE = 8
+GAMMA_EXPECTED_SECONDS = 60.0
+GAMMA_STATUS_MIN_INTERVAL_SECONDS = 2.0
+GAMMA_STATUS_MAX_INTERVAL_SECONDS = 30.0
+OPENAI_UPLOAD_TTL_SECONDS = 7 * 24 * 60 * 60
+OPENAI_HTTP_MAX_CONNECTIONS = 100
+OPENAI_HTTP_MAX_KEEPALIVE = 40
+OPENAI_HTTP_KEEPALIVE_SECONDS = 60.0
+
+# Limites por processo (rpm = requisições/min, tpm = tokens/min). A chave
+# "provedor:modelo" tem precedência sobre "provedor". Os valores são o ponto de
+# partida; os headers x-ratelimit-* das respostas ajustam os baldes em tempo real.
+RATE_LIMITS: dict[str, dict[str, float]] = {
+    "openai": {"rpm": 500, "tpm": 500_000},
+    "openai:files": {"rpm": 300},
+    "openai:gpt-image-1.5": {"rpm": 50},
+    "openai:gpt-image-1-mini": {"rpm": 100},
+    "gamma": {"rpm": 50},
+}
+
+# Retentativas (app/retry.py): só falhas passageiras, com decorrelated jitter
+# e um orçamento de retentativas por provedor a cada execução.
+RETRY_MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY_SECONDS = 1.0
+RETRY_MAX_DELAY_SECONDS = 30.0
+RETRY_BUDGETS: dict[str, int] = {"openai": 100, "gamma": 50}
+RETRY_DEFAULT_BUDGET = 50
 
 EXCLUDE_DIRS = {
     "app",
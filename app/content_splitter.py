@@ -1,21 +1,61 @@
 from __future__ import annotations
 
+import copy
 import logging
+import posixpath
 import re
-import shutil
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Iterable
 
 from docx import Document
 from docx.document import Document as DocxDocument
+from docx.oxml.ns import qn
 from docx.table import Table
 from docx.text.paragraph import Paragraph
+from lxml import etree
+
+from app.asset_store import AssetStore
+from app.build_manifest import BuildManifest
+from app.config.paths import ASSET_STORE_DIRNAME, ASSETS_DIRNAME
+from app.config.pipeline import SPLIT_WORKERS
+from app.docx_tagger import iter_paragraph_elements, referenced_rel_ids, tag_image_runs
+from app.hashing import combine_fingerprints, members_sha256, package_sha256
 
 
 log = logging.getLogger(__name__)
 
 HEADING_MODULE = "Heading 1"
 HEADING_NUCLEUS = "Heading 2"
+VIDINT_NAME = "mod0_vidint"
+
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+NS_CT = "http://schemas.openxmlformats.org/package/2006/content-types"
+CONTENT_TYPES = "[Content_Types].xml"
+ROOT_RELS = "_rels/.rels"
+
+# Relacionamentos que pertencem a blocos do corpo: só ficam no núcleo se algum
+# bloco do segmento os referencia. Os demais (styles, numbering, header...)
+# são do documento e sempre ficam.
+BLOCK_SCOPED_RELS = {
+    "image",
+    "hyperlink",
+    "oleObject",
+    "package",
+    "chart",
+    "diagramData",
+    "diagramLayout",
+    "diagramQuickStyle",
+    "diagramColors",
+    "diagramDrawing",
+    "video",
+    "audio",
+    "media",
+    "hdphoto",
+    "control",
+}
 
 
 def iter_block_items(doc: DocxDocument) -> Iterable[Paragraph | Table]:
@@ -43,34 +83,31 @@ def extract_first_int(text: str) -> int | None:
     return int(match.group(0)) if match else None
 
 
-def clear_headers_footers(doc: DocxDocument) -> None:
-    """Remove conteúdo de cabeçalho e rodapé."""
-    for section in doc.sections:
-        for part in (section.header, section.footer):
-            for paragraph in list(part.paragraphs):
-                paragraph._element.getparent().remove(paragraph._element)
-            for table in list(part.tables):
-                table._element.getparent().remove(table._element)
+@dataclass(frozen=True)
+class Segment:
+    """Trecho do corpo [start, end) (contando só parágrafos/tabelas) de um núcleo."""
+
+    name: str
+    start: int
+    end: int
 
 
-def split_docx_to_nuclei(docx_path: Path, output_root: Path, force: bool) -> list[Path]:
-    """Divide um DOCX em núcleos conforme Heading 1/2."""
-    doc = Document(str(docx_path))
+def find_segments(doc: DocxDocument) -> list[Segment]:
+    """Localiza os núcleos do curso conforme Heading 1/2."""
     blocks = list(iter_block_items(doc))
     module_idx = 0
     nucleus_counts = {"c": 0, "p": 0}
-    output_docs: list[Path] = []
 
     current_start: int | None = None
     current_meta: tuple[int, str, int] | None = None
-    segments: list[tuple[int, int, int, str, int]] = []
+    segments: list[Segment] = []
 
     def finalize(end_idx: int) -> None:
         nonlocal current_start, current_meta
         if current_start is None or current_meta is None:
             return
         mod, kind, number = current_meta
-        segments.append((current_start, end_idx, mod, kind, number))
+        segments.append(Segment(f"mod{mod}_n{kind}{number}", current_start, end_idx))
         current_start = None
         current_meta = None
 
@@ -104,38 +141,305 @@ def split_docx_to_nuclei(docx_path: Path, output_root: Path, force: bool) -> lis
             current_meta = (module_idx, kind, number)
 
     finalize(len(blocks))
+    return segments
 
-    if not segments:
-        return output_docs
 
-    for start, end, mod, kind, number in segments:
-        nucleus_name = f"mod{mod}_n{kind}{number}"
-        nucleus_dir = output_root / nucleus_name
-        nucleus_dir.mkdir(parents=True, exist_ok=True)
-        docx_out = nucleus_dir / f"{nucleus_name}.docx"
+def _is_block(element) -> bool:
+    tag = element.tag
+    return isinstance(tag, str) and (tag.endswith("}p") or tag.endswith("}tbl"))
+
+
+def _rels_name(partname: str) -> str:
+    directory, basename = posixpath.split(partname)
+    return posixpath.join(directory, "_rels", f"{basename}.rels")
+
+
+def _rels_source(rels_name: str) -> str:
+    """Parte de origem de um .rels ("" para o _rels/.rels do pacote)."""
+    directory, basename = posixpath.split(rels_name)
+    return posixpath.join(posixpath.dirname(directory), basename[: -len(".rels")])
 
-        if docx_out.exists() and not force:
-            log.info(f"[splitter] Mantendo existente: {docx_out.name}")
-            continue
 
-        shutil.copyfile(docx_path, docx_out)
-        out_doc = Document(str(docx_out))
-        clear_headers_footers(out_doc)
+def _resolve_target(source: str, target: str) -> str:
+    if target.startswith("/"):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(source), target))
 
-        out_blocks = list(iter_block_items(out_doc))
-        for idx in range(len(out_blocks) - 1, -1, -1):
-            if idx < start or idx >= end:
-                blk = out_blocks[idx]
-                blk._element.getparent().remove(blk._element)
 
-        out_doc.save(str(docx_out))
-        output_docs.append(docx_out)
+def _xml_bytes(element) -> bytes:
+    return etree.tostring(element, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+
+def _internal_targets(source: str, rels: Iterable) -> list[str]:
+    return [
+        _resolve_target(source, rel.get("Target", ""))
+        for rel in rels
+        if rel.get("TargetMode") != "External"
+    ]
+
+
+class CoursePackage:
+    """
+    DOCX do curso lido uma única vez.
+
+    Cada núcleo é montado direto no nível do pacote: document.xml só com os
+    blocos do segmento, cabeçalho/rodapé vazios e apenas as partes (mídias,
+    gráficos...) alcançáveis a partir do que sobrou.
+    """
+
+    def __init__(self, docx_path: Path) -> None:
+        self.docx_path = docx_path
+        with zipfile.ZipFile(docx_path) as zf:
+            self.names = zf.namelist()
+            self.parts = {name: zf.read(name) for name in self.names}
+
+        self.doc = Document(str(docx_path))
+        self.document_part = self.doc.part.partname.lstrip("/")
+        self.document_rels_part = _rels_name(self.document_part)
+        self.document_rels = list(etree.fromstring(self.parts[self.document_rels_part]))
+        self.content_types = etree.fromstring(self.parts[CONTENT_TYPES])
+
+        self._rels_targets: dict[str, list[str]] = {}
+        for name in self.names:
+            if name.endswith(".rels") and name != self.document_rels_part:
+                source = _rels_source(name)
+                self._rels_targets[source] = _internal_targets(
+                    source, etree.fromstring(self.parts[name])
+                )
+
+        self._cleared = self._clear_headers_footers()
+
+    def _clear_headers_footers(self) -> dict[str, bytes]:
+        """
+        Versões vazias (sem parágrafos/tabelas) das partes de cabeçalho e rodapé.
+
+        Os relacionamentos de bloco (imagens, links...) que só o conteúdo
+        removido usava saem também do .rels da parte, e as mídias deixam de ser
+        alcançáveis e ficam fora do pacote.
+        """
+        cleared: dict[str, bytes] = {}
+        for rel in self.document_rels:
+            kind = rel.get("Type", "").rsplit("/", 1)[-1]
+            if kind not in ("header", "footer") or rel.get("TargetMode") == "External":
+                continue
+            partname = _resolve_target(self.document_part, rel.get("Target", ""))
+            root = etree.fromstring(self.parts[partname])
+            for child in list(root):
+                if _is_block(child):
+                    root.remove(child)
+            cleared[partname] = _xml_bytes(root)
+
+            rels_name = _rels_name(partname)
+            if rels_name not in self.parts:
+                continue
+            referenced = referenced_rel_ids(root)
+            rels_root = etree.fromstring(self.parts[rels_name])
+            for part_rel in list(rels_root):
+                part_kind = part_rel.get("Type", "").rsplit("/", 1)[-1]
+                if part_kind in BLOCK_SCOPED_RELS and part_rel.get("Id") not in referenced:
+                    rels_root.remove(part_rel)
+            cleared[rels_name] = _xml_bytes(rels_root)
+            self._rels_targets[partname] = _internal_targets(partname, rels_root)
+        return cleared
+
+    def segments(self) -> list[Segment]:
+        return find_segments(self.doc)
+
+    def segment_root(self, start: int = 0, end: int | None = None):
+        """Cópia de document.xml com os blocos [start, end) do corpo (end=None: até o fim)."""
+        source_root = self.doc.element
+        root = etree.Element(source_root.tag, attrib=source_root.attrib, nsmap=source_root.nsmap)
+        block_idx = 0
+        for child in source_root:
+            if child is not source_root.body:
+                root.append(copy.deepcopy(child))
+                continue
+            body = etree.SubElement(root, child.tag, attrib=child.attrib)
+            for element in child:
+                if _is_block(element):
+                    keep = block_idx >= start and (end is None or block_idx < end)
+                    block_idx += 1
+                    if not keep:
+                        continue
+                body.append(copy.deepcopy(element))
+        return root
+
+    def build(self, start: int = 0, end: int | None = None) -> list[tuple[str, bytes]]:
+        """Monta o pacote do núcleo com os blocos [start, end) do corpo."""
+        return self.assemble(self.segment_root(start, end))
+
+    def build_tagged(
+        self, root, assets_dir: Path, tag_prefix: str, store: AssetStore
+    ) -> tuple[list[tuple[str, bytes]], int]:
+        """
+        Versão tagueada de um segmento: imagens viram [[IMG:...]] e são
+        extraídas para assets_dir. As mídias deixam de ser referenciadas e
+        por isso ficam fora do pacote.
+        """
+        tagged = copy.deepcopy(root)
+        body = tagged.find(qn("w:body"))
+        runs = (r for p in iter_paragraph_elements(body) for r in p.iterchildren(qn("w:r")))
+        created = tag_image_runs(runs, self._resolve_image, assets_dir, tag_prefix, store)
+        return self.assemble(tagged), created
+
+    def _resolve_image(self, rel_id: str) -> tuple[bytes, str] | None:
+        for rel in self.document_rels:
+            if rel.get("Id") != rel_id:
+                continue
+            if rel.get("TargetMode") == "External":
+                return None
+            partname = _resolve_target(self.document_part, rel.get("Target", ""))
+            blob = self.parts.get(partname)
+            if blob is None:
+                return None
+            return blob, posixpath.splitext(partname)[1] or ".png"
+        return None
+
+    def assemble(self, root) -> list[tuple[str, bytes]]:
+        """Gera os membros do zip para um document.xml já montado."""
+        referenced = referenced_rel_ids(root)
+        rels_root = etree.Element(f"{{{NS_PKG_REL}}}Relationships", nsmap={None: NS_PKG_REL})
+        for rel in self.document_rels:
+            kind = rel.get("Type", "").rsplit("/", 1)[-1]
+            if kind in BLOCK_SCOPED_RELS and rel.get("Id") not in referenced:
+                continue
+            rels_root.append(copy.deepcopy(rel))
+
+        reachable = self._reachable(_internal_targets(self.document_part, rels_root))
+        content_types = copy.deepcopy(self.content_types)
+        for override in list(content_types.iter(f"{{{NS_CT}}}Override")):
+            if override.get("PartName", "").lstrip("/") not in reachable:
+                content_types.remove(override)
+
+        replaced = {
+            CONTENT_TYPES: _xml_bytes(content_types),
+            self.document_part: _xml_bytes(root),
+            self.document_rels_part: _xml_bytes(rels_root),
+            **self._cleared,
+        }
+        members: list[tuple[str, bytes]] = []
+        for name in self.names:
+            keep = (
+                name in (CONTENT_TYPES, ROOT_RELS)
+                or name in reachable
+                or (name.endswith(".rels") and _rels_source(name) in reachable)
+            )
+            if keep:
+                members.append((name, replaced.get(name, self.parts[name])))
+        return members
+
+    def _reachable(self, document_targets: list[str]) -> set[str]:
+        reachable: set[str] = {self.document_part}
+        pending = list(self._rels_targets.get("", [])) + document_targets
+        while pending:
+            name = pending.pop()
+            if name in reachable or name not in self.parts:
+                continue
+            reachable.add(name)
+            pending.extend(self._rels_targets.get(name, []))
+        return reachable
+
+
+def _write_package(members: list[tuple[str, bytes]], docx_out: Path) -> None:
+    with zipfile.ZipFile(docx_out, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members:
+            zf.writestr(name, data)
+
+
+def split_docx_to_nuclei(
+    docx_path: Path,
+    output_root: Path,
+    force: bool,
+    *,
+    include_vidint: bool = False,
+    tag: bool = False,
+) -> list[Path]:
+    """
+    Divide um DOCX em núcleos conforme Heading 1/2.
+
+    O documento é lido uma única vez; os pacotes dos núcleos são montados em
+    memória e gravados em paralelo. include_vidint também gera mod0_vidint com
+    o conteúdo completo do curso. tag=True gera, do mesmo parse, o
+    <núcleo>_tagged.docx e as imagens em assets/<núcleo> (dispensando o
+    create_tagged_docx por núcleo).
+    """
+    package = CoursePackage(docx_path)
+    source_hash = package_sha256(docx_path)
+    store = AssetStore(output_root / ASSETS_DIRNAME / ASSET_STORE_DIRNAME)
+
+    targets: list[tuple[str, int, int | None]] = []
+    if include_vidint:
+        targets.append((VIDINT_NAME, 0, None))
+    targets += [(seg.name, seg.start, seg.end) for seg in package.segments()]
+
+    def _write(
+        manifest: BuildManifest,
+        split_inputs: str,
+        docx_out: Path,
+        members: list[tuple[str, bytes]],
+        tagged: tuple[Path, str, list[tuple[str, bytes]]] | None,
+    ) -> Path:
+        _write_package(members, docx_out)
+        manifest.record("split", split_inputs, [docx_out])
+        if tagged is not None:
+            tagged_out, tag_inputs, tagged_members = tagged
+            _write_package(tagged_members, tagged_out)
+            manifest.record("tag", tag_inputs, [tagged_out])
+        return docx_out
+
+    output_docs: list[Path] = []
+    with ThreadPoolExecutor(max_workers=SPLIT_WORKERS) as executor:
+        futures = []
+        for nucleus_name, start, end in targets:
+            nucleus_dir = output_root / nucleus_name
+            nucleus_dir.mkdir(parents=True, exist_ok=True)
+            docx_out = nucleus_dir / f"{nucleus_name}.docx"
+            tagged_out = nucleus_dir / f"{nucleus_name}_tagged.docx"
+            tag_prefix = f"{ASSETS_DIRNAME}/{nucleus_name}"
+            manifest = BuildManifest(nucleus_dir)
+            split_inputs = combine_fingerprints(source_hash, nucleus_name)
+
+            if not force and manifest.up_to_date(
+                "split", split_inputs, [docx_out], adopt_existing=True
+            ):
+                fresh = not tag or manifest.up_to_date(
+                    "tag",
+                    combine_fingerprints(package_sha256(docx_out), tag_prefix),
+                    [tagged_out],
+                    adopt_existing=True,
+                )
+                if fresh:
+                    log.info(f"[splitter] Mantendo existente: {docx_out.name}")
+                    continue
+
+            # Montagem (lxml, sob o GIL) no thread principal; compressão e escrita
+            # nos workers, sobrepostas à montagem do próximo núcleo.
+            root = package.segment_root(start, end)
+            members = package.assemble(root)
+            tagged = None
+            if tag:
+                tagged_members, created = package.build_tagged(
+                    root, output_root / ASSETS_DIRNAME / nucleus_name, tag_prefix, store
+                )
+                tag_inputs = combine_fingerprints(members_sha256(members), tag_prefix)
+                tagged = (tagged_out, tag_inputs, tagged_members)
+                log.debug(f"[splitter] {tagged_out.name}: {created} imagem(ns)")
+            futures.append(
+                executor.submit(_write, manifest, split_inputs, docx_out, members, tagged)
+            )
+        for future in futures:
+            output_docs.append(future.result())
 
     return output_docs
 
 
-def split_course_content(course_dir: Path, force: bool) -> list[Path]:
-    """Encontra DOCX na raiz do curso e divide em núcleos."""
+def split_course_content(course_dir: Path, force: bool, tag: bool = False) -> list[Path]:
+    """
+    Encontra DOCX na raiz do curso e divide em núcleos.
+
+    tag=True (modo fundido) também gera os DOCX tagueados e os assets no mesmo
+    passe.
+    """
     docxs = [
         p
         for p in course_dir.glob("*.docx")
@@ -147,36 +451,14 @@ def split_course_content(course_dir: Path, force: bool) -> list[Path]:
     docxs = sorted(docxs)
     created: list[Path] = []
 
-    # VIDINT usa o material inteiro do curso.
-    created += create_vidint_docx(docxs[0], course_dir, force=force)
-
     if len(docxs) > 1:
         log.warning(
             "[splitter] Mais de um DOCX encontrado na raiz; usando o primeiro para VIDINT."
         )
 
-    for docx_path in docxs:
-        created += split_docx_to_nuclei(docx_path, course_dir, force=force)
+    for idx, docx_path in enumerate(docxs):
+        # VIDINT usa o material inteiro do curso.
+        created += split_docx_to_nuclei(
+            docx_path, course_dir, force=force, include_vidint=idx == 0, tag=tag
+        )
     return created
-
-
-def create_vidint_docx(
-    docx_path: Path,
-    output_root: Path,
-    force: bool,
-) -> list[Path]:
-    """Cria mod0_vidint com o conteúdo completo do curso."""
-    nucleus_name = "mod0_vidint"
-    nucleus_dir = output_root / nucleus_name
-    nucleus_dir.mkdir(parents=True, exist_ok=True)
-    docx_out = nucleus_dir / f"{nucleus_name}.docx"
-
-    if docx_out.exists() and not force:
-        log.info(f"[splitter] Mantendo existente: {docx_out.name}")
-        return []
-
-    shutil.copyfile(docx_path, docx_out)
-    out_doc = Document(str(docx_out))
-    clear_headers_footers(out_doc)
-    out_doc.save(str(docx_out))
-    return [docx_out]
@@ -1,15 +1,22 @@
 from __future__ import annotations
 
+import logging
 import re
 from pathlib import Path
-from typing import Iterable
+from typing import Callable, Iterable
 
 from docx import Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
 from docx.table import Table
 from docx.text.paragraph import Paragraph
 
+from app.asset_store import AssetStore
+from app.config.paths import ASSET_STORE_DIRNAME
+from app.logging_utils import log_step
+
+log = logging.getLogger(__name__)
 
 NS = {
     "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
@@ -47,9 +54,27 @@ def iter_paragraphs_in_table(table: Table) -> Iterable[Paragraph]:
                 yield from iter_paragraphs_in_table(t)
 
 
+def iter_paragraph_elements(body) -> Iterable:
+    """Equivalente a iter_paragraphs direto sobre o XML de um w:body."""
+    yield from body.iterchildren(qn("w:p"))
+    for tbl in body.iterchildren(qn("w:tbl")):
+        yield from _iter_table_paragraph_elements(tbl)
+
+
+def _iter_table_paragraph_elements(tbl) -> Iterable:
+    for tr in tbl.iterchildren(qn("w:tr")):
+        for tc in tr.iterchildren(qn("w:tc")):
+            yield from tc.iterchildren(qn("w:p"))
+            for nested in tc.iterchildren(qn("w:tbl")):
+                yield from _iter_table_paragraph_elements(nested)
+
+
 def replace_run_with_text(run, text: str) -> None:
     """Substitui o conteúdo de um run por um texto simples."""
-    r = run._element
+    _replace_run_element_with_text(run._element, text)
+
+
+def _replace_run_element_with_text(r, text: str) -> None:
     for child in list(r):
         r.remove(child)
     t = OxmlElement("w:t")
@@ -66,41 +91,119 @@ def guess_extension(image_part) -> str:
     return EXT_BY_CONTENT_TYPE.get(content_type, ".png")
 
 
+def referenced_rel_ids(element) -> set[str]:
+    """rIds usados em qualquer atributo r:* (ou o:relid, VML) sob o elemento."""
+    prefix = f"{{{NS['r']}}}"
+    return {
+        value
+        for node in element.iter()
+        for key, value in node.attrib.items()
+        if key.startswith(prefix) or key.endswith("}relid")
+    }
+
+
+def drop_orphan_images(doc: Document) -> int:
+    """
+    Remove os relacionamentos de imagem que o corpo não referencia mais.
+
+    Sem o relacionamento, a parte da mídia deixa de ser alcançável e o
+    python-docx não a grava no save. Retorna quantas imagens saíram.
+    """
+    referenced = referenced_rel_ids(doc.element)
+    orphans = [
+        rel_id
+        for rel_id, rel in doc.part.rels.items()
+        if rel.reltype == RT.IMAGE and rel_id not in referenced
+    ]
+    for rel_id in orphans:
+        doc.part.rels.pop(rel_id)
+    return len(orphans)
+
+
+ImageResolver = Callable[[str], tuple[bytes, str] | None]
+
+
+def tag_image_runs(
+    runs: Iterable,
+    resolve_image: ImageResolver,
+    assets_dir: Path,
+    tag_prefix: str,
+    store: AssetStore,
+) -> int:
+    """
+    Troca as imagens (blips) dos runs por tags [[IMG:...]] e extrai as mídias.
+
+    resolve_image recebe o rId do blip e devolve (bytes, extensão) da imagem.
+    Retorna quantas imagens foram extraídas.
+    """
+    tag_prefix = tag_prefix.strip("/\\")
+    img_index = 1
+    for r in runs:
+        blips = r.xpath(".//*[local-name()='blip']")
+        if not blips:
+            continue
+        tags: list[str] = []
+        for blip in blips:
+            rel_id = blip.get(qn("r:embed"))
+            if not rel_id:
+                continue
+            image = resolve_image(rel_id)
+            if not image:
+                continue
+            blob, ext = image
+            filename = f"img_{img_index:04d}{ext}"
+            img_index += 1
+            store.materialize(blob, assets_dir / filename)
+            tag_path = f"{tag_prefix}/{filename}" if tag_prefix else filename
+            tags.append(f"[[IMG:{tag_path}]]")
+        if tags:
+            _replace_run_element_with_text(r, " ".join(tags))
+    return img_index - 1
+
+
 def tag_images_in_docx(
     docx_path: Path,
     assets_dir: Path,
     tag_prefix: str = "assets",
+    store: AssetStore | None = None,
 ) -> int:
-    """Extrai imagens do DOCX, grava em assets e substitui imagens por tags."""
+    """
+    Extrai imagens do DOCX, grava em assets e substitui imagens por tags.
+
+    As imagens vão para o store do curso (assets/.store, por SHA-256) e o
+    arquivo do núcleo é um hardlink para lá: a mesma imagem em vários núcleos
+    (ou repetida no documento) ocupa disco uma única vez.
+    """
     assets_dir.mkdir(parents=True, exist_ok=True)
+    store = store or AssetStore(assets_dir.parent / ASSET_STORE_DIRNAME)
     doc = Document(str(docx_path))
-    tag_prefix = tag_prefix.strip("/\\")
 
-    img_index = 1
-    for paragraph in iter_paragraphs(doc):
-        for run in paragraph.runs:
-            blips = run._element.xpath(".//*[local-name()='blip']")
-            if not blips:
-                continue
-            tags: list[str] = []
-            for blip in blips:
-                rel_id = blip.get(qn("r:embed"))
-                if not rel_id:
-                    continue
-                image_part = doc.part.related_parts.get(rel_id)
-                if not image_part:
-                    continue
-                ext = guess_extension(image_part)
-                filename = f"img_{img_index:04d}{ext}"
-                img_index += 1
-                (assets_dir / filename).write_bytes(image_part.blob)
-                tag_path = f"{tag_prefix}/{filename}" if tag_prefix else filename
-                tags.append(f"[[IMG:{tag_path}]]")
-            if tags:
-                replace_run_with_text(run, " ".join(tags))
+    def _resolve(rel_id: str) -> tuple[bytes, str] | None:
+        image_part = doc.part.related_parts.get(rel_id)
+        if not image_part:
+            return None
+        return image_part.blob, guess_extension(image_part)
 
+    runs = (
+        run._element for paragraph in iter_paragraphs(doc) for run in paragraph.runs
+    )
+    created = tag_image_runs(runs, _resolve, assets_dir, tag_prefix, store)
+
+    size_before = docx_path.stat().st_size
+    dropped = drop_orphan_images(doc)
     doc.save(str(docx_path))
-    return img_index - 1
+    if dropped:
+        log_step(
+            log,
+            docx_path.parent.name,
+            "tag_images_in_docx",
+            (
+                f"Midias removidas do DOCX tagueado: {dropped} "
+                f"({size_before} -> {docx_path.stat().st_size} bytes)"
+            ),
+            level=logging.DEBUG,
+        )
+    return created
 
 
 def find_content_docx(directory: Path) -> Path | None:
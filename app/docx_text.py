@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import re
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+from lxml import etree
+
+from app.rate_limit import CHARS_PER_TOKEN
+
+NS_W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+NS_A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+
+DOCUMENT_PART = "word/document.xml"
+STYLES_PART = "word/styles.xml"
+
+W_BODY = f"{{{NS_W}}}body"
+W_P = f"{{{NS_W}}}p"
+W_R = f"{{{NS_W}}}r"
+W_T = f"{{{NS_W}}}t"
+W_TAB = f"{{{NS_W}}}tab"
+W_BR = f"{{{NS_W}}}br"
+W_CR = f"{{{NS_W}}}cr"
+W_TBL = f"{{{NS_W}}}tbl"
+W_TR = f"{{{NS_W}}}tr"
+W_TC = f"{{{NS_W}}}tc"
+W_TXBX = f"{{{NS_W}}}txbxContent"
+W_PPR = f"{{{NS_W}}}pPr"
+W_PSTYLE = f"{{{NS_W}}}pStyle"
+W_NUMPR = f"{{{NS_W}}}numPr"
+W_VAL = f"{{{NS_W}}}val"
+A_BLIP = f"{{{NS_A}}}blip"
+
+# Imagem ainda sem [[IMG:...]]: só indica a posição, sem caminho que o plano
+# possa citar (o caminho interno do pacote não existe fora do DOCX).
+UNTAGGED_IMAGE_MARKER = "[imagem]"
+
+# Contêineres de runs dentro do parágrafo (o texto deles faz parte do parágrafo).
+RUN_CONTAINERS = {
+    f"{{{NS_W}}}hyperlink",
+    f"{{{NS_W}}}ins",
+    f"{{{NS_W}}}smartTag",
+    f"{{{NS_W}}}fldSimple",
+}
+# Blocos aninhados: são emitidos pelo bloco de topo que os contém.
+NESTED_SCOPES = {W_TBL, W_TXBX}
+
+IMG_TAG_RE = re.compile(r"\[\[IMG:[^\]]*\]\]")
+HEADING_RE = re.compile(r"^(?:heading|t[ií]tulo)\s*(\d)$", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class DocxTextStats:
+    """Tamanho do texto extraído de um DOCX (para dimensionar/rotear etapas)."""
+
+    chars: int
+    tokens: int
+    paragraphs: int
+    tables: int
+    images: int
+
+
+def _read_styles(zf: zipfile.ZipFile) -> dict[str, str]:
+    """styleId -> nome do estilo (styles.xml é pequeno: lido inteiro)."""
+    if STYLES_PART not in zf.namelist():
+        return {}
+    root = etree.fromstring(zf.read(STYLES_PART))
+    names: dict[str, str] = {}
+    for style in root.iterchildren(f"{{{NS_W}}}style"):
+        style_id = style.get(f"{{{NS_W}}}styleId")
+        name = style.find(f"{{{NS_W}}}name")
+        if style_id and name is not None:
+            names[style_id] = name.get(W_VAL, "")
+    return names
+
+
+class _BlockReader:
+    """Converte blocos de topo (parágrafo/tabela) em texto."""
+
+    def __init__(self, zf: zipfile.ZipFile, markdown: bool) -> None:
+        self.markdown = markdown
+        self.styles = _read_styles(zf) if markdown else {}
+        self.image_count = 0
+
+    def _run_text(self, run) -> str:
+        parts: list[str] = []
+        for child in run.iter():
+            if child.tag == W_T:
+                text = child.text or ""
+                self.image_count += len(IMG_TAG_RE.findall(text))
+                parts.append(text)
+            elif child.tag == W_TAB:
+                parts.append("\t")
+            elif child.tag in (W_BR, W_CR):
+                parts.append("\n")
+            elif child.tag == A_BLIP:
+                self.image_count += 1
+                if self.markdown:
+                    parts.append(UNTAGGED_IMAGE_MARKER)
+        return "".join(parts)
+
+    def paragraph_text(self, p) -> str:
+        parts: list[str] = []
+        for child in p:
+            if child.tag == W_R:
+                parts.append(self._run_text(child))
+            elif child.tag in RUN_CONTAINERS:
+                parts.extend(self._run_text(r) for r in child.iter(W_R))
+        return "".join(parts).strip()
+
+    def paragraph(self, p) -> str:
+        text = self.paragraph_text(p)
+        if not text or not self.markdown:
+            return text
+        ppr = p.find(W_PPR)
+        if ppr is None:
+            return text
+        style = ppr.find(W_PSTYLE)
+        if style is not None:
+            style_id = style.get(W_VAL, "")
+            match = HEADING_RE.match(self.styles.get(style_id, style_id))
+            if match:
+                return f"{'#' * int(match.group(1))} {text}"
+            if self.styles.get(style_id, "").lower() == "title":
+                return f"# {text}"
+        if ppr.find(W_NUMPR) is not None:
+            return f"- {text}"
+        return text
+
+    def table(self, tbl) -> str:
+        rows: list[list[str]] = []
+        for tr in tbl.iterchildren(W_TR):
+            rows.append(
+                [
+                    "\n".join(
+                        t for t in (self.paragraph_text(p) for p in tc.iterchildren(W_P)) if t
+                    )
+                    for tc in tr.iterchildren(W_TC)
+                ]
+            )
+        if not self.markdown:
+            lines = (" | ".join(cell for cell in row if cell) for row in rows)
+            return "\n".join(line for line in lines if line)
+
+        rows = [row for row in rows if any(row)]
+        if not rows:
+            return ""
+        width = max(len(row) for row in rows)
+        lines = []
+        for idx, row in enumerate(rows):
+            cells = [cell.replace("\n", "<br>").replace("|", "\\|") for cell in row]
+            cells += [""] * (width - len(cells))
+            lines.append(f"| {' | '.join(cells)} |")
+            if idx == 0:
+                lines.append(f"|{' --- |' * width}")
+        return "\n".join(lines)
+
+
+def _is_top_level(element) -> bool:
+    parent = element.getparent()
+    while parent is not None and parent.tag != W_BODY:
+        if parent.tag in NESTED_SCOPES:
+            return False
+        parent = parent.getparent()
+    return True
+
+
+def _iter_blocks(path: Path, markdown: bool) -> Iterator[tuple[str, str, _BlockReader]]:
+    """
+    Percorre word/document.xml em streaming (lxml.iterparse), na ordem do
+    documento, produzindo ("p" | "tbl", texto, leitor).
+
+    Cada bloco de topo é descartado (clear + remoção dos irmãos já lidos) logo
+    após ser convertido, então a memória não cresce com o tamanho do documento.
+    """
+    with zipfile.ZipFile(path) as zf:
+        reader = _BlockReader(zf, markdown)
+        with zf.open(DOCUMENT_PART) as stream:
+            for _, element in etree.iterparse(stream, events=("end",), tag=(W_P, W_TBL)):
+                if not _is_top_level(element):
+                    continue
+                if element.tag == W_P:
+                    yield "p", reader.paragraph(element), reader
+                else:
+                    yield "tbl", reader.table(element), reader
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+
+
+def iter_docx_text(path: Path, *, markdown: bool = False) -> Iterator[str]:
+    """Texto de cada parágrafo/tabela não vazio do DOCX, na ordem do documento."""
+    for _, text, _ in _iter_blocks(path, markdown):
+        if text:
+            yield text
+
+
+def extract_docx_text(path: Path, *, markdown: bool = False) -> str:
+    """
+    Extrai o texto do DOCX preservando a ordem de parágrafos e tabelas.
+
+    markdown=True marca títulos (#), itens de lista (-) e tabelas em Markdown;
+    imagens sem tag viram [imagem] (as [[IMG:...]] já tagueadas são mantidas).
+    """
+    separator = "\n\n" if markdown else "\n"
+    return separator.join(iter_docx_text(path, markdown=markdown)).strip()
+
+
+def _scan(
+    path: Path, markdown: bool, keep_text: bool
+) -> tuple[list[str], DocxTextStats]:
+    """Uma passada pelo documento: blocos de texto (se keep_text) e contagens."""
+    separator = 2 if markdown else 1
+    blocks: list[str] = []
+    chars = paragraphs = tables = 0
+    reader: _BlockReader | None = None
+    for kind, text, reader in _iter_blocks(path, markdown):
+        if not text:
+            continue
+        chars += len(text) + (separator if paragraphs or tables else 0)
+        if keep_text:
+            blocks.append(text)
+        if kind == "p":
+            paragraphs += 1
+        else:
+            tables += 1
+    return blocks, DocxTextStats(
+        chars=chars,
+        tokens=chars // CHARS_PER_TOKEN,
+        paragraphs=paragraphs,
+        tables=tables,
+        images=reader.image_count if reader else 0,
+    )
+
+
+def docx_text_stats(path: Path, *, markdown: bool = False) -> DocxTextStats:
+    """Conta caracteres/tokens do texto extraído sem montar o texto inteiro."""
+    return _scan(path, markdown, keep_text=False)[1]
+
+
+def extract_docx_text_with_stats(
+    path: Path, *, markdown: bool = False
+) -> tuple[str, DocxTextStats]:
+    """extract_docx_text e docx_text_stats numa única leitura do DOCX."""
+    blocks, stats = _scan(path, markdown, keep_text=True)
+    separator = "\n\n" if markdown else "\n"
+    return separator.join(blocks).strip(), stats
@@ -1,5 +1,6 @@
 """Integracao com Gamma para gerar imagens a partir de cards."""
 
+from app.gamma.batcher import GammaBatcher
 from app.gamma.orchestrator import materialize_generated_images_for_plan
 
-__all__ = ["materialize_generated_images_for_plan"]
+__all__ = ["GammaBatcher", "materialize_generated_images_for_plan"]
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from app.config.paths import ASSETS_DIRNAME, GAMMA_BATCH_DIRNAME
+from app.config.pipeline import (
+    GAMMA_BATCH_LINGER_SECONDS,
+    GAMMA_BATCH_MAX_CARDS,
+    GAMMA_BATCH_MAX_CHARS,
+    GAMMA_POLL_INTERVAL_SECONDS,
+    GAMMA_POLL_TIMEOUT_SECONDS,
+)
+from app.gamma.cards import build_cards_markdown
+from app.gamma.client import submit_pptx_from_cards
+from app.gamma.extractor import extract_images
+from app.gamma.poller import get_export_poller
+
+log = logging.getLogger(__name__)
+
+CARD_SEPARATOR = "\n\n---\n\n"
+
+
+@dataclass
+class _Part:
+    """Trecho de um núcleo dentro de um lote (cards consecutivos)."""
+
+    nucleus_name: str
+    slides: list[dict[str, Any]]
+    assets_dir: Path
+    rel_dir: str
+    text: str
+    slide_ids: list[str]
+    future: Future = field(default_factory=Future)
+
+    @property
+    def cards(self) -> int:
+        return len(self.slides)
+
+
+@dataclass
+class _Batch:
+    seq: int
+    parts: list[_Part] = field(default_factory=list)
+    cards: int = 0
+    chars: int = 0
+
+
+class GammaBatcher:
+    """
+    Junta os cards de imagem de vários núcleos em poucas gerações do Gamma.
+
+    Cada núcleo chama add() e recebe um Future de (criadas, créditos). Os
+    cards se acumulam num lote aberto, enviado quando atinge o limite de cards
+    (ou de caracteres) do Gamma, quando passa a janela de espera desde o
+    primeiro card, ou no close(). O export de cada lote é lido uma única vez e
+    cada imagem volta para o núcleo/slide_id de origem pela posição do card.
+    """
+
+    def __init__(
+        self,
+        course_dir: Path,
+        *,
+        assets_dirname: str = ASSETS_DIRNAME,
+        max_cards: int = GAMMA_BATCH_MAX_CARDS,
+        max_chars: int = GAMMA_BATCH_MAX_CHARS,
+        linger_seconds: float = GAMMA_BATCH_LINGER_SECONDS,
+    ) -> None:
+        self.course_dir = course_dir
+        self.assets_dirname = assets_dirname
+        self.max_cards = max(1, max_cards)
+        self.max_chars = max_chars
+        self.linger_seconds = linger_seconds
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._open: _Batch | None = None
+        self._timer: threading.Timer | None = None
+
+    def add(self, nucleus_name: str, slides: list[dict[str, Any]]) -> Future:
+        """Enfileira os slides do núcleo; o Future conclui após a extração."""
+        if not slides:
+            done: Future = Future()
+            done.set_result((0, 0))
+            return done
+
+        parts: list[_Part] = []
+        ready: list[_Batch] = []
+        with self._lock:
+            start = 0
+            while start < len(slides):
+                # Completa o lote aberto antes de abrir outro.
+                room = self.max_cards - (self._open.cards if self._open else 0)
+                part = self._make_part(nucleus_name, slides[start : start + room])
+                start += part.cards
+                parts.append(part)
+                ready.extend(self._append(part))
+        for batch in ready:
+            self._dispatch(batch)
+        return _gather(parts)
+
+    def flush(self) -> None:
+        """Envia o lote aberto agora (sem esperar a janela)."""
+        with self._lock:
+            batch = self._take_open()
+        if batch is not None:
+            self._dispatch(batch)
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> "GammaBatcher":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def _make_part(self, nucleus_name: str, slides: list[dict[str, Any]]) -> _Part:
+        text, slide_ids = build_cards_markdown(slides)
+        return _Part(
+            nucleus_name=nucleus_name,
+            slides=slides,
+            assets_dir=self.course_dir / self.assets_dirname / nucleus_name,
+            rel_dir=f"{self.assets_dirname}/{nucleus_name}",
+            text=text,
+            slide_ids=slide_ids,
+        )
+
+    def _append(self, part: _Part) -> list[_Batch]:
+        """Adiciona ao lote aberto; devolve os lotes que ficaram prontos."""
+        ready: list[_Batch] = []
+        batch = self._open
+        if batch is not None and (
+            batch.cards + part.cards > self.max_cards
+            or batch.chars + len(part.text) > self.max_chars
+        ):
+            ready.append(self._take_open())
+            batch = None
+        if batch is None:
+            self._seq += 1
+            batch = self._open = _Batch(seq=self._seq)
+            self._timer = threading.Timer(
+                self.linger_seconds, self._linger_expired, args=(batch.seq,)
+            )
+            self._timer.daemon = True
+            self._timer.start()
+        batch.parts.append(part)
+        batch.cards += part.cards
+        batch.chars += len(part.text) + len(CARD_SEPARATOR)
+        if batch.cards >= self.max_cards:
+            ready.append(self._take_open())
+        return ready
+
+    def _take_open(self) -> _Batch | None:
+        batch, self._open = self._open, None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _linger_expired(self, seq: int) -> None:
+        with self._lock:
+            if self._open is None or self._open.seq != seq:
+                return
+            batch = self._take_open()
+        self._dispatch(batch)
+
+    def _dispatch(self, batch: _Batch) -> None:
+        names = sorted({part.nucleus_name for part in batch.parts})
+        context = f"gamma_batch_{batch.seq:03d}"
+        log.info(
+            f"[{context}] Enviando {batch.cards} card(s) de {len(names)} nucleo(s): "
+            f"{', '.join(names)}"
+        )
+        export_path = (
+            self.course_dir
+            / self.assets_dirname
+            / GAMMA_BATCH_DIRNAME
+            / f"{context}.pptx"
+        )
+        try:
+            exported = submit_pptx_from_cards(
+                CARD_SEPARATOR.join(part.text for part in batch.parts),
+                export_path,
+                poll_interval=GAMMA_POLL_INTERVAL_SECONDS,
+                timeout_seconds=GAMMA_POLL_TIMEOUT_SECONDS,
+                context=context,
+            )
+        except BaseException as exc:  # noqa: BLE001
+            for part in batch.parts:
+                part.future.set_exception(exc)
+            return
+
+        routed = get_export_poller().then(
+            exported, lambda result: self._route(batch, result)
+        )
+
+        def _propagate(done: Future) -> None:
+            exc = done.exception()
+            if exc is None:
+                return
+            for part in batch.parts:
+                if not part.future.done():
+                    part.future.set_exception(exc)
+
+        routed.add_done_callback(_propagate)
+
+    def _route(self, batch: _Batch, result: tuple[Path, int]) -> None:
+        """Extrai o export uma vez e devolve cada imagem ao núcleo de origem."""
+        export_path, deducted = result
+        targets: list[tuple[int, Path]] = []
+        offset = 0
+        for part in batch.parts:
+            for i, slide_id in enumerate(part.slide_ids):
+                targets.append((offset + i, part.assets_dir / f"gen_{slide_id}"))
+            offset += part.cards
+        extracted = iter(extract_images(export_path, targets))
+
+        remaining = deducted
+        for idx, part in enumerate(batch.parts):
+            created = 0
+            for slide in part.slides:
+                out_path = next(extracted)
+                image = slide.get("image")
+                if out_path is None or not isinstance(image, dict):
+                    continue
+                image["path"] = f"{part.rel_dir}/{out_path.name}"
+                created += 1
+            if idx == len(batch.parts) - 1:
+                share = remaining
+            else:
+                share = deducted * part.cards // batch.cards
+            remaining -= share
+            part.future.set_result((created, share))
+
+
+def _gather(parts: list[_Part]) -> Future:
+    """Soma (criadas, créditos) das partes de um núcleo num único Future."""
+    if len(parts) == 1:
+        return parts[0].future
+
+    combined: Future = Future()
+    lock = threading.Lock()
+    pending = [len(parts)]
+
+    def _done(_: Future) -> None:
+        with lock:
+            pending[0] -= 1
+            if pending[0]:
+                return
+        errors = [p.future.exception() for p in parts if p.future.exception()]
+        if errors:
+            combined.set_exception(errors[0])
+            return
+        results = [p.future.result() for p in parts]
+        combined.set_result(
+            (sum(r[0] for r in results), sum(r[1] for r in results))
+        )
+
+    for part in parts:
+        part.future.add_done_callback(_done)
+    return combined
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+
+from app.config.paths import GAMMA_CACHE_DIR
+from app.hashing import combine_fingerprints
+
+log = logging.getLogger(__name__)
+
+# Incrementar quando o formato das entradas (ou a extração) mudar.
+GAMMA_CACHE_VERSION = "1"
+
+EXPORT_NAME = "gamma_export.pptx"
+META_NAME = "meta.json"
+
+
+class GammaExportCache:
+    """
+    Exports do Gamma indexados pelos cards enviados (um diretório por chave).
+
+    Cada entrada guarda o gamma_export.pptx (quando houver), as imagens já
+    extraídas por posição do card (card_NNN.ext) e os créditos que a geração
+    custou. Cards idênticos são servidos localmente, e cada acerto soma esses
+    créditos em `credits_saved`.
+    """
+
+    def __init__(self, root: Path = GAMMA_CACHE_DIR) -> None:
+        self.root = root
+        self.hits = 0
+        self.credits_saved = 0
+        self._lock = threading.Lock()
+
+    def key(self, export_key: str) -> str:
+        return combine_fingerprints(f"v{GAMMA_CACHE_VERSION}", export_key)
+
+    def _dir(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def _meta(self, entry: Path) -> dict | None:
+        meta_path = entry / META_NAME
+        if not meta_path.exists():
+            return None
+        return json.loads(meta_path.read_text(encoding="utf-8"))
+
+    def _complete(self, entry: Path, cards: int) -> bool:
+        meta = self._meta(entry)
+        if meta is None:
+            return False
+        images = meta.get("images") or {}
+        return all(
+            images.get(str(idx)) and (entry / images[str(idx)]).exists()
+            for idx in range(cards)
+        )
+
+    def fetch_images(
+        self, key: str, targets: list[tuple[int, Path]]
+    ) -> tuple[list[Path | None], int] | None:
+        """
+        Copia as imagens dos cards pedidos (índice, caminho sem extensão) e
+        devolve (imagens, créditos economizados); None se não houver a chave
+        ou se faltar a imagem de algum card (entrada incompleta).
+        """
+        entry = self._dir(key)
+        meta = self._meta(entry)
+        if meta is None:
+            return None
+        images = meta.get("images") or {}
+        names = [images.get(str(idx)) for idx, _ in targets]
+        if not all(name and (entry / name).exists() for name in names):
+            return None
+
+        saved: list[Path | None] = []
+        for name, (_, out_stem) in zip(names, targets):
+            out_path = out_stem.with_name(f"{out_stem.name}{Path(name).suffix}")
+            out_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(entry / name, out_path)
+            saved.append(out_path)
+
+        credits = int(meta.get("credits") or 0)
+        with self._lock:
+            self.hits += 1
+            self.credits_saved += credits
+        return saved, credits
+
+    def fetch_export(self, key: str, out_path: Path) -> bool:
+        """Copia o export da chave para out_path; False se não houver."""
+        cached = self._dir(key) / EXPORT_NAME
+        if not cached.exists():
+            return False
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(cached, out_path)
+        return True
+
+    def store(
+        self,
+        key: str,
+        images: list[Path | None],
+        *,
+        credits: int,
+        export_path: Path | None = None,
+    ) -> None:
+        """
+        Grava as imagens extraídas (na ordem dos cards) e o export. Se algum
+        card ficou sem imagem, nada é gravado: a próxima execução tenta de novo.
+        """
+        entry = self._dir(key)
+        if self._complete(entry, len(images)):
+            return
+        if any(image is None or not image.exists() for image in images):
+            log.debug(f"[gamma_cache] Export incompleto, nao armazenado ({key[:12]})")
+            return
+        tmp = entry.with_name(f"{entry.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        names: dict[str, str] = {}
+        for idx, image in enumerate(images):
+            name = f"card_{idx:03d}{image.suffix}"
+            shutil.copyfile(image, tmp / name)
+            names[str(idx)] = name
+        if export_path is not None and export_path.exists():
+            shutil.copyfile(export_path, tmp / EXPORT_NAME)
+        (tmp / META_NAME).write_text(
+            json.dumps({"credits": credits, "images": names}, indent=2),
+            encoding="utf-8",
+        )
+        if entry.exists():
+            # Entrada incompleta de uma versão anterior: substituída.
+            shutil.rmtree(entry, ignore_errors=True)
+        try:
+            os.replace(tmp, entry)
+        except OSError:
+            # Outra thread/processo gravou a mesma chave antes.
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+_CACHE = GammaExportCache()
+
+
+def get_gamma_cache() -> GammaExportCache:
+    return _CACHE
@@ -2,17 +2,32 @@ from __future__ import annotations
 
 import json
 import logging
-import time
+from concurrent.futures import Future
 from pathlib import Path
 from typing import Any
 
 import requests
 
-from app.config.pipeline import GAMMA_POLL_INTERVAL_SECONDS, GAMMA_POLL_TIMEOUT_SECONDS
+from app.config.pipeline import (
+    GAMMA_DOWNLOAD_ATTEMPTS,
+    GAMMA_DOWNLOAD_CHUNK_BYTES,
+    GAMMA_POLL_INTERVAL_SECONDS,
+    GAMMA_POLL_TIMEOUT_SECONDS,
+)
 from app.gamma.config import load_gamma_config
+from app.gamma.ledger import (
+    KIND_IMAGES,
+    STATUS_COMPLETED,
+    STATUS_FAILED,
+    STATUS_READY,
+    get_generation_ledger,
+)
+from app.gamma.poller import get_export_poller
 from app.config.paths import APP_DIR
 from app.debug_payload import dump_payload
+from app.hashing import combine_fingerprints, sha256_text
 from app.logging_utils import log_step
+from app.retry import NON_IDEMPOTENT_POLICY, request_with_retry
 
 
 GAMMA_BASE_URL = "https://public-api.gamma.app/v1.0/generations"
@@ -74,6 +89,28 @@ def _build_payload(input_text: str, cfg: dict[str, Any], endpoint: str) -> dict[
     return payload
 
 
+# Campos do payload que não mudam o conteúdo gerado (fora da chave do cache).
+CACHE_IGNORED_FIELDS = {"folderIds"}
+
+
+def export_cache_key(input_text: str, cfg: dict[str, Any]) -> str:
+    """
+    Chave do export no cache: markdown dos cards + campos do payload que
+    determinam a geração (endpoint, template, instrução, opções de imagem...).
+    """
+    endpoint = (cfg.get("endpoint") or "").strip().lower()
+    payload = {
+        key: value
+        for key, value in _build_payload(input_text, cfg, endpoint).items()
+        if key not in CACHE_IGNORED_FIELDS
+    }
+    return combine_fingerprints(
+        endpoint,
+        sha256_text(input_text),
+        sha256_text(json.dumps(payload, ensure_ascii=False, sort_keys=True)),
+    )
+
+
 def _preview_text(text: str, limit: int = 200) -> str:
     cleaned = " ".join((text or "").split())
     if len(cleaned) <= limit:
@@ -120,7 +157,15 @@ def create_generation(
         f"request: {json.dumps(_summarize_payload(payload), ensure_ascii=False)}",
         level=logging.DEBUG,
     )
-    resp = requests.post(url, headers=headers, json=payload, timeout=60)
+    resp = request_with_retry(
+        "gamma",
+        requests.post,
+        url,
+        headers=headers,
+        json=payload,
+        timeout=60,
+        policy=NON_IDEMPOTENT_POLICY,
+    )
     resp.raise_for_status()
     data = resp.json()
     generation_id = data.get("generationId")
@@ -129,82 +174,181 @@ def create_generation(
     return generation_id
 
 
-def wait_for_export_url(
+def _register_export(
     generation_id: str,
     cfg: dict[str, Any],
     *,
-    poll_interval: int | None = None,
-    timeout_seconds: int | None = None,
-    context: str | None = None,
-) -> dict[str, Any]:
-    """Aguarda o exportUrl ficar disponivel."""
-    headers = _build_headers(cfg)
-    interval = poll_interval or GAMMA_POLL_INTERVAL_SECONDS
-    timeout = timeout_seconds or GAMMA_POLL_TIMEOUT_SECONDS
-    deadline = time.monotonic() + timeout
-    url = f"{GAMMA_BASE_URL}/{generation_id}"
+    poll_interval: int | None,
+    timeout_seconds: int | None,
+    context: str | None,
+) -> Future:
+    return get_export_poller().register(
+        generation_id,
+        f"{GAMMA_BASE_URL}/{generation_id}",
+        _build_headers(cfg),
+        poll_interval=poll_interval or GAMMA_POLL_INTERVAL_SECONDS,
+        timeout_seconds=timeout_seconds or GAMMA_POLL_TIMEOUT_SECONDS,
+        context=context,
+    )
 
-    while time.monotonic() < deadline:
-        log_step(
-            log,
-            context or "gamma",
-            "wait_for_export_url",
-            f"request: GET {url}",
-            level=logging.DEBUG,
-        )
-        resp = requests.get(url, headers=headers, timeout=60)
-        resp.raise_for_status()
-        data = resp.json()
-        status = (data.get("status") or "").lower()
-        export_url = data.get("exportUrl") or ""
-        if status == "completed" and export_url:
-            return data
-        if status in {"failed", "canceled"}:
-            raise RuntimeError(f"Gamma falhou: status={status}.")
-        time.sleep(interval)
 
-    raise TimeoutError("Timeout aguardando exportUrl do Gamma.")
+def _read_resume_state(state_path: Path, export_url: str) -> str | None:
+    """Validador (ETag/Last-Modified) salvo para o `.part` deste exportUrl."""
+    try:
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get("url") != export_url:
+        return None
+    validator = state.get("validator")
+    return validator if isinstance(validator, str) and validator else None
 
 
 def download_export(export_url: str, out_path: Path, *, context: str | None = None) -> None:
-    """Baixa o PPTX exportado pelo Gamma."""
+    """
+    Baixa o PPTX exportado pelo Gamma em streaming para `<out>.part`.
+
+    Ao lado do `.part` fica `<out>.part.json` com o exportUrl e o ETag (ou
+    Last-Modified) da resposta. Um `.part` só é retomado (Range + If-Range)
+    quando veio do mesmo exportUrl e o servidor informou um validador; se o
+    arquivo remoto mudou, o servidor responde 200 e o download recomeça do
+    zero. O arquivo final só é substituído quando o download termina.
+    """
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    log_step(
-        log,
-        context or "gamma",
-        "download_export",
-        f"request: GET {export_url}",
-        level=logging.DEBUG,
-    )
-    resp = requests.get(export_url, timeout=120)
-    resp.raise_for_status()
-    out_path.write_bytes(resp.content)
+    part_path = out_path.with_name(out_path.name + ".part")
+    state_path = out_path.with_name(out_path.name + ".part.json")
+    validator = _read_resume_state(state_path, export_url)
+    if validator is None:
+        # Sobra de outro exportUrl (ou sem validador): não dá para retomar.
+        part_path.unlink(missing_ok=True)
+    for attempt in range(1, GAMMA_DOWNLOAD_ATTEMPTS + 1):
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        headers: dict[str, str] = {}
+        if offset and validator:
+            headers = {"Range": f"bytes={offset}-", "If-Range": validator}
+        else:
+            offset = 0
+        log_step(
+            log,
+            context or "gamma",
+            "download_export",
+            f"request: GET {export_url} (offset={offset}, tentativa {attempt})",
+            level=logging.DEBUG,
+        )
+        try:
+            with requests.get(
+                export_url, headers=headers, stream=True, timeout=120
+            ) as resp:
+                if resp.status_code == 416 and offset:
+                    # O validador bateu e o .part já tem o arquivo inteiro.
+                    break
+                resp.raise_for_status()
+                resumed = bool(offset) and resp.status_code == 206
+                if not resumed:
+                    validator = resp.headers.get("ETag") or resp.headers.get(
+                        "Last-Modified"
+                    )
+                    if validator:
+                        state_path.write_text(
+                            json.dumps({"url": export_url, "validator": validator}),
+                            encoding="utf-8",
+                        )
+                    else:
+                        state_path.unlink(missing_ok=True)
+                with part_path.open("ab" if resumed else "wb") as fh:
+                    for chunk in resp.iter_content(chunk_size=GAMMA_DOWNLOAD_CHUNK_BYTES):
+                        fh.write(chunk)
+            break
+        except (
+            requests.ConnectionError,
+            requests.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+        ) as exc:
+            if attempt == GAMMA_DOWNLOAD_ATTEMPTS:
+                raise
+            log_step(
+                log,
+                context or "gamma",
+                "download_export",
+                f"Download interrompido ({exc}); retomando",
+                level=logging.WARNING,
+            )
+    part_path.replace(out_path)
+    state_path.unlink(missing_ok=True)
 
 
-def generate_pptx_from_cards(
+def submit_pptx_from_cards(
     input_text: str,
     out_path: Path,
     *,
     poll_interval: int | None = None,
     timeout_seconds: int | None = None,
     context: str | None = None,
-) -> tuple[Path, int]:
-    """Gera PPTX no Gamma a partir dos cards e salva localmente."""
+) -> Future:
+    """
+    Cria a geracao no Gamma e devolve um Future de (PPTX salvo, creditos).
+
+    A espera pelo exportUrl e o download ficam com o poller compartilhado, de
+    modo que a thread chamadora fica livre logo apos o envio. A geracao fica
+    no ledger antes da espera: uma geracao nao concluida com a mesma entrada
+    (execucao anterior interrompida) e retomada em vez de reenviada.
+    """
     cfg = load_gamma_config()
     if not cfg:
         raise FileNotFoundError("gamma_config.json nao encontrado.")
-    generation_id = create_generation(input_text, cfg, context=context)
-    data = wait_for_export_url(
+    ledger = get_generation_ledger()
+    input_hash = export_cache_key(input_text, cfg)
+    resumed = ledger.find_unfinished(KIND_IMAGES, input_hash)
+    if resumed is not None:
+        generation_id = resumed.generation_id
+        log_step(
+            log,
+            context or "gamma",
+            "submit_pptx_from_cards",
+            f"Retomando geracao {generation_id} ({resumed.status})",
+        )
+    else:
+        generation_id = create_generation(input_text, cfg, context=context)
+        ledger.record_submitted(
+            generation_id,
+            kind=KIND_IMAGES,
+            nucleus=context or "gamma",
+            input_hash=input_hash,
+            target=str(out_path),
+        )
+    ready = _register_export(
         generation_id,
         cfg,
         poll_interval=poll_interval,
         timeout_seconds=timeout_seconds,
         context=context,
     )
-    credits = data.get("credits") or {}
-    deducted = int(credits.get("deducted") or 0)
-    export_url = data.get("exportUrl")
-    if not export_url:
-        raise RuntimeError("exportUrl nao retornado pelo Gamma.")
-    download_export(export_url, out_path, context=context)
-    return out_path, deducted
+
+    def _download(data: dict[str, Any]) -> tuple[Path, int]:
+        credits = data.get("credits") or {}
+        deducted = int(credits.get("deducted") or 0)
+        export_url = data.get("exportUrl")
+        if not export_url:
+            raise RuntimeError("exportUrl nao retornado pelo Gamma.")
+        ledger.update(
+            generation_id, status=STATUS_READY, export_url=export_url, credits=deducted
+        )
+        download_export(export_url, out_path, context=context)
+        ledger.update(generation_id, status=STATUS_COMPLETED)
+        return out_path, deducted
+
+    def _record_failure(done: Future) -> None:
+        exc = done.exception()
+        # Timeout/queda de rede: a geracao continua retomavel na proxima execucao.
+        rejected = (
+            isinstance(exc, requests.HTTPError)
+            and exc.response is not None
+            and 400 <= exc.response.status_code < 500
+            and exc.response.status_code != 429
+        )
+        if isinstance(exc, RuntimeError) or rejected:
+            ledger.update(generation_id, status=STATUS_FAILED)
+
+    ready.add_done_callback(_record_failure)
+    return get_export_poller().then(ready, _download)
+
@@ -1,20 +1,144 @@
 from __future__ import annotations
 
+import posixpath
+import shutil
+import zipfile
 from pathlib import Path
 
-from pptx import Presentation
-from pptx.enum.shapes import MSO_SHAPE_TYPE
+from lxml import etree
 
+NS_P = "http://schemas.openxmlformats.org/presentationml/2006/main"
+NS_A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+NS_R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
 
-def _pick_main_picture(slide):
-    pictures = [
-        shape
-        for shape in slide.shapes
-        if shape.shape_type == MSO_SHAPE_TYPE.PICTURE
+PRESENTATION_PART = "ppt/presentation.xml"
+
+P_SLD_ID = f"{{{NS_P}}}sldId"
+P_SP_TREE = f"{{{NS_P}}}spTree"
+P_PIC = f"{{{NS_P}}}pic"
+P_PH = f"{{{NS_P}}}ph"
+A_BLIP = f"{{{NS_A}}}blip"
+A_EXT = f"{{{NS_A}}}ext"
+R_ID = f"{{{NS_R}}}id"
+R_EMBED = f"{{{NS_R}}}embed"
+
+# Assinaturas dos formatos (a mídia é copiada sem decodificar).
+MAGIC_EXTS = (
+    (b"\x89PNG", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"GIF8", "gif"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+    (b"\xd7\xcd\xc6\x9a", "wmf"),
+)
+SUFFIX_ALIASES = {"jpeg": "jpg", "tif": "tiff"}
+
+
+def _rels_part(part: str) -> str:
+    folder, name = posixpath.split(part)
+    return posixpath.join(folder, "_rels", f"{name}.rels")
+
+
+def _read_rels(zf: zipfile.ZipFile, part: str) -> dict[str, str]:
+    """rId -> parte de destino (caminho absoluto no pacote)."""
+    rels_part = _rels_part(part)
+    if rels_part not in zf.NameToInfo:
+        return {}
+    root = etree.fromstring(zf.read(rels_part))
+    base = posixpath.dirname(part)
+    targets: dict[str, str] = {}
+    for rel in root.iterchildren(f"{{{NS_PKG_REL}}}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            targets[rel.get("Id", "")] = target.lstrip("/")
+        else:
+            targets[rel.get("Id", "")] = posixpath.normpath(posixpath.join(base, target))
+    return targets
+
+
+def _slide_parts(zf: zipfile.ZipFile) -> list[str]:
+    """Partes dos slides na ordem da apresentação (sldIdLst)."""
+    rels = _read_rels(zf, PRESENTATION_PART)
+    root = etree.fromstring(zf.read(PRESENTATION_PART))
+    return [
+        rels[sld_id.get(R_ID, "")]
+        for sld_id in root.iter(P_SLD_ID)
+        if sld_id.get(R_ID, "") in rels
     ]
-    if not pictures:
+
+
+def _main_picture_embed(slide_xml: bytes) -> str | None:
+    """
+    rId da maior imagem do slide (área pelo a:ext do p:spPr), considerando só
+    p:pic de topo e fora de placeholder, como o shape_type PICTURE do
+    python-pptx.
+    """
+    root = etree.fromstring(slide_xml)
+    tree = root.find(f".//{P_SP_TREE}")
+    if tree is None:
         return None
-    return max(pictures, key=lambda sh: sh.width * sh.height)
+    best: str | None = None
+    best_area = -1
+    for pic in tree.iterchildren(P_PIC):
+        if pic.find(f".//{P_PH}") is not None:
+            continue
+        blip = pic.find(f".//{A_BLIP}")
+        if blip is None or not blip.get(R_EMBED):
+            continue
+        ext = pic.find(f"{{{NS_P}}}spPr/{{{NS_A}}}xfrm/{A_EXT}")
+        area = 0
+        if ext is not None:
+            area = int(ext.get("cx", 0)) * int(ext.get("cy", 0))
+        if area > best_area:
+            best, best_area = blip.get(R_EMBED), area
+    return best
+
+
+def _media_ext(zf: zipfile.ZipFile, part: str) -> str:
+    with zf.open(part) as fh:
+        head = fh.read(8)
+    for magic, ext in MAGIC_EXTS:
+        if head.startswith(magic):
+            return ext
+    suffix = posixpath.splitext(part)[1].lstrip(".").lower() or "png"
+    return SUFFIX_ALIASES.get(suffix, suffix)
+
+
+def extract_images(
+    pptx_path: Path, targets: list[tuple[int, Path]]
+) -> list[Path | None]:
+    """
+    Extrai a maior imagem de cada slide pedido (índice, caminho sem extensão).
+
+    Lê só o XML dos slides pedidos direto do zip e copia a mídia em streaming,
+    sem carregar a apresentação nem decodificar as imagens. A extensão vem da
+    assinatura do arquivo.
+    """
+    saved: list[Path | None] = []
+
+    with zipfile.ZipFile(pptx_path) as zf:
+        slides = _slide_parts(zf)
+        for idx, out_stem in targets:
+            if idx < 0 or idx >= len(slides):
+                saved.append(None)
+                continue
+            slide_part = slides[idx]
+            embed = _main_picture_embed(zf.read(slide_part))
+            media = _read_rels(zf, slide_part).get(embed or "")
+            if not media or media not in zf.NameToInfo:
+                saved.append(None)
+                continue
+            out_path = out_stem.with_name(f"{out_stem.name}.{_media_ext(zf, media)}")
+            out_path.parent.mkdir(parents=True, exist_ok=True)
+            with zf.open(media) as src, out_path.open("wb") as dst:
+                shutil.copyfileobj(src, dst)
+            saved.append(out_path)
+
+    return saved
 
 
 def extract_slide_images(
@@ -25,22 +149,10 @@ def extract_slide_images(
 ) -> list[Path | None]:
     """Extrai uma imagem por slide (maior) e salva em out_dir."""
     out_dir.mkdir(parents=True, exist_ok=True)
-    prs = Presentation(str(pptx_path))
-    saved: list[Path | None] = []
-
-    for idx, slide_id in zip(slide_indices, slide_ids):
-        if idx < 0 or idx >= len(prs.slides):
-            saved.append(None)
-            continue
-        slide = prs.slides[idx]
-        pic = _pick_main_picture(slide)
-        if not pic:
-            saved.append(None)
-            continue
-        ext = (pic.image.ext or "png").lower()
-        filename = f"gen_{slide_id}.{ext}"
-        out_path = out_dir / filename
-        out_path.write_bytes(pic.image.blob)
-        saved.append(out_path)
-
-    return saved
+    return extract_images(
+        pptx_path,
+        [
+            (idx, out_dir / f"gen_{slide_id}")
+            for idx, slide_id in zip(slide_indices, slide_ids)
+        ],
+    )
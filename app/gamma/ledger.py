@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.config.paths import GAMMA_LEDGER_PATH
+from app.config.pipeline import GAMMA_LEDGER_RESUME_HOURS
+
+log = logging.getLogger(__name__)
+
+# Tipos de geração: imagens do plano (gamma.client) e apresentações do
+# pipeline de cards (gamma_engine).
+KIND_IMAGES = "images"
+KIND_CARDS = "cards"
+
+STATUS_PENDING = "pending"      # enviada, aguardando o Gamma
+STATUS_READY = "ready"          # exportUrl disponível, download pendente
+STATUS_COMPLETED = "completed"  # concluída (export baixado / documento pronto)
+STATUS_FAILED = "failed"
+UNFINISHED = (STATUS_PENDING, STATUS_READY)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    generation_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    nucleus TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    export_url TEXT NOT NULL DEFAULT '',
+    target TEXT NOT NULL DEFAULT '',
+    credits INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS generations_input
+    ON generations (kind, input_hash, status);
+"""
+
+
+@dataclass(frozen=True)
+class LedgerEntry:
+    generation_id: str
+    kind: str
+    nucleus: str
+    input_hash: str
+    status: str
+    export_url: str
+    target: str
+    credits: int
+    created_at: float
+    updated_at: float
+
+
+class GenerationLedger:
+    """
+    Registro persistente (SQLite) das gerações enviadas ao Gamma.
+
+    A geração é gravada assim que o generationId volta, antes de começar a
+    espera; se o processo cair ou for cancelado, a próxima execução retoma a
+    consulta dos ids não concluídos (mesmo input_hash) em vez de reenviar e
+    pagar de novo. Ids mais antigos que GAMMA_LEDGER_RESUME_HOURS não são
+    retomados.
+    """
+
+    def __init__(
+        self,
+        path: Path = GAMMA_LEDGER_PATH,
+        resume_hours: float = GAMMA_LEDGER_RESUME_HOURS,
+    ) -> None:
+        self.path = path
+        self.resume_seconds = resume_hours * 3600
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def record_submitted(
+        self,
+        generation_id: str,
+        *,
+        kind: str,
+        nucleus: str,
+        input_hash: str,
+        target: str = "",
+    ) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO generations (generation_id, kind, nucleus, "
+                    "input_hash, status, target, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        generation_id,
+                        kind,
+                        nucleus,
+                        input_hash,
+                        STATUS_PENDING,
+                        target,
+                        now,
+                        now,
+                    ),
+                )
+
+    def update(
+        self,
+        generation_id: str,
+        *,
+        status: str,
+        export_url: str | None = None,
+        credits: int | None = None,
+    ) -> None:
+        fields = ["status = ?", "updated_at = ?"]
+        values: list[object] = [status, time.time()]
+        if export_url is not None:
+            fields.append("export_url = ?")
+            values.append(export_url)
+        if credits is not None:
+            fields.append("credits = ?")
+            values.append(credits)
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    f"UPDATE generations SET {', '.join(fields)} WHERE generation_id = ?",
+                    (*values, generation_id),
+                )
+
+    def _select(self, where: str, params: tuple) -> list[LedgerEntry]:
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT * FROM generations WHERE {where} ORDER BY created_at", params
+            ).fetchall()
+        return [LedgerEntry(**dict(row)) for row in rows]
+
+    def unfinished(self, kind: str, input_hash: str | None = None) -> list[LedgerEntry]:
+        """Gerações do tipo ainda retomáveis (não concluídas e recentes)."""
+        where = (
+            f"kind = ? AND status IN ({', '.join('?' * len(UNFINISHED))}) "
+            "AND created_at >= ?"
+        )
+        params: tuple = (kind, *UNFINISHED, time.time() - self.resume_seconds)
+        if input_hash is not None:
+            where += " AND input_hash = ?"
+            params += (input_hash,)
+        return self._select(where, params)
+
+    def find_unfinished(self, kind: str, input_hash: str) -> LedgerEntry | None:
+        """Geração retomável mais recente para a mesma entrada."""
+        entries = self.unfinished(kind, input_hash)
+        return entries[-1] if entries else None
+
+    def get(self, generation_id: str) -> LedgerEntry | None:
+        entries = self._select("generation_id = ?", (generation_id,))
+        return entries[0] if entries else None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_LEDGER: GenerationLedger | None = None
+_LEDGER_LOCK = threading.Lock()
+
+
+def get_generation_ledger() -> GenerationLedger:
+    global _LEDGER
+    with _LEDGER_LOCK:
+        if _LEDGER is None:
+            _LEDGER = GenerationLedger()
+        return _LEDGER
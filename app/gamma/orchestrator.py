@@ -1,14 +1,18 @@
 from __future__ import annotations
 
 import logging
+from concurrent.futures import Future
 from pathlib import Path
 from typing import Any
 
 from app.config.pipeline import GAMMA_POLL_INTERVAL_SECONDS, GAMMA_POLL_TIMEOUT_SECONDS
+from app.gamma.batcher import GammaBatcher
 from app.gamma.cards import build_cards_markdown
-from app.gamma.client import generate_pptx_from_cards
+from app.gamma.cache import EXPORT_NAME, GammaExportCache, get_gamma_cache
+from app.gamma.client import export_cache_key, submit_pptx_from_cards
 from app.gamma.config import load_gamma_config
 from app.gamma.extractor import extract_slide_images
+from app.gamma.poller import get_export_poller
 from app.logging_utils import log_step
 
 
@@ -67,6 +71,12 @@ def _select_card_slides(
     return selected
 
 
+def _done(result: tuple[int, int]) -> Future:
+    future: Future = Future()
+    future.set_result(result)
+    return future
+
+
 def materialize_generated_images_for_plan(
     plan: dict[str, Any],
     *,
@@ -80,11 +90,38 @@ def materialize_generated_images_for_plan(
     Usa Gamma para gerar imagens dos slides com image.source="generated".
     Retorna (quantidade_criada, creditos_deduzidos).
     """
+    return submit_generated_images_for_plan(
+        plan,
+        course_dir=course_dir,
+        nucleus_name=nucleus_name,
+        assets_dirname=assets_dirname,
+        max_workers=max_workers,
+        generate_images=generate_images,
+    ).result()
+
+
+def submit_generated_images_for_plan(
+    plan: dict[str, Any],
+    *,
+    course_dir: Path,
+    nucleus_name: str,
+    assets_dirname: str = "assets",
+    max_workers: int | None = None,
+    generate_images: bool = True,
+    batcher: GammaBatcher | None = None,
+) -> Future:
+    """
+    Envia os cards ao Gamma e devolve um Future de (criadas, creditos).
+
+    Só o envio roda na thread chamadora; a espera, o download do export e a
+    extração das imagens são encadeados no poller compartilhado. Com batcher,
+    só os slides sem imagem entram num lote compartilhado com outros núcleos.
+    """
     del max_workers
 
     targets = _collect_generated_slides(plan, course_dir)
     if not targets:
-        return 0, 0
+        return _done((0, 0))
 
     if not generate_images:
         reused = 0
@@ -104,7 +141,7 @@ def materialize_generated_images_for_plan(
                         image["path"] = rel_path
                         slide["image"] = image
                     reused += 1
-        return reused, 0
+        return _done((reused, 0))
 
     cfg = load_gamma_config()
     if not cfg:
@@ -115,19 +152,51 @@ def materialize_generated_images_for_plan(
             "Gamma desativado: gamma_config.json nao encontrado",
             level=logging.DEBUG,
         )
-        return 0, 0
+        return _done((0, 0))
+
+    assets_dir = course_dir / assets_dirname / nucleus_name
+    rel_dir = f"{assets_dirname}/{nucleus_name}"
+    cache = get_gamma_cache()
+
+    if batcher is not None:
+        # No lote só entram os slides sem imagem; o cache é por núcleo.
+        slides = [slide for _, slide in targets]
+        input_text, slide_ids = build_cards_markdown(slides)
+        key = cache.key(export_cache_key(input_text, cfg))
+        cached = _from_cache(
+            cache, key, slides, slide_ids, assets_dir, rel_dir, nucleus_name
+        )
+        if cached is not None:
+            return cached
+
+        def _store_batched(result: tuple[int, int]) -> tuple[int, int]:
+            images = []
+            for slide in slides:
+                rel = (slide.get("image") or {}).get("path")
+                path = course_dir / rel if isinstance(rel, str) and rel else None
+                images.append(path if path is not None and path.exists() else None)
+            cache.store(key, images, credits=result[1])
+            return result
+
+        return get_export_poller().then(
+            batcher.add(nucleus_name, slides), _store_batched
+        )
 
     card_slides = _select_card_slides(plan)
     if not card_slides:
-        return 0, 0
+        return _done((0, 0))
 
     input_text, card_slide_ids = build_cards_markdown(card_slides)
-    target_card_indices = list(range(len(card_slide_ids)))
-    target_slide_ids = card_slide_ids
-    assets_dir = course_dir / assets_dirname / nucleus_name
-    export_path = assets_dir / "gamma_export.pptx"
+    export_path = assets_dir / EXPORT_NAME
+    key = cache.key(export_cache_key(input_text, cfg))
+    cached = _from_cache(
+        cache, key, card_slides, card_slide_ids, assets_dir, rel_dir, nucleus_name
+    )
+    if cached is not None:
+        cache.fetch_export(key, export_path)
+        return cached
 
-    _, deducted = generate_pptx_from_cards(
+    exported = submit_pptx_from_cards(
         input_text,
         export_path,
         poll_interval=GAMMA_POLL_INTERVAL_SECONDS,
@@ -135,18 +204,55 @@ def materialize_generated_images_for_plan(
         context=nucleus_name,
     )
 
-    extracted = extract_slide_images(
-        export_path, assets_dir, target_card_indices, target_slide_ids
-    )
+    def _extract(result: tuple[Path, int]) -> tuple[int, int]:
+        _, deducted = result
+        extracted = extract_slide_images(
+            export_path, assets_dir, list(range(len(card_slide_ids))), card_slide_ids
+        )
+        cache.store(key, extracted, credits=deducted, export_path=export_path)
+        return _assign_images(card_slides, extracted, rel_dir), deducted
+
+    return get_export_poller().then(exported, _extract)
+
+
+def _assign_images(
+    slides: list[dict[str, Any]], extracted: list[Path | None], rel_dir: str
+) -> int:
+    """Aponta image.path de cada slide para a imagem extraída do seu card."""
     created = 0
-    for (_, slide), out_path in zip(targets, extracted):
+    for slide, out_path in zip(slides, extracted):
         if not out_path:
             continue
-        rel = f"{assets_dirname}/{nucleus_name}/{out_path.name}"
         image = slide.get("image") or {}
         if isinstance(image, dict):
-            image["path"] = rel
+            image["path"] = f"{rel_dir}/{out_path.name}"
             slide["image"] = image
             created += 1
+    return created
 
-    return created, deducted
+
+def _from_cache(
+    cache: GammaExportCache,
+    key: str,
+    slides: list[dict[str, Any]],
+    slide_ids: list[str],
+    assets_dir: Path,
+    rel_dir: str,
+    nucleus_name: str,
+) -> Future | None:
+    """Serve os cards do cache (Future já concluído) ou None se não houver."""
+    cached = cache.fetch_images(
+        key,
+        [(idx, assets_dir / f"gen_{slide_id}") for idx, slide_id in enumerate(slide_ids)],
+    )
+    if cached is None:
+        return None
+    images, credits = cached
+    created = _assign_images(slides, images, rel_dir)
+    log_step(
+        log,
+        nucleus_name,
+        "materialize_generated_images_for_plan",
+        f"Imagens Gamma do cache: {created} (creditos economizados: {credits})",
+    )
+    return _done((created, 0))
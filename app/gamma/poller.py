@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config.pipeline import (
+    GAMMA_HTTP_POOL_SIZE,
+    GAMMA_POLL_INTERVAL_SECONDS,
+    GAMMA_POLL_TIMEOUT_SECONDS,
+    GAMMA_POLL_WORKERS,
+)
+from app.logging_utils import log_step
+from app.retry import request_with_retry
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass
+class _Pending:
+    generation_id: str
+    url: str
+    headers: dict[str, str]
+    interval: float
+    deadline: float
+    context: str
+    future: Future = field(default_factory=Future)
+    next_check: float = 0.0
+
+
+class ExportPoller:
+    """
+    Serviço único de consulta das gerações do Gamma.
+
+    Os núcleos registram o generationId e recebem um Future, resolvido com o
+    JSON de status quando o exportUrl fica disponível. Uma thread em segundo
+    plano faz, a cada rodada, as consultas vencidas de todos os núcleos (em
+    lote, num pool pequeno, pelo limitador "gamma" e numa sessão HTTP
+    compartilhada), em vez de uma thread dormindo por geração.
+    """
+
+    def __init__(self, workers: int = GAMMA_POLL_WORKERS) -> None:
+        self._pending: dict[str, _Pending] = {}
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="gamma-poll"
+        )
+        self._followups = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="gamma-then"
+        )
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=GAMMA_HTTP_POOL_SIZE)
+        self.session.mount("https://", adapter)
+
+    def register(
+        self,
+        generation_id: str,
+        url: str,
+        headers: dict[str, str],
+        *,
+        poll_interval: float | None = None,
+        timeout_seconds: float | None = None,
+        context: str | None = None,
+    ) -> Future:
+        """Passa a acompanhar a geração; o Future recebe o JSON de status final."""
+        now = time.monotonic()
+        interval = poll_interval or GAMMA_POLL_INTERVAL_SECONDS
+        entry = _Pending(
+            generation_id=generation_id,
+            url=url,
+            headers=headers,
+            interval=interval,
+            deadline=now + (timeout_seconds or GAMMA_POLL_TIMEOUT_SECONDS),
+            context=context or "gamma",
+            next_check=now + interval,
+        )
+        with self._cond:
+            existing = self._pending.get(generation_id)
+            if existing is not None:
+                return existing.future
+            self._pending[generation_id] = entry
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._loop, name="gamma-poller", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify_all()
+        return entry.future
+
+    def then(self, future: Future, fn: Callable[[T], R]) -> Future:
+        """
+        Encadeia fn(resultado) no pool do poller (ex.: baixar o export) e
+        devolve o Future do resultado, sem ocupar a thread de quem registrou.
+        """
+        chained: Future = Future()
+
+        def _run(result: Any) -> None:
+            try:
+                chained.set_result(fn(result))
+            except BaseException as exc:  # noqa: BLE001
+                chained.set_exception(exc)
+
+        def _done(done: Future) -> None:
+            exc = done.exception()
+            if exc is not None:
+                chained.set_exception(exc)
+                return
+            self._followups.submit(_run, done.result())
+
+        future.add_done_callback(_done)
+        return chained
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                now = time.monotonic()
+                due = [p for p in self._pending.values() if p.next_check <= now]
+                if not due:
+                    wake = min(p.next_check for p in self._pending.values())
+                    self._cond.wait(timeout=max(0.0, wake - now))
+                    continue
+
+            log.debug(f"[gamma_poller] Consultando {len(due)} geracao(oes)")
+            for entry, outcome in zip(due, self._executor.map(self._check, due)):
+                self._settle(entry, outcome)
+
+    def _check(self, entry: _Pending) -> tuple[str, Any]:
+        log_step(
+            log,
+            entry.context,
+            "export_poller",
+            f"request: GET {entry.url}",
+            level=logging.DEBUG,
+        )
+        try:
+            resp = request_with_retry(
+                "gamma", self.session.get, entry.url, headers=entry.headers, timeout=60
+            )
+            resp.raise_for_status()
+            data = resp.json()
+        except Exception as exc:  # noqa: BLE001
+            return "error", exc
+
+        status = (data.get("status") or "").lower()
+        if status == "completed" and data.get("exportUrl"):
+            return "done", data
+        if status in {"failed", "canceled"}:
+            return "error", RuntimeError(f"Gamma falhou: status={status}.")
+        return "pending", None
+
+    def _settle(self, entry: _Pending, outcome: tuple[str, Any]) -> None:
+        kind, value = outcome
+        now = time.monotonic()
+        if kind == "pending" and now >= entry.deadline:
+            kind, value = "error", TimeoutError("Timeout aguardando exportUrl do Gamma.")
+
+        with self._cond:
+            if kind == "pending":
+                entry.next_check = now + entry.interval
+                return
+            self._pending.pop(entry.generation_id, None)
+
+        if kind == "done":
+            entry.future.set_result(value)
+        else:
+            entry.future.set_exception(value)
+
+
+_POLLER: ExportPoller | None = None
+_POLLER_LOCK = threading.Lock()
+
+
+def get_export_poller() -> ExportPoller:
+    global _POLLER
+    with _POLLER_LOCK:
+        if _POLLER is None:
+            _POLLER = ExportPoller()
+        return _POLLER
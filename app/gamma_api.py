@@ -4,6 +4,11 @@ from pathlib import Path
 from typing import Any
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from app.config.pipeline import GAMMA_HTTP_POOL_SIZE
+from app.hashing import sha256_text
+from app.retry import NON_IDEMPOTENT_POLICY, request_with_retry
 
 
 def resolve_path(base_dir: Path, value: str) -> Path:
@@ -65,10 +70,71 @@ def generate_content_from_template(
     prompt_final = f"{instrucoes_md}\n\n{cards_md}"
 
     body = build_body(api_config, prompt_final, folder_id)
-    response = requests.post(config["url"], headers=headers, json=body)
+    response = request_with_retry(
+        "gamma",
+        requests.post,
+        config["url"],
+        headers=headers,
+        json=body,
+        policy=NON_IDEMPOTENT_POLICY,
+    )
     return response
 
 
+class GammaSession:
+    """
+    Cliente Gamma com as configurações lidas uma vez e uma única sessão HTTP
+    (conexões keep-alive reaproveitadas entre envios e consultas).
+
+    As funções generate_content_from_template/get_generation_status continuam
+    disponíveis para chamadas avulsas.
+    """
+
+    def __init__(self, base_dir: Path, pool_size: int = GAMMA_HTTP_POOL_SIZE) -> None:
+        self.config, self.api_config, api_key = load_configs(base_dir)
+        self.headers = build_headers(self.api_config, api_key)
+        instructions_path = resolve_path(base_dir, self.config["instructions_path"])
+        self.instructions = instructions_path.read_text(encoding="utf-8").strip()
+        self.url = self.config["url"]
+        self.status_base = self.url.rsplit("/", 1)[0]
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(self.headers)
+
+    def _body(self, cards_path: Path, folder_id: str | None) -> dict[str, Any]:
+        cards_md = cards_path.read_text(encoding="utf-8").strip()
+        return build_body(self.api_config, f"{self.instructions}\n\n{cards_md}", folder_id)
+
+    def generate_content_from_template(
+        self, cards_path: Path, folder_id: str | None = None
+    ) -> requests.Response:
+        body = self._body(cards_path, folder_id)
+        return request_with_retry(
+            "gamma", self.session.post, self.url, json=body, policy=NON_IDEMPOTENT_POLICY
+        )
+
+    def input_hash(self, cards_path: Path, folder_id: str | None = None) -> str:
+        """Hash do corpo que seria enviado (identifica a geração no ledger)."""
+        body = self._body(cards_path, folder_id)
+        return sha256_text(json.dumps(body, ensure_ascii=False, sort_keys=True))
+
+    def get_generation_status(self, generation_id: str) -> requests.Response:
+        url = f"{self.status_base}/{generation_id}"
+        return request_with_retry("gamma", self.session.get, url)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "GammaSession":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
 def write_last_response(
     output_dir: Path,
     response: requests.Response,
@@ -102,7 +168,7 @@ def get_generation_status(base_dir: Path, generation_id: str) -> requests.Respon
     config, api_config, api_key = load_configs(base_dir)
     headers = build_headers(api_config, api_key)
     url = f"{config['url'].rsplit('/', 1)[0]}/{generation_id}"
-    return requests.get(url, headers=headers)
+    return request_with_retry("gamma", requests.get, url, headers=headers)
 
 
 def get_status(payload: dict[str, Any]) -> str:
@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+import requests
+
+from app.config.pipeline import (
+    GAMMA_EXPECTED_SECONDS,
+    GAMMA_STATUS_MAX_INTERVAL_SECONDS,
+    GAMMA_STATUS_MIN_INTERVAL_SECONDS,
+    GAMMA_SUBMIT_WORKERS,
+)
+from app.gamma.ledger import (
+    KIND_CARDS,
+    STATUS_COMPLETED,
+    STATUS_FAILED,
+    STATUS_READY,
+    GenerationLedger,
+)
+from app.gamma_api import (
+    GammaSession,
+    get_generation_id,
+    get_status,
+    parse_json,
+)
+
+log = logging.getLogger(__name__)
+
+FAILED_STATUSES = {"failed", "error", "canceled", "cancelled"}
+
+# (generation_id, diretório do material, payload de status "completed")
+CompletedCallback = Callable[[str, Path, dict[str, Any]], None]
+# (generation_id, resposta do envio)
+SubmittedCallback = Callable[[str, requests.Response], None]
+
+
+@dataclass
+class _Generation:
+    generation_id: str
+    material_dir: Path
+    submitted_at: float
+    checks: int = 0
+    overdue_checks: int = 0
+    # Retomada do ledger: a idade vem do created_at e o tempo até concluir
+    # (que inclui o intervalo entre execuções) fica fora da média móvel.
+    resumed: bool = False
+
+
+@dataclass
+class GenerationEngine:
+    """
+    Envia os cards ao Gamma em paralelo e acompanha cada generationId assim
+    que ele é criado, sem esperar os demais envios.
+
+    Cada geração tem o seu próprio agendamento de consulta: enquanto está
+    dentro do tempo esperado, a próxima consulta fica na metade do que falta
+    (ou seja, mais frequente perto da conclusão); passado o esperado, o
+    intervalo dobra a cada consulta. O tempo esperado acompanha a média móvel
+    das gerações já concluídas nesta execução.
+
+    Com `ledger`, cada generationId é gravado antes da espera, e os jobs cuja
+    geração ficou pendente numa execução anterior voltam a ser consultados em
+    vez de reenviados.
+    """
+
+    gamma: GammaSession
+    on_completed: CompletedCallback
+    on_submitted: SubmittedCallback | None = None
+    submit_workers: int = GAMMA_SUBMIT_WORKERS
+    max_wait_minutes: int = 0
+    expected_seconds: float = GAMMA_EXPECTED_SECONDS
+    min_interval: float = GAMMA_STATUS_MIN_INTERVAL_SECONDS
+    max_interval: float = GAMMA_STATUS_MAX_INTERVAL_SECONDS
+    ledger: GenerationLedger | None = None
+    _queue: list[tuple[float, int, _Generation]] = field(
+        default_factory=list, init=False, repr=False
+    )
+    _seq: int = field(default=0, init=False, repr=False)
+
+    def next_interval(self, generation: _Generation, now: float) -> float:
+        remaining = self.expected_seconds - (now - generation.submitted_at)
+        if remaining > 0:
+            interval = remaining / 2
+        else:
+            interval = self.min_interval * (2 ** generation.overdue_checks)
+            generation.overdue_checks += 1
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def _schedule(self, generation: _Generation, now: float) -> None:
+        self._seq += 1
+        due = now + self.next_interval(generation, now)
+        heapq.heappush(self._queue, (due, self._seq, generation))
+
+    def track(
+        self,
+        generation_id: str,
+        material_dir: Path,
+        created_at: float | None = None,
+    ) -> None:
+        """
+        Acompanha uma geração já enviada (consultada no próximo run).
+        `created_at` (epoch) é o envio original, quando retomada do ledger.
+        """
+        now = time.monotonic()
+        generation = _Generation(generation_id, material_dir, now)
+        if created_at is not None:
+            generation.submitted_at = now - max(0.0, time.time() - created_at)
+            generation.resumed = True
+        self._seq += 1
+        heapq.heappush(self._queue, (now, self._seq, generation))
+
+    def _resume(
+        self, jobs: Iterable[tuple[Path, Path]], folder_id: str | None
+    ) -> list[tuple[Path, Path, str]]:
+        """
+        Acompanha as gerações pendentes no ledger com a mesma entrada e
+        devolve só os jobs que ainda precisam ser enviados (com o input_hash).
+        """
+        hashed = [
+            (card_path, material_dir, self.gamma.input_hash(card_path, folder_id))
+            for card_path, material_dir in jobs
+        ]
+        if self.ledger is None:
+            return hashed
+
+        unfinished = {
+            entry.input_hash: entry for entry in self.ledger.unfinished(KIND_CARDS)
+        }
+        to_submit: list[tuple[Path, Path, str]] = []
+        for card_path, material_dir, input_hash in hashed:
+            entry = unfinished.pop(input_hash, None)
+            if entry is None:
+                to_submit.append((card_path, material_dir, input_hash))
+                continue
+            log.info(f"Retomando geracao {entry.generation_id}: {card_path.name}")
+            self.track(entry.generation_id, material_dir, entry.created_at)
+        return to_submit
+
+    def _submit(
+        self,
+        card_path: Path,
+        material_dir: Path,
+        input_hash: str,
+        folder_id: str | None,
+    ) -> tuple[requests.Response, str, float]:
+        """
+        Envia os cards e grava o generationId no ledger logo após o POST, na
+        própria thread do envio: mesmo que outro envio falhe ou o processo
+        caia antes do laço principal ver este, a geração paga fica registrada.
+        """
+        log.info(f"Enviando cards para Gamma: {card_path.name}")
+        response = self.gamma.generate_content_from_template(card_path, folder_id)
+        submitted_at = time.monotonic()
+        generation_id = get_generation_id(parse_json(response))
+        if self.ledger is not None:
+            self.ledger.record_submitted(
+                generation_id,
+                kind=KIND_CARDS,
+                nucleus=material_dir.name,
+                input_hash=input_hash,
+                target=str(material_dir),
+            )
+        return response, generation_id, submitted_at
+
+    def _check(self, generation: _Generation) -> bool:
+        """Consulta uma geração; True quando concluída."""
+        generation.checks += 1
+        payload = parse_json(self.gamma.get_generation_status(generation.generation_id))
+        status = get_status(payload)
+        log.info(f"Status {generation.generation_id}: {status}")
+        status_lower = status.lower()
+
+        if status_lower == "completed":
+            # READY até o on_completed terminar: se ele falhar (ou o processo
+            # cair), a próxima execução retoma a geração em vez de reenviar.
+            if self.ledger is not None:
+                self.ledger.update(
+                    generation.generation_id,
+                    status=STATUS_READY,
+                    export_url=payload.get("gammaUrl") or "",
+                )
+            elapsed = time.monotonic() - generation.submitted_at
+            if not generation.resumed:
+                self.expected_seconds = 0.7 * self.expected_seconds + 0.3 * elapsed
+            log.debug(
+                f"[gamma_engine] {generation.generation_id} concluida em {elapsed:.0f}s "
+                f"({generation.checks} consulta(s))"
+            )
+            self.on_completed(generation.generation_id, generation.material_dir, payload)
+            if self.ledger is not None:
+                self.ledger.update(generation.generation_id, status=STATUS_COMPLETED)
+            return True
+        if status_lower in FAILED_STATUSES:
+            if self.ledger is not None:
+                self.ledger.update(generation.generation_id, status=STATUS_FAILED)
+            raise RuntimeError(f"Falha na geração {generation.generation_id}: {status}")
+        return False
+
+    def run(
+        self,
+        jobs: Iterable[tuple[Path, Path]] = (),
+        folder_id: str | None = None,
+    ) -> list[str]:
+        """
+        Processa (cards .md, diretório do material) até todas as gerações
+        concluírem. Retorna os generationIds na ordem de conclusão.
+        """
+        start = time.monotonic()
+        completed: list[str] = []
+        jobs = self._resume(jobs, folder_id)
+
+        with ThreadPoolExecutor(max_workers=max(1, self.submit_workers)) as executor:
+            pending: dict[Future, Path] = {
+                executor.submit(
+                    self._submit, card_path, material_dir, input_hash, folder_id
+                ): material_dir
+                for card_path, material_dir, input_hash in jobs
+            }
+            try:
+                while pending or self._queue:
+                    now = time.monotonic()
+                    timeout = max(0.0, self._queue[0][0] - now) if self._queue else None
+                    if pending:
+                        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            material_dir = pending.pop(future)
+                            response, generation_id, submitted_at = future.result()
+                            if self.on_submitted:
+                                self.on_submitted(generation_id, response)
+                            self._schedule(
+                                _Generation(generation_id, material_dir, submitted_at),
+                                submitted_at,
+                            )
+                    elif timeout:
+                        time.sleep(timeout)
+
+                    if self.max_wait_minutes > 0:
+                        if time.monotonic() - start > self.max_wait_minutes * 60:
+                            raise TimeoutError("Tempo máximo de espera excedido.")
+
+                    while self._queue and self._queue[0][0] <= time.monotonic():
+                        _, _, generation = heapq.heappop(self._queue)
+                        if self._check(generation):
+                            completed.append(generation.generation_id)
+                        else:
+                            self._schedule(generation, time.monotonic())
+            finally:
+                for future in pending:
+                    future.cancel()
+
+        return completed
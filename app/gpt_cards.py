@@ -1,13 +1,14 @@
 import argparse
 import logging
 import os
-import random
 import shutil
-import time
 from pathlib import Path
 
 from openai import OpenAI
 
+from app.rate_limit import call_with_limits, estimate_tokens
+from app.retry import retry_call
+
 
 logging.basicConfig(
     level=logging.INFO,
@@ -15,28 +16,19 @@ logging.basicConfig(
     datefmt="%Y-%m-%d %H:%M:%S",
 )
 log = logging.getLogger(__name__)
-MAX_RETRIES = 5
-BASE_BACKOFF_SECONDS = 2
-
-
-def with_backoff(fn, *args, **kwargs):
-    for attempt in range(1, MAX_RETRIES + 1):
-        try:
-            return fn(*args, **kwargs)
-        except Exception as exc:
-            is_last = attempt == MAX_RETRIES
-            if is_last:
-                raise
-            delay = min(BASE_BACKOFF_SECONDS * (2 ** (attempt - 1)), 30)
-            delay += random.uniform(0, 0.5)
-            log.warning(f"Falha na API (tentativa {attempt}/{MAX_RETRIES}): {exc}")
-            log.warning(f"Aguardando {delay:.1f}s antes de tentar novamente.")
-            time.sleep(delay)
 
 
 def upload_file(client: OpenAI, path: Path) -> str:
     with open(path, "rb") as fh:
-        f = with_backoff(client.files.create, file=fh, purpose="user_data")
+        f = retry_call(
+            "openai",
+            call_with_limits,
+            "openai",
+            "files",
+            client.files.with_raw_response.create,
+            file=fh,
+            purpose="user_data",
+        )
     return f.id
 
 
@@ -49,8 +41,13 @@ def call_llm(
     directory: str,
 ) -> str:
     log.info(f"[{directory}]Chamando o LLM")
-    resp = with_backoff(
-        client.responses.create,
+    resp = retry_call(
+        "openai",
+        call_with_limits,
+        "openai",
+        model,
+        client.responses.with_raw_response.create,
+        tokens=estimate_tokens(instructions, user_input),
         model=model,
         instructions=instructions,
         tools=[
@@ -211,7 +208,7 @@ def generate_cards_for_root(
     if not os.getenv("OPENAI_API_KEY"):
         raise SystemExit("Defina OPENAI_API_KEY.")
 
-    client = OpenAI()
+    client = OpenAI(max_retries=0)
     prompt_md = prompt_md_path.read_text(encoding="utf-8")
 
     exclude_dirs = exclude_dirs or set()
@@ -1,28 +1,52 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
-import random
-import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
-from app.config.paths import APP_DIR, USER_INPUT_SLIDES
+from app.config.paths import (
+    APP_DIR,
+    PLAN_SCHEMA,
+    USER_INPUT_SLIDES,
+    USER_INPUT_SLIDES_INLINE,
+)
+from app.config.pipeline import PLAN_INLINE_MAX_TOKENS
 from app.debug_payload import dump_payload
+from app.docx_text import extract_docx_text, extract_docx_text_with_stats
+from app.json_stream import JsonArrayStream
 from app.logging_utils import log_step
+from app.openai_clients import get_openai_client
+from app.plan_cache import (
+    get_plan_cache,
+    plan_fingerprint,
+    read_plan_fingerprint,
+    write_plan_fingerprint,
+)
 from app.prompt_utils import render_prompt_template
-
-from docx import Document
-from docx.oxml.table import CT_Tbl
-from docx.oxml.text.paragraph import CT_P
-from docx.table import Table
-from docx.text.paragraph import Paragraph
+from app.rate_limit import acall_with_limits, call_with_limits, estimate_tokens
+from app.retry import (
+    RETRYABLE_INCOMPLETE_REASONS,
+    FatalError,
+    TransientError,
+    aretry_call,
+    error_for_code,
+    retry_call,
+)
+from app.upload_cache import aupload_file_cached, upload_file_cached
 
 log = logging.getLogger(__name__)
-MAX_RETRIES = 5
-BASE_BACKOFF_SECONDS = 2
+
+# files: upload dos DOCX + code_interpreter; inline: texto extraído no input
+# (sem uploads nem container); auto: inline até PLAN_INLINE_MAX_TOKENS.
+PLAN_MODES = ("files", "inline", "auto")
+
+# Recebe (índice 1-based, slide) de cada slides[i] completo durante o streaming.
+SlideCallback = Callable[[int, dict[str, Any]], None]
 
 
 def _load_json_schema() -> dict[str, Any]:
@@ -36,7 +60,7 @@ def _load_json_schema() -> dict[str, Any]:
     Retorna SEMPRE no formato:
       {"name": str, "strict": bool, "schema": {...}}
     """
-    schema_path = APP_DIR / "prompts" / "schemas" / "slide_plan_v1.json"
+    schema_path = APP_DIR / PLAN_SCHEMA
     raw = json.loads(schema_path.read_text(encoding="utf-8"))
 
     if isinstance(raw, dict) and isinstance(raw.get("schema"), dict):
@@ -88,60 +112,12 @@ def _summarize_response_shapes(resp: Any) -> str:
     return " | ".join(parts)
 
 
-def docx_chars(path: Path) -> int:
-    d = Document(path)
-    paras = [p.text.strip() for p in d.paragraphs if p.text and p.text.strip()]
-    return len("\n".join(paras))
-
-
-def iter_block_items(parent):
-    """Itera por parágrafos e tabelas mantendo a ordem no DOCX."""
-    for child in parent.element.body.iterchildren():
-        if isinstance(child, CT_P):
-            yield Paragraph(child, parent)
-        elif isinstance(child, CT_Tbl):
-            yield Table(child, parent)
-
-
-def extract_docx_text(path: Path) -> str:
-    """Extrai texto do DOCX preservando ordem de parágrafos e tabelas."""
-    doc = Document(path)
-    chunks: list[str] = []
-    for block in iter_block_items(doc):
-        if isinstance(block, Paragraph):
-            text = block.text.strip()
-            if text:
-                chunks.append(text)
-            continue
-        for row in block.rows:
-            cells = [cell.text.strip() for cell in row.cells]
-            cells = [cell for cell in cells if cell]
-            if cells:
-                chunks.append(" | ".join(cells))
-    return "\n".join(chunks).strip()
-
-
-def with_backoff(fn, *args, **kwargs):
-    """Executa uma função com backoff exponencial e jitter."""
-    for attempt in range(1, MAX_RETRIES + 1):
-        try:
-            return fn(*args, **kwargs)
-        except Exception as exc:
-            if attempt == MAX_RETRIES:
-                raise
-            delay = min(BASE_BACKOFF_SECONDS * (2 ** (attempt - 1)), 30)
-            delay += random.uniform(0, 0.5)
-            log.warning(
-                f"(with_backoff) ({fn}) Falha na API (tentativa {attempt}/{MAX_RETRIES}): {exc}"
-            )
-            log.warning(
-                f"(with_backoff) Aguardando {delay:.1f}s antes de tentar novamente."
-            )
-            time.sleep(delay)
+def upload_file(client: OpenAI, path: Path) -> str:
+    """Faz upload (ou reaproveita um upload idêntico) e retorna o file_id."""
+    return upload_file_cached(client, path, _upload_file_raw)
 
 
-def upload_file(client: OpenAI, path: Path) -> str:
-    """Faz upload de um arquivo para a API e retorna o file_id."""
+def _log_upload_request(path: Path) -> None:
     try:
         size = path.stat().st_size
     except OSError:
@@ -155,8 +131,40 @@ def upload_file(client: OpenAI, path: Path) -> str:
         level=logging.DEBUG,
     )
 
+
+def _upload_file_raw(client: OpenAI, path: Path) -> str:
+    """Faz upload de um arquivo para a API e retorna o file_id."""
+    _log_upload_request(path)
     with open(path, "rb") as fh:
-        f = with_backoff(client.files.create, file=fh, purpose="user_data")
+        f = retry_call(
+            "openai",
+            call_with_limits,
+            "openai",
+            "files",
+            client.files.with_raw_response.create,
+            file=fh,
+            purpose="user_data",
+        )
+    return f.id
+
+
+async def aupload_file(client: AsyncOpenAI, path: Path) -> str:
+    """Versão assíncrona de upload_file (mesmo cache de uploads)."""
+    return await aupload_file_cached(client, path, _aupload_file_raw)
+
+
+async def _aupload_file_raw(client: AsyncOpenAI, path: Path) -> str:
+    _log_upload_request(path)
+    blob = await asyncio.to_thread(path.read_bytes)
+    f = await aretry_call(
+        "openai",
+        acall_with_limits,
+        "openai",
+        "files",
+        client.files.with_raw_response.create,
+        file=(path.name, blob),
+        purpose="user_data",
+    )
     return f.id
 
 
@@ -223,18 +231,22 @@ def _extract_output_json(resp: Any, *, directory: str) -> dict[str, Any]:
     )
 
 
-def call_llm(
-    client: OpenAI,
+def build_llm_payload(
     model: str,
     instructions: str,
     file_ids: list[str],
     user_input: str,
     directory: str,
 ) -> dict[str, Any]:
-    """Chama o modelo com arquivos anexados e retorna o JSON (dict)."""
+    """
+    Monta o payload do Responses (JSON schema).
+
+    Com arquivos anexados, habilita o code_interpreter para o modelo lê-los;
+    sem arquivos (modo inline), o texto já está no input e não há ferramentas.
+    """
     schema_fmt = _load_json_schema()
 
-    tool_label = "code_interpreter"
+    tool_label = "code_interpreter" if file_ids else "none"
     log_step(
         log,
         directory,
@@ -255,16 +267,6 @@ def call_llm(
         "model": model,
         "instructions": instructions,
         "input": user_input,
-        "tools": [
-            {
-                "type": "code_interpreter",
-                "container": {
-                    "type": "auto",
-                    "file_ids": file_ids,
-                },
-            }
-        ],
-        "tool_choice": {"type": "code_interpreter"},
         "text": {
             "format": {
                 "type": "json_schema",
@@ -275,12 +277,199 @@ def call_llm(
         },
     }
 
+    if file_ids:
+        payload["tools"] = [
+            {
+                "type": "code_interpreter",
+                "container": {
+                    "type": "auto",
+                    "file_ids": file_ids,
+                },
+            }
+        ]
+        payload["tool_choice"] = {"type": "code_interpreter"}
+
     dump_path = dump_payload(payload)
     log_step(
         log, directory, "call_llm", f"request_dump={dump_path}", level=logging.DEBUG
     )
+    return payload
+
+
+class _PlanStream:
+    """
+    Consome os eventos do Responses em streaming.
+
+    O texto do JSON é acumulado e, a cada slides[i] que fecha, o slide é
+    entregue a on_slide enquanto o modelo continua escrevendo os próximos.
+    """
+
+    def __init__(self, on_slide: SlideCallback, directory: str) -> None:
+        self.on_slide = on_slide
+        self.directory = directory
+        self.parser = JsonArrayStream("slides")
+        self.response: Any = None
+        self.emitted = 0
+
+    def handle(self, event: Any) -> None:
+        etype = _safe_get(event, "type")
+        if etype == "response.output_text.delta":
+            for slide in self.parser.feed(_safe_get(event, "delta") or ""):
+                self._emit(slide)
+        elif etype == "response.completed":
+            self.response = _safe_get(event, "response")
+        elif etype == "error":
+            raise error_for_code(
+                _safe_get(event, "code"),
+                f"Streaming do plano interrompido (error): {_safe_get(event, 'message')}",
+            )
+        elif etype == "response.failed":
+            error = _safe_get(_safe_get(event, "response"), "error")
+            raise error_for_code(
+                _safe_get(error, "code"),
+                f"Streaming do plano falhou: {_safe_get(error, 'message')}",
+            )
+        elif etype == "response.incomplete":
+            details = _safe_get(_safe_get(event, "response"), "incomplete_details")
+            reason = _safe_get(details, "reason")
+            message = f"Streaming do plano incompleto ({reason})"
+            if reason is None or reason in RETRYABLE_INCOMPLETE_REASONS:
+                raise TransientError(message)
+            raise FatalError(message)
+
+    def _emit(self, slide: Any) -> None:
+        if not isinstance(slide, dict):
+            return
+        self.emitted += 1
+        try:
+            self.on_slide(self.emitted, slide)
+        except Exception as exc:
+            # O consumidor é uma otimização: o plano completo segue o fluxo normal.
+            log_step(
+                log,
+                self.directory,
+                "call_llm",
+                f"Slide {self.emitted} do stream ignorado: {exc}",
+                level=logging.WARNING,
+            )
+
+    def result(self) -> dict[str, Any]:
+        log_step(
+            log,
+            self.directory,
+            "call_llm",
+            f"stream: {self.emitted} slide(s) entregues durante a geracao",
+            level=logging.DEBUG,
+        )
+        parsed = _try_parse_json_strict(self.parser.text)
+        if parsed is not None:
+            return parsed
+        if self.response is not None:
+            return _extract_output_json(self.response, directory=self.directory)
+        raise ValueError("Streaming do plano terminou sem JSON parseável.")
 
-    resp = with_backoff(client.responses.create, **payload)
+
+def _stream_llm(
+    client: OpenAI,
+    payload: dict[str, Any],
+    tokens: int,
+    on_slide: SlideCallback,
+    directory: str,
+) -> dict[str, Any]:
+    # Um stream novo a cada tentativa; slides repetidos são tolerados pelo consumidor.
+    events = call_with_limits(
+        "openai",
+        payload["model"],
+        client.responses.with_raw_response.create,
+        tokens=tokens,
+        stream=True,
+        **payload,
+    )
+    stream = _PlanStream(on_slide, directory)
+    for event in events:
+        stream.handle(event)
+    return stream.result()
+
+
+async def _astream_llm(
+    client: AsyncOpenAI,
+    payload: dict[str, Any],
+    tokens: int,
+    on_slide: SlideCallback,
+    directory: str,
+) -> dict[str, Any]:
+    events = await acall_with_limits(
+        "openai",
+        payload["model"],
+        client.responses.with_raw_response.create,
+        tokens=tokens,
+        stream=True,
+        **payload,
+    )
+    stream = _PlanStream(on_slide, directory)
+    async for event in events:
+        stream.handle(event)
+    return stream.result()
+
+
+def call_llm(
+    client: OpenAI,
+    model: str,
+    instructions: str,
+    file_ids: list[str],
+    user_input: str,
+    directory: str,
+    on_slide: SlideCallback | None = None,
+) -> dict[str, Any]:
+    """
+    Chama o modelo com arquivos anexados e retorna o JSON (dict).
+
+    Com on_slide, a resposta vem em streaming e cada slide completo é entregue
+    antes do fim da geração.
+    """
+    payload = build_llm_payload(model, instructions, file_ids, user_input, directory)
+    tokens = estimate_tokens(instructions, user_input)
+    if on_slide is not None:
+        return retry_call(
+            "openai", _stream_llm, client, payload, tokens, on_slide, directory
+        )
+    resp = retry_call(
+        "openai",
+        call_with_limits,
+        "openai",
+        model,
+        client.responses.with_raw_response.create,
+        tokens=tokens,
+        **payload,
+    )
+    return _extract_output_json(resp, directory=directory)
+
+
+async def acall_llm(
+    client: AsyncOpenAI,
+    model: str,
+    instructions: str,
+    file_ids: list[str],
+    user_input: str,
+    directory: str,
+    on_slide: SlideCallback | None = None,
+) -> dict[str, Any]:
+    """Versão assíncrona de call_llm."""
+    payload = build_llm_payload(model, instructions, file_ids, user_input, directory)
+    tokens = estimate_tokens(instructions, user_input)
+    if on_slide is not None:
+        return await aretry_call(
+            "openai", _astream_llm, client, payload, tokens, on_slide, directory
+        )
+    resp = await aretry_call(
+        "openai",
+        acall_with_limits,
+        "openai",
+        model,
+        client.responses.with_raw_response.create,
+        tokens=tokens,
+        **payload,
+    )
     return _extract_output_json(resp, directory=directory)
 
 
@@ -291,77 +480,211 @@ def generate_plan(
     roteiro_docx: Path,
     model: str,
     directory: str,
+    inline_input: str | None = None,
+    on_slide: SlideCallback | None = None,
 ) -> dict[str, Any]:
-    """Gera o plano de slides (JSON dict) a partir de conteúdo e roteiro."""
-    content_id = upload_file(client, content_docx)
-    roteiro_id = upload_file(client, roteiro_docx)
-    file_ids = [content_id, roteiro_id]
+    """
+    Gera o plano de slides (JSON dict) a partir de conteúdo e roteiro.
 
-    user_input = render_prompt_template(APP_DIR / USER_INPUT_SLIDES)
+    inline_input: input já com o texto dos DOCX (modo inline); dispensa os
+    uploads e o code_interpreter.
+    on_slide: recebe cada slide durante o streaming (ver call_llm).
+    """
+    if inline_input is not None:
+        file_ids: list[str] = []
+    else:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            content_future = executor.submit(upload_file, client, content_docx)
+            roteiro_future = executor.submit(upload_file, client, roteiro_docx)
+            file_ids = [content_future.result(), roteiro_future.result()]
 
-    log_step(
-        log,
-        directory,
-        "upload_file",
-        "Arquivos de conteudo + roteiro incluidos no pipeline",
+    return call_llm(
+        client=client,
+        model=model,
+        instructions=prompt_md,
+        file_ids=file_ids,
+        directory=directory,
+        user_input=_plan_user_input(directory, inline_input),
+        on_slide=on_slide,
     )
-    log_step(log, directory, "call_llm", "LLM processando dados")
 
-    return call_llm(
+
+async def agenerate_plan(
+    client: AsyncOpenAI,
+    prompt_md: str,
+    content_docx: Path,
+    roteiro_docx: Path,
+    model: str,
+    directory: str,
+    inline_input: str | None = None,
+    on_slide: SlideCallback | None = None,
+) -> dict[str, Any]:
+    """Versão assíncrona de generate_plan (uploads concorrentes no event loop)."""
+    file_ids: list[str] = []
+    if inline_input is None:
+        file_ids = list(
+            await asyncio.gather(
+                aupload_file(client, content_docx),
+                aupload_file(client, roteiro_docx),
+            )
+        )
+
+    return await acall_llm(
         client=client,
         model=model,
         instructions=prompt_md,
         file_ids=file_ids,
         directory=directory,
-        user_input=user_input,
+        user_input=_plan_user_input(directory, inline_input),
+        on_slide=on_slide,
     )
 
 
-def generate_plan_for_dir(
-    api_key_override: str | None,
+def _plan_user_input(directory: str, inline_input: str | None) -> str:
+    """Input do modelo: o texto inline, ou o template do modo files (anexos)."""
+    if inline_input is not None:
+        log_step(
+            log,
+            directory,
+            "call_llm",
+            "Texto de conteudo + roteiro incluido no input",
+        )
+        user_input = inline_input
+    else:
+        log_step(
+            log,
+            directory,
+            "upload_file",
+            "Arquivos de conteudo + roteiro incluidos no pipeline",
+        )
+        user_input = render_prompt_template(APP_DIR / USER_INPUT_SLIDES)
+    log_step(log, directory, "call_llm", "LLM processando dados")
+    return user_input
+
+
+def resolve_plan_mode(
+    plan_mode: str, content_docx: Path, roteiro_docx: Path, directory: str
+) -> tuple[str, tuple[str, str] | None]:
+    """
+    Resolve "auto" para "inline" ou "files" conforme o tamanho do texto.
+
+    Retorna (modo, textos). Em "auto" o texto (Markdown) de conteúdo e
+    roteiro é extraído junto com a contagem e devolvido para o input inline
+    não ler os DOCX de novo; nos demais modos, textos é None.
+    """
+    if plan_mode not in PLAN_MODES:
+        raise ValueError(f"Modo de plano invalido: {plan_mode}")
+    if plan_mode != "auto":
+        return plan_mode, None
+
+    content_text, content_stats = extract_docx_text_with_stats(
+        content_docx, markdown=True
+    )
+    roteiro_text, roteiro_stats = extract_docx_text_with_stats(
+        roteiro_docx, markdown=True
+    )
+    tokens = content_stats.tokens + roteiro_stats.tokens
+    mode = "inline" if tokens <= PLAN_INLINE_MAX_TOKENS else "files"
+    log_step(
+        log,
+        directory,
+        "resolve_plan_mode",
+        f"~{tokens} tokens de texto: modo {mode}",
+        level=logging.DEBUG,
+    )
+    return mode, (content_text, roteiro_text)
+
+
+def build_inline_input(
+    content_docx: Path,
+    roteiro_docx: Path,
+    texts: tuple[str, str] | None = None,
+) -> str:
+    """
+    Input do modo inline: texto (Markdown) do conteúdo tagueado e do roteiro.
+    `texts` reaproveita o que resolve_plan_mode já extraiu.
+    """
+    if texts is None:
+        texts = (
+            extract_docx_text(content_docx, markdown=True),
+            extract_docx_text(roteiro_docx, markdown=True),
+        )
+    content_text, roteiro_text = texts
+    return render_prompt_template(
+        APP_DIR / USER_INPUT_SLIDES_INLINE,
+        content_name=content_docx.name,
+        content_text=content_text,
+        roteiro_name=roteiro_docx.name,
+        roteiro_text=roteiro_text,
+    )
+
+
+def _lookup_plan(
     content_docx: Path,
     roteiro_docx: Path,
     prompt_md: str,
     model: str,
     output_json: Path,
-    force: bool = False,
-    strict_json: bool = False,
-    use_code_interpreter: bool = True,
-) -> dict[str, Any] | None:
+    force: bool,
+    directory: str,
+    mode: str = "files",
+) -> tuple[bool, dict[str, Any] | None, str]:
     """
-    Gera e salva o JSON do plano para um diretório de núcleo.
+    Procura um plano já gerado para as mesmas entradas.
 
-    strict_json e use_code_interpreter são mantidos por compatibilidade com callers.
+    Retorna (encontrado, plano, fingerprint). Com plano None e encontrado True,
+    o slides_plan.json do núcleo continua valendo (e mantém os caminhos das
+    imagens já injetados).
     """
-    if output_json.exists() and not force:
+    fingerprint = plan_fingerprint(content_docx, roteiro_docx, prompt_md, model, mode)
+    if force:
+        return False, None, fingerprint
+
+    if output_json.exists():
+        stored = read_plan_fingerprint(output_json)
+        if stored == fingerprint:
+            log_step(
+                log,
+                directory,
+                "generate_plan_for_dir",
+                "Plano existente (reaproveitado)",
+            )
+            return True, None, fingerprint
+        # Sem fingerprint (plano anterior ao cache) não há como saber se as
+        # entradas mudaram: trata como desatualizado.
         log_step(
             log,
-            content_docx.parent.name,
+            directory,
             "generate_plan_for_dir",
-            "Plano existente (reaproveitado)",
+            "Plano sem fingerprint, sera refeito"
+            if stored is None
+            else "Entradas do plano mudaram, plano sera refeito",
         )
-        return None
-
-    if api_key_override:
-        api_key = api_key_override.strip()
-    else:
-        with open("app/prompts/openai_api_key") as key_file:
-            api_key = key_file.read().strip()
 
-    client = OpenAI(api_key=api_key)
+    plan = get_plan_cache().get(fingerprint)
+    if plan is None:
+        return False, None, fingerprint
 
-    plan = generate_plan(
-        client=client,
-        prompt_md=prompt_md,
-        content_docx=content_docx,
-        roteiro_docx=roteiro_docx,
-        model=model,
-        directory=content_docx.parent.name,
+    log_step(
+        log,
+        directory,
+        "generate_plan_for_dir",
+        f"Plano recuperado do cache ({fingerprint[:12]})",
     )
+    output_json.write_text(
+        json.dumps(plan, ensure_ascii=False, indent=2),
+        encoding="utf-8",
+    )
+    write_plan_fingerprint(output_json, fingerprint)
+    return True, plan, fingerprint
+
 
+def _save_generated_plan(
+    plan: dict[str, Any], output_json: Path, fingerprint: str, directory: str
+) -> None:
     log_step(
         log,
-        content_docx.parent.name,
+        directory,
         "generate_plan_for_dir",
         "Formulando abstracao dos slides",
     )
@@ -370,13 +693,121 @@ def generate_plan_for_dir(
         json.dumps(plan, ensure_ascii=False, indent=2),
         encoding="utf-8",
     )
+    write_plan_fingerprint(output_json, fingerprint)
+    get_plan_cache().put(fingerprint, plan)
 
     log_step(
         log,
-        content_docx.parent.name,
+        directory,
         "generate_plan_for_dir",
         f"Plano gerado: {output_json}",
         level=logging.DEBUG,
     )
 
+
+def _prepare_plan(
+    content_docx: Path,
+    roteiro_docx: Path,
+    prompt_md: str,
+    model: str,
+    output_json: Path,
+    force: bool,
+    plan_mode: str,
+) -> tuple[str, bool, dict[str, Any] | None, str, str | None]:
+    """
+    Parte local de generate_plan_for_dir (sem chamadas à API): resolve o modo,
+    procura um plano já gerado e monta o input inline quando preciso.
+
+    Retorna (diretório, encontrado, plano, fingerprint, input inline).
+    """
+    directory = content_docx.parent.name
+    mode, texts = resolve_plan_mode(plan_mode, content_docx, roteiro_docx, directory)
+    found, cached, fingerprint = _lookup_plan(
+        content_docx, roteiro_docx, prompt_md, model, output_json, force, directory, mode
+    )
+    inline_input = None
+    if not found and mode == "inline":
+        inline_input = build_inline_input(content_docx, roteiro_docx, texts)
+    return directory, found, cached, fingerprint, inline_input
+
+
+def generate_plan_for_dir(
+    api_key_override: str | None,
+    content_docx: Path,
+    roteiro_docx: Path,
+    prompt_md: str,
+    model: str,
+    output_json: Path,
+    force: bool = False,
+    strict_json: bool = False,
+    use_code_interpreter: bool = True,
+    plan_mode: str = "files",
+    on_slide: SlideCallback | None = None,
+) -> dict[str, Any] | None:
+    """
+    Gera e salva o JSON do plano para um diretório de núcleo.
+
+    plan_mode: "files", "inline" ou "auto" (ver PLAN_MODES).
+    on_slide: se informado, o plano vem em streaming e cada slide completo é
+    entregue antes do fim (não é chamado quando o plano vem do cache).
+    strict_json e use_code_interpreter são mantidos por compatibilidade com callers.
+    """
+    directory, found, cached, fingerprint, inline_input = _prepare_plan(
+        content_docx, roteiro_docx, prompt_md, model, output_json, force, plan_mode
+    )
+    if found:
+        return cached
+
+    client = get_openai_client(api_key_override)
+
+    plan = generate_plan(
+        client=client,
+        prompt_md=prompt_md,
+        content_docx=content_docx,
+        roteiro_docx=roteiro_docx,
+        model=model,
+        directory=directory,
+        inline_input=inline_input,
+        on_slide=on_slide,
+    )
+    _save_generated_plan(plan, output_json, fingerprint, directory)
+    return plan
+
+
+async def agenerate_plan_for_dir(
+    client: AsyncOpenAI,
+    content_docx: Path,
+    roteiro_docx: Path,
+    prompt_md: str,
+    model: str,
+    output_json: Path,
+    force: bool = False,
+    plan_mode: str = "files",
+    on_slide: SlideCallback | None = None,
+) -> dict[str, Any] | None:
+    """Versão assíncrona de generate_plan_for_dir (cliente compartilhado)."""
+    directory, found, cached, fingerprint, inline_input = await asyncio.to_thread(
+        _prepare_plan,
+        content_docx,
+        roteiro_docx,
+        prompt_md,
+        model,
+        output_json,
+        force,
+        plan_mode,
+    )
+    if found:
+        return cached
+
+    plan = await agenerate_plan(
+        client=client,
+        prompt_md=prompt_md,
+        content_docx=content_docx,
+        roteiro_docx=roteiro_docx,
+        model=model,
+        directory=directory,
+        inline_input=inline_input,
+        on_slide=on_slide,
+    )
+    _save_generated_plan(plan, output_json, fingerprint, directory)
     return plan
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import hashlib
+import zipfile
+from pathlib import Path
+from typing import Iterable
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def sha256_file(path: Path) -> str:
+    """Calcula o SHA-256 do conteúdo de um arquivo (leitura em blocos)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sha256_text(text: str) -> str:
+    """Calcula o SHA-256 de um texto (UTF-8)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def package_sha256(path: Path) -> str:
+    """
+    Hash do conteúdo de um pacote OOXML (DOCX/PPTX), ignorando metadados do zip.
+
+    Salvar o mesmo documento duas vezes muda as datas das entradas do zip (e
+    portanto o SHA-256 do arquivo), mas não o hash das partes.
+    """
+    digest = hashlib.sha256()
+    with zipfile.ZipFile(path) as zf:
+        for name in sorted(zf.namelist()):
+            digest.update(name.encode("utf-8") + b"\0")
+            with zf.open(name) as fh:
+                for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def members_sha256(members: Iterable[tuple[str, bytes]]) -> str:
+    """package_sha256 calculado a partir dos membros (nome, bytes) em memória."""
+    digest = hashlib.sha256()
+    for name, data in sorted(members, key=lambda member: member[0]):
+        digest.update(name.encode("utf-8") + b"\0")
+        digest.update(data)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def combine_fingerprints(*parts: str) -> str:
+    """Combina fingerprints (e parâmetros) num único SHA-256."""
+    return sha256_text("\n".join(parts))
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+
+from app.config.paths import IMAGE_CACHE_DIR
+from app.hashing import combine_fingerprints
+
+log = logging.getLogger(__name__)
+
+
+def image_cache_key(
+    prompt: str,
+    *,
+    model: str,
+    size: str,
+    quality: str | None,
+    bg_hex: str,
+) -> str:
+    """Chave do PNG gerado: prompt renderizado + parâmetros da geração."""
+    return combine_fingerprints(prompt, model, size, quality or "", bg_hex)
+
+
+class ImageCache:
+    """
+    PNGs gerados indexados pelo conteúdo do pedido (um arquivo por chave).
+
+    Compartilhado entre núcleos e execuções: o mesmo prompt com o mesmo
+    modelo/tamanho/qualidade reaproveita a imagem em vez de chamar a API.
+    """
+
+    def __init__(self, root: Path = IMAGE_CACHE_DIR) -> None:
+        self.root = root
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.png"
+
+    def fetch(self, key: str, out_path: Path) -> bool:
+        """Copia a imagem da chave para out_path; False se não estiver no cache."""
+        cached = self._path(key)
+        if not cached.exists():
+            return False
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(cached, out_path)
+        return True
+
+    def store(self, key: str, png_path: Path) -> None:
+        cached = self._path(key)
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cached.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        shutil.copyfile(png_path, tmp)
+        os.replace(tmp, cached)
+
+
+_CACHE = ImageCache()
+
+
+def get_image_cache() -> ImageCache:
+    return _CACHE
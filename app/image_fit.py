@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import io
+import logging
+import math
+import os
+import threading
+from pathlib import Path
+
+from PIL import Image
+
+from app.config.paths import FITTED_IMAGE_CACHE_DIR
+from app.config.pipeline import RENDER_IMAGE_DPI, RENDER_IMAGE_JPEG_QUALITY
+from app.hashing import combine_fingerprints, sha256_file
+
+log = logging.getLogger(__name__)
+
+EMU_PER_INCH = 914400
+# Incrementar quando a forma de redimensionar/codificar mudar.
+FIT_VERSION = "1"
+
+
+def box_pixels(width_emu: int, height_emu: int, dpi: int) -> tuple[int, int]:
+    """Tamanho em pixels de uma caixa EMU na resolução informada."""
+    return (
+        max(1, math.ceil(width_emu / EMU_PER_INCH * dpi)),
+        max(1, math.ceil(height_emu / EMU_PER_INCH * dpi)),
+    )
+
+
+def _has_alpha(img: Image.Image) -> bool:
+    return img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+
+
+def _encode_candidates(img: Image.Image, jpeg_quality: int) -> list[tuple[str, bytes]]:
+    """PNG sempre; JPEG só sem transparência (onde a perda é aceitável)."""
+    candidates: list[tuple[str, bytes]] = []
+
+    png = io.BytesIO()
+    img.save(png, format="PNG", optimize=True)
+    candidates.append((".png", png.getvalue()))
+
+    if not _has_alpha(img):
+        jpeg = io.BytesIO()
+        img.convert("RGB").save(
+            jpeg, format="JPEG", quality=jpeg_quality, optimize=True, progressive=True
+        )
+        candidates.append((".jpg", jpeg.getvalue()))
+    return candidates
+
+
+class FittedImageCache:
+    """
+    Imagens redimensionadas para a caixa do placeholder, por hash da origem +
+    tamanho alvo. A mesma imagem na mesma caixa é processada uma única vez.
+    """
+
+    def __init__(self, root: Path = FITTED_IMAGE_CACHE_DIR) -> None:
+        self.root = root
+        self._lock = threading.Lock()
+        self._digests: dict[tuple[str, int, int], str] = {}
+
+    def _source_digest(self, src: Path) -> str:
+        stat = src.stat()
+        memo_key = (str(src.resolve()), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(memo_key)
+        if digest is None:
+            digest = sha256_file(src)
+            with self._lock:
+                self._digests[memo_key] = digest
+        return digest
+
+    def _lookup(self, key: str) -> Path | None:
+        for ext in (".png", ".jpg", ".src"):
+            path = self.root / key[:2] / f"{key}{ext}"
+            if path.exists():
+                return path
+        return None
+
+    def fit(
+        self,
+        src: Path,
+        width_emu: int,
+        height_emu: int,
+        *,
+        dpi: int = RENDER_IMAGE_DPI,
+        jpeg_quality: int = RENDER_IMAGE_JPEG_QUALITY,
+    ) -> Path:
+        """
+        Retorna o arquivo a embutir para src numa caixa width_emu x height_emu.
+
+        Reduz a imagem para o tamanho da caixa no DPI configurado (nunca
+        amplia) e escolhe o menor entre PNG e JPEG. Se nada disso ficar menor
+        que o original, o próprio src é usado.
+        """
+        target = box_pixels(width_emu, height_emu, dpi)
+        key = combine_fingerprints(
+            f"v{FIT_VERSION}",
+            self._source_digest(src),
+            f"{target[0]}x{target[1]}",
+            str(jpeg_quality),
+        )
+        cached = self._lookup(key)
+        if cached is not None:
+            return src if cached.suffix == ".src" else cached
+
+        try:
+            with Image.open(src) as img:
+                img.load()
+                size = (min(img.width, target[0]), min(img.height, target[1]))
+                fitted = img if size == img.size else img.resize(size, Image.LANCZOS)
+                if fitted.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+                    fitted = fitted.convert("RGBA" if _has_alpha(fitted) else "RGB")
+                ext, data = min(
+                    _encode_candidates(fitted, jpeg_quality), key=lambda c: len(c[1])
+                )
+        except (OSError, ValueError, Image.DecompressionBombError) as exc:
+            # Formatos vetoriais (EMF/WMF/SVG) e afins vão para o PPTX como estão.
+            log.debug(f"[image_fit] {src.name}: mantendo original ({exc})")
+            return src
+
+        src_size = src.stat().st_size
+        if len(data) >= src_size:
+            # Original já é o menor: registra para não reprocessar.
+            ext, data = ".src", b""
+        out_path = self.root / key[:2] / f"{key}{ext}"
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = out_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, out_path)
+
+        if ext == ".src":
+            return src
+        log.debug(
+            f"[image_fit] {src.name}: {src_size} -> {len(data)} bytes "
+            f"({size[0]}x{size[1]}{ext})"
+        )
+        return out_path
+
+
+_CACHE = FittedImageCache()
+
+
+def fit_image_to_box(src: Path, width_emu: int, height_emu: int) -> Path:
+    """Atalho para o cache compartilhado do processo."""
+    return _CACHE.fit(src, width_emu, height_emu)
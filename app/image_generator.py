@@ -1,13 +1,16 @@
 from __future__ import annotations
 
+import asyncio
 import base64
 import logging
 import random
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, as_completed
+from functools import partial
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from PIL import Image  # <- add Pillow
 
 from app.config.paths import APP_DIR, USER_INPUT_IMAGE
@@ -18,8 +21,13 @@ from app.config.pipeline import (
     OPENAI_IMAGE_QUALITY,
 )
 from app.debug_payload import dump_payload
+from app.hashing import sha256_text
+from app.image_cache import get_image_cache, image_cache_key
 from app.logging_utils import log_step
+from app.openai_clients import get_openai_client
 from app.prompt_utils import render_prompt_template
+from app.rate_limit import acall_with_limits, call_with_limits
+from app.retry import NON_IDEMPOTENT_POLICY, aretry_call, retry_call
 
 log = logging.getLogger(__name__)
 
@@ -27,9 +35,18 @@ LIGHT_BG = "#F2F4F7"
 DARK_BG = "#111827"
 
 
+def _variation_rng(slide_id: str, intent: str) -> random.Random:
+    """RNG semeado pelo slide: o mesmo slide/intent gera sempre o mesmo prompt."""
+    seed = int(sha256_text(f"{slide_id}\n{intent}")[:16], 16)
+    return random.Random(seed)
+
+
 def _img_prompt_from_slide(slide: dict[str, Any]) -> tuple[str, str, str, str, str]:
     """
     Retorna (prompt, theme, layout, style_profile, variation_id)
+
+    As variações são determinísticas (semente = slide_id + intent), o que
+    permite reaproveitar imagens já geradas pelo cache.
     """
     title = (slide.get("title") or "").strip()
     lead = (slide.get("lead") or "").strip()
@@ -44,14 +61,15 @@ def _img_prompt_from_slide(slide: dict[str, Any]) -> tuple[str, str, str, str, s
         f"- {b}" for b in bullets[:6] if isinstance(b, str) and b.strip()
     )
 
-    theme = random.choice(["light", "dark"])
-    layout = random.choice(["linear", "radial", "grid", "split", "layered"])
-    style_profile = random.choice(
+    rng = _variation_rng((slide.get("slide_id") or "").strip(), intent)
+    theme = rng.choice(["light", "dark"])
+    layout = rng.choice(["linear", "radial", "grid", "split", "layered"])
+    style_profile = rng.choice(
         ["corporate_flat", "technical_glow", "architectural_blueprint"]
     )
 
     # "variador invisível" (não precisa fazer sentido, só mudar embedding)
-    variation_id = str(random.randint(100000, 999999))
+    variation_id = str(rng.randint(100000, 999999))
 
     prompt = render_prompt_template(
         APP_DIR / USER_INPUT_IMAGE,
@@ -94,16 +112,14 @@ def _flatten_transparency(png_path: Path, *, bg_hex: str) -> None:
     out.save(png_path, format="PNG", optimize=True)
 
 
-def generate_image_png(
-    client: OpenAI,
+def _build_image_payload(
     prompt: str,
     out_path: Path,
     *,
-    model: str = OPENAI_IMAGE_MODEL,
-    size: str = OPENAI_IMAGE_SIZE,
-    quality: str | None = OPENAI_IMAGE_QUALITY,
-    bg_hex: str = LIGHT_BG,
-) -> None:
+    model: str,
+    size: str,
+    quality: str | None,
+) -> dict[str, Any]:
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
     payload: dict[str, Any] = {
@@ -123,8 +139,10 @@ def generate_image_png(
         f"request_dump={dump_path}",
         level=logging.DEBUG,
     )
+    return payload
+
 
-    img = client.images.generate(**payload)
+def _write_image_png(img: Any, out_path: Path, *, bg_hex: str) -> None:
     image_bytes = base64.b64decode(img.data[0].b64_json)
     out_path.write_bytes(image_bytes)
 
@@ -132,30 +150,125 @@ def generate_image_png(
     _flatten_transparency(out_path, bg_hex=bg_hex)
 
 
-def materialize_generated_images_for_plan(
-    plan: dict[str, Any],
+def _log_cache_hit(out_path: Path, key: str) -> None:
+    log_step(
+        log,
+        out_path.parent.name,
+        "generate_image_png",
+        f"Imagem reaproveitada do cache ({key[:12]}): {out_path.name}",
+        level=logging.DEBUG,
+    )
+
+
+def _image_request(
+    prompt: str,
+    out_path: Path,
+    *,
+    model: str,
+    size: str,
+    quality: str | None,
+    bg_hex: str,
+) -> tuple[str, dict[str, Any]] | None:
+    """
+    Chave do cache e payload da geração; None se a imagem veio do cache (já
+    copiada para out_path).
+    """
+    key = image_cache_key(prompt, model=model, size=size, quality=quality, bg_hex=bg_hex)
+    if get_image_cache().fetch(key, out_path):
+        _log_cache_hit(out_path, key)
+        return None
+    return key, _build_image_payload(
+        prompt, out_path, model=model, size=size, quality=quality
+    )
+
+
+def _save_generated_image(img: Any, out_path: Path, key: str, *, bg_hex: str) -> None:
+    _write_image_png(img, out_path, bg_hex=bg_hex)
+    get_image_cache().store(key, out_path)
+
+
+def generate_image_png(
+    client: OpenAI,
+    prompt: str,
+    out_path: Path,
     *,
-    course_dir: Path,
-    nucleus_name: str,
-    assets_dirname: str = "assets",
     model: str = OPENAI_IMAGE_MODEL,
     size: str = OPENAI_IMAGE_SIZE,
     quality: str | None = OPENAI_IMAGE_QUALITY,
-    max_workers: int | None = None,
-    generate_images: bool = True,
-    api_key_override: str | None = None,
-) -> tuple[int, dict]:
+    bg_hex: str = LIGHT_BG,
+) -> None:
+    request = _image_request(
+        prompt, out_path, model=model, size=size, quality=quality, bg_hex=bg_hex
+    )
+    if request is None:
+        return
+    key, payload = request
+    img = retry_call(
+        "openai",
+        call_with_limits,
+        "openai",
+        model,
+        client.images.with_raw_response.generate,
+        policy=NON_IDEMPOTENT_POLICY,
+        **payload,
+    )
+    _save_generated_image(img, out_path, key, bg_hex=bg_hex)
+
+
+async def agenerate_image_png(
+    client: AsyncOpenAI,
+    prompt: str,
+    out_path: Path,
+    *,
+    model: str = OPENAI_IMAGE_MODEL,
+    size: str = OPENAI_IMAGE_SIZE,
+    quality: str | None = OPENAI_IMAGE_QUALITY,
+    bg_hex: str = LIGHT_BG,
+) -> None:
+    """Versão assíncrona de generate_image_png."""
+    request = await asyncio.to_thread(
+        _image_request,
+        prompt,
+        out_path,
+        model=model,
+        size=size,
+        quality=quality,
+        bg_hex=bg_hex,
+    )
+    if request is None:
+        return
+    key, payload = request
+    img = await aretry_call(
+        "openai",
+        acall_with_limits,
+        "openai",
+        model,
+        client.images.with_raw_response.generate,
+        policy=NON_IDEMPOTENT_POLICY,
+        **payload,
+    )
+    await asyncio.to_thread(_save_generated_image, img, out_path, key, bg_hex=bg_hex)
+
+
+ImageTask = tuple[dict[str, Any], str, Path, str, str, str]
+
+
+def _collect_image_tasks(
+    plan: dict[str, Any],
+    *,
+    course_dir: Path,
+    nucleus_name: str,
+    assets_dirname: str,
+) -> list[ImageTask] | None:
     """
-    Para cada slide standard com image.source="generated":
-      - gera PNG
-      - escreve em {course_dir}/{assets_dirname}/{nucleus_name}/gen_{slide_id}.png
-      - injeta image.path no JSON (mantendo source/intent)
+    Lista (slide, rel, out_path, prompt, slide_id, bg_hex) dos slides que
+    precisam de imagem gerada. Retorna None se o plano não tiver slides.
     """
     slides = plan.get("slides") or []
     if not isinstance(slides, list):
-        return 0, {"model": model, "size": size, "count": 0, "cost_usd": 0}
+        return None
 
-    tasks: list[tuple[dict[str, Any], str, Path, str, str, str]] = []
+    tasks: list[ImageTask] = []
     for slide in slides:
         if not isinstance(slide, dict):
             continue
@@ -189,47 +302,92 @@ def materialize_generated_images_for_plan(
         bg_hex = LIGHT_BG if theme == "light" else DARK_BG
 
         tasks.append((slide, rel, out_path, prompt, slide_id, bg_hex))
+    return tasks
 
-    if not tasks:
-        return 0, {"model": model, "size": size, "count": 0, "cost_usd": 0}
 
-    if not generate_images:
-        reused = 0
-        for slide, rel, out_path, _prompt, _slide_id, _bg_hex in tasks:
-            if out_path.exists():
-                image = slide.get("image") or {}
-                if isinstance(image, dict):
-                    image["path"] = rel
-                    slide["image"] = image
-                reused += 1
-        return reused, {"model": model, "size": size, "count": 0, "cost_usd": 0}
-
-    def _generate_one(prompt: str, out_path: Path, slide_id: str, bg_hex: str) -> None:
-        log_step(
-            log,
-            nucleus_name,
-            "generate_image_png",
-            (
-                "request: "
-                f"model={model} "
-                f"size={size} "
-                f"quality={quality or 'default'} "
-                f"slide_id={slide_id} "
-                f"bg={bg_hex} "
-                f"prompt_len={len(prompt)} "
-                f'prompt_preview="{_preview_text(prompt)}"'
-            ),
-            level=logging.DEBUG,
-        )
+def _assign_image_path(slide: dict[str, Any], rel: str) -> None:
+    image = slide.get("image") or {}
+    if isinstance(image, dict):
+        image["path"] = rel
+        slide["image"] = image
+
+
+def _reuse_existing_images(tasks: list[ImageTask]) -> int:
+    reused = 0
+    for slide, rel, out_path, _prompt, _slide_id, _bg_hex in tasks:
+        if out_path.exists():
+            _assign_image_path(slide, rel)
+            reused += 1
+    return reused
+
+
+def _log_image_request(
+    nucleus_name: str,
+    task: ImageTask,
+    *,
+    model: str,
+    size: str,
+    quality: str | None,
+) -> None:
+    _slide, _rel, _out_path, prompt, slide_id, bg_hex = task
+    log_step(
+        log,
+        nucleus_name,
+        "generate_image_png",
+        (
+            "request: "
+            f"model={model} "
+            f"size={size} "
+            f"quality={quality or 'default'} "
+            f"slide_id={slide_id} "
+            f"bg={bg_hex} "
+            f"prompt_len={len(prompt)} "
+            f'prompt_preview="{_preview_text(prompt)}"'
+        ),
+        level=logging.DEBUG,
+    )
+
+
+def _generate_task(
+    task: ImageTask,
+    *,
+    nucleus_name: str,
+    model: str,
+    size: str,
+    quality: str | None,
+    api_key_override: str | None,
+) -> None:
+    slide, rel, out_path, prompt, _slide_id, bg_hex = task
+    _log_image_request(nucleus_name, task, model=model, size=size, quality=quality)
+
+    client = get_openai_client(api_key_override)
+    generate_image_png(
+        client=client,
+        prompt=prompt,
+        out_path=out_path,
+        model=model,
+        size=size,
+        quality=quality,
+        bg_hex=bg_hex,
+    )
+    _assign_image_path(slide, rel)
 
-        if api_key_override:
-            api_key = api_key_override.strip()
-        else:
-            with open("app/prompts/openai_api_key") as key_file:
-                api_key = key_file.read().strip()
 
-        client = OpenAI(api_key=api_key)
-        generate_image_png(
+async def _agenerate_task(
+    task: ImageTask,
+    *,
+    client: AsyncOpenAI,
+    semaphore: asyncio.Semaphore,
+    nucleus_name: str,
+    model: str,
+    size: str,
+    quality: str | None,
+) -> None:
+    """Versão assíncrona de _generate_task (limitada pelo semáforo do provedor)."""
+    slide, rel, out_path, prompt, _slide_id, bg_hex = task
+    async with semaphore:
+        _log_image_request(nucleus_name, task, model=model, size=size, quality=quality)
+        await agenerate_image_png(
             client=client,
             prompt=prompt,
             out_path=out_path,
@@ -238,26 +396,348 @@ def materialize_generated_images_for_plan(
             quality=quality,
             bg_hex=bg_hex,
         )
+    _assign_image_path(slide, rel)
+
+
+def _pending_image_tasks(
+    plan: dict[str, Any],
+    *,
+    course_dir: Path,
+    nucleus_name: str,
+    assets_dirname: str,
+    generate_images: bool,
+) -> tuple[list[ImageTask], int]:
+    """
+    Tarefas de imagem a gerar e quantas imagens existentes foram
+    reaproveitadas (sem generate_images, só reaproveita e não gera nada).
+    """
+    tasks = _collect_image_tasks(
+        plan,
+        course_dir=course_dir,
+        nucleus_name=nucleus_name,
+        assets_dirname=assets_dirname,
+    ) or []
+    if not generate_images:
+        return [], _reuse_existing_images(tasks)
+    return tasks, 0
+
+
+def _image_stats(model: str, size: str, count: int) -> dict:
+    return {"model": model, "size": size, "count": count, "cost_usd": 0}
+
+
+def _image_jobs(
+    tasks: list[ImageTask],
+    *,
+    nucleus_name: str,
+    model: str,
+    size: str,
+    quality: str | None,
+    api_key_override: str | None,
+) -> list[Callable[[], None]]:
+    return [
+        partial(
+            _generate_task,
+            task,
+            nucleus_name=nucleus_name,
+            model=model,
+            size=size,
+            quality=quality,
+            api_key_override=api_key_override,
+        )
+        for task in tasks
+    ]
+
 
+def build_image_jobs(
+    plan: dict[str, Any],
+    *,
+    course_dir: Path,
+    nucleus_name: str,
+    assets_dirname: str = "assets",
+    model: str = OPENAI_IMAGE_MODEL,
+    size: str = OPENAI_IMAGE_SIZE,
+    quality: str | None = OPENAI_IMAGE_QUALITY,
+    api_key_override: str | None = None,
+) -> list[Callable[[], None]]:
+    """
+    Retorna uma chamada independente por imagem pendente do plano.
+
+    Permite que um pool de imagens compartilhado (entre núcleos) execute as
+    gerações sem que cada núcleo crie seu próprio ThreadPoolExecutor.
+    """
+    tasks = _collect_image_tasks(
+        plan,
+        course_dir=course_dir,
+        nucleus_name=nucleus_name,
+        assets_dirname=assets_dirname,
+    )
+    return _image_jobs(
+        tasks or [],
+        nucleus_name=nucleus_name,
+        model=model,
+        size=size,
+        quality=quality,
+        api_key_override=api_key_override,
+    )
+
+
+def materialize_generated_images_for_plan(
+    plan: dict[str, Any],
+    *,
+    course_dir: Path,
+    nucleus_name: str,
+    assets_dirname: str = "assets",
+    model: str = OPENAI_IMAGE_MODEL,
+    size: str = OPENAI_IMAGE_SIZE,
+    quality: str | None = OPENAI_IMAGE_QUALITY,
+    max_workers: int | None = None,
+    generate_images: bool = True,
+    api_key_override: str | None = None,
+) -> tuple[int, dict]:
+    """
+    Para cada slide standard com image.source="generated":
+      - gera PNG
+      - escreve em {course_dir}/{assets_dirname}/{nucleus_name}/gen_{slide_id}.png
+      - injeta image.path no JSON (mantendo source/intent)
+    """
+    tasks, reused = _pending_image_tasks(
+        plan,
+        course_dir=course_dir,
+        nucleus_name=nucleus_name,
+        assets_dirname=assets_dirname,
+        generate_images=generate_images,
+    )
+    if not tasks:
+        return reused, _image_stats(model, size, 0)
+
+    jobs = _image_jobs(
+        tasks,
+        nucleus_name=nucleus_name,
+        model=model,
+        size=size,
+        quality=quality,
+        api_key_override=api_key_override,
+    )
     generated = 0
     workers = max_workers if max_workers is not None else IMAGE_WORKERS
 
     with ThreadPoolExecutor(max_workers=workers) as executor:
-        future_map = {
-            executor.submit(_generate_one, prompt, out_path, slide_id, bg_hex): (
-                slide,
-                rel,
-            )
-            for slide, rel, out_path, prompt, slide_id, bg_hex in tasks
-        }
-
-        for future in as_completed(future_map):
-            slide, rel = future_map[future]
+        futures = [executor.submit(job) for job in jobs]
+        for future in as_completed(futures):
             future.result()
-            image = slide.get("image") or {}
-            if isinstance(image, dict):
-                image["path"] = rel
-                slide["image"] = image
             generated += 1
 
-    return generated, {"model": model, "size": size, "count": generated, "cost_usd": 0}
+    return generated, _image_stats(model, size, generated)
+
+
+async def amaterialize_generated_images_for_plan(
+    plan: dict[str, Any],
+    *,
+    client: AsyncOpenAI,
+    semaphore: asyncio.Semaphore,
+    course_dir: Path,
+    nucleus_name: str,
+    assets_dirname: str = "assets",
+    model: str = OPENAI_IMAGE_MODEL,
+    size: str = OPENAI_IMAGE_SIZE,
+    quality: str | None = OPENAI_IMAGE_QUALITY,
+    generate_images: bool = True,
+) -> tuple[int, dict]:
+    """
+    Versão assíncrona de materialize_generated_images_for_plan.
+
+    Cada imagem é uma corrotina; o semáforo limita as chamadas simultâneas
+    ao provedor de imagens em todo o processo (não por núcleo).
+    """
+    tasks, reused = _pending_image_tasks(
+        plan,
+        course_dir=course_dir,
+        nucleus_name=nucleus_name,
+        assets_dirname=assets_dirname,
+        generate_images=generate_images,
+    )
+    if not tasks:
+        return reused, _image_stats(model, size, 0)
+
+    await asyncio.gather(
+        *(
+            _agenerate_task(
+                task,
+                client=client,
+                semaphore=semaphore,
+                nucleus_name=nucleus_name,
+                model=model,
+                size=size,
+                quality=quality,
+            )
+            for task in tasks
+        )
+    )
+    return len(tasks), _image_stats(model, size, len(tasks))
+
+
+class _SlidePrefetch:
+    """Base dos pré-geradores: tarefas de imagem por slide, sem repetição."""
+
+    def __init__(
+        self,
+        *,
+        course_dir: Path,
+        nucleus_name: str,
+        assets_dirname: str = "assets",
+        model: str = OPENAI_IMAGE_MODEL,
+        size: str = OPENAI_IMAGE_SIZE,
+        quality: str | None = OPENAI_IMAGE_QUALITY,
+    ) -> None:
+        self.course_dir = course_dir
+        self.nucleus_name = nucleus_name
+        self.assets_dirname = assets_dirname
+        self.model = model
+        self.size = size
+        self.quality = quality
+        self._seen: set[tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+    def _claim(self, slide: dict[str, Any]) -> list[ImageTask]:
+        """Tarefas do slide ainda não agendadas (slide_id + prompt)."""
+        # Sem slide_id o nome do arquivo depende da posição no plano final.
+        if not (slide.get("slide_id") or "").strip():
+            return []
+        tasks = _collect_image_tasks(
+            {"slides": [slide]},
+            course_dir=self.course_dir,
+            nucleus_name=self.nucleus_name,
+            assets_dirname=self.assets_dirname,
+        )
+        claimed: list[ImageTask] = []
+        with self._lock:
+            for task in tasks or []:
+                key = (task[4], task[3])
+                if key not in self._seen:
+                    self._seen.add(key)
+                    claimed.append(task)
+        return claimed
+
+    def _count(self, results: list[BaseException | None]) -> int:
+        for exc in results:
+            if exc is not None:
+                log_step(
+                    log,
+                    self.nucleus_name,
+                    "generate_image_png",
+                    f"Pre-geracao falhou (sera refeita): {exc}",
+                    level=logging.WARNING,
+                )
+        return sum(1 for exc in results if exc is None)
+
+
+class ImagePrefetcher(_SlidePrefetch):
+    """
+    Gera as imagens dos slides à medida que o plano chega (streaming do LLM).
+
+    Cada slide entregue pelo stream vira uma tarefa no pool; as imagens vão
+    para gen_<slide_id>.png e para o cache de imagens. Depois, a
+    materialização normal do plano completo as encontra no cache sem chamar a
+    API de novo. Falhas aqui só são registradas: a materialização refaz.
+
+    Com `executor`, as tarefas vão para esse pool (ex.: o pool "images" do
+    StageScheduler) em vez de um pool próprio por núcleo.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_workers: int | None = None,
+        executor: Executor | None = None,
+        api_key_override: str | None = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.api_key_override = api_key_override
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers if max_workers is not None else IMAGE_WORKERS
+        )
+        self._futures: list[Future] = []
+
+    def submit(self, slide: dict[str, Any]) -> int:
+        """Agenda a imagem do slide (se houver); retorna quantas foram agendadas."""
+        tasks = self._claim(slide)
+        for task in tasks:
+            self._futures.append(
+                self._executor.submit(
+                    _generate_task,
+                    task,
+                    nucleus_name=self.nucleus_name,
+                    model=self.model,
+                    size=self.size,
+                    quality=self.quality,
+                    api_key_override=self.api_key_override,
+                )
+            )
+        return len(tasks)
+
+    def wait(self) -> int:
+        """Aguarda as gerações em andamento; retorna quantas deram certo."""
+        results = [future.exception() for future in self._futures]
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+        return self._count(results)
+
+    def when_done(self) -> Future:
+        """Future concluído quando todas as gerações agendadas terminarem."""
+        done: Future = Future()
+        futures = list(self._futures)
+        if not futures:
+            done.set_result(True)
+            return done
+        lock = threading.Lock()
+        pending = [len(futures)]
+
+        def _one(_: Future) -> None:
+            with lock:
+                pending[0] -= 1
+                if pending[0]:
+                    return
+            done.set_result(True)
+
+        for future in futures:
+            future.add_done_callback(_one)
+        return done
+
+
+class AsyncImagePrefetcher(_SlidePrefetch):
+    """ImagePrefetcher do engine async: uma tarefa por imagem no event loop."""
+
+    def __init__(
+        self, *, client: AsyncOpenAI, semaphore: asyncio.Semaphore, **kwargs: Any
+    ) -> None:
+        super().__init__(**kwargs)
+        self.client = client
+        self.semaphore = semaphore
+        self._tasks: list[asyncio.Task] = []
+
+    async def _generate(self, task: ImageTask) -> None:
+        await _agenerate_task(
+            task,
+            client=self.client,
+            semaphore=self.semaphore,
+            nucleus_name=self.nucleus_name,
+            model=self.model,
+            size=self.size,
+            quality=self.quality,
+        )
+
+    def submit(self, slide: dict[str, Any]) -> int:
+        """Agenda a imagem do slide (chamado de dentro do event loop)."""
+        tasks = self._claim(slide)
+        for task in tasks:
+            self._tasks.append(asyncio.create_task(self._generate(task)))
+        return len(tasks)
+
+    async def wait(self) -> int:
+        results = await asyncio.gather(*self._tasks, return_exceptions=True)
+        return self._count(
+            [r if isinstance(r, BaseException) else None for r in results]
+        )
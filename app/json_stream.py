@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+
+class JsonArrayStream:
+    """
+    Parser incremental de JSON: recebe o texto em pedaços (streaming do LLM) e
+    devolve cada item do array `key` do objeto raiz assim que ele fecha.
+
+    Só rastreia strings/escapes e a pilha de {}/[]; cada pedaço é varrido uma
+    única vez e só o trecho do item (ou da chave) em aberto é guardado, então o
+    custo é linear no tamanho da resposta. Cada item completo é decodificado
+    com json.loads; `text` junta os pedaços para o parse final do documento.
+    """
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self._chunks: list[str] = []
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+        self._key_parts: list[str] | None = None
+        self._last_string: str | None = None
+        self._root_key: str | None = None
+        self._in_array = False
+        self._item_parts: list[str] | None = None
+        self.items_seen = 0
+
+    @property
+    def text(self) -> str:
+        if len(self._chunks) > 1:
+            self._chunks[:] = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def feed(self, chunk: str) -> list[Any]:
+        """Adiciona um pedaço do texto e retorna os itens que ficaram completos."""
+        if not chunk:
+            return []
+        self._chunks.append(chunk)
+        items: list[Any] = []
+        stack = self._stack
+        # Início, neste pedaço, da chave/item que ainda está aberto.
+        key_from = 0 if self._key_parts is not None else None
+        item_from = 0 if self._item_parts is not None else None
+
+        for i, ch in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._key_parts is not None:
+                        self._key_parts.append(chunk[key_from:i])
+                        self._last_string = "".join(self._key_parts)
+                        self._key_parts = None
+                        key_from = None
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if len(stack) == 1:
+                    self._key_parts = []
+                    key_from = i + 1
+            elif ch == ":":
+                if len(stack) == 1:
+                    self._root_key = self._last_string
+            elif ch in "{[":
+                if len(stack) == 1 and ch == "[" and self._root_key == self.key:
+                    self._in_array = True
+                elif self._in_array and len(stack) == 2 and self._item_parts is None:
+                    self._item_parts = []
+                    item_from = i
+                stack.append(ch)
+            elif ch in "}]":
+                if stack:
+                    stack.pop()
+                if self._in_array and len(stack) == 2 and self._item_parts is not None:
+                    self._item_parts.append(chunk[item_from : i + 1])
+                    items.append(self._decode("".join(self._item_parts)))
+                    self._item_parts = None
+                    item_from = None
+                elif self._in_array and len(stack) == 1:
+                    self._in_array = False
+
+        if self._key_parts is not None:
+            self._key_parts.append(chunk[key_from:])
+        if self._item_parts is not None:
+            self._item_parts.append(chunk[item_from:])
+        return [item for item in items if item is not None]
+
+    def _decode(self, raw: str) -> Any:
+        self.items_seen += 1
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
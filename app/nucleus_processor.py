@@ -2,42 +2,76 @@ from __future__ import annotations
 
 import logging
 import json
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
+from app.build_manifest import BuildManifest
 from app.config.paths import ASSETS_DIRNAME, PLAN_JSON_NAME
+from app.config.pipeline import RENDER_IMAGE_DPI, RENDER_IMAGE_JPEG_QUALITY
 from app.docx_tagger import create_tagged_docx, find_content_docx, find_roteiro_docx
-from app.gpt_planner import generate_plan_for_dir
+from app.gpt_planner import SlideCallback, generate_plan_for_dir
+from app.gamma.batcher import GammaBatcher
+from app.gamma.poller import get_export_poller
 from app.gamma.orchestrator import (
-    materialize_generated_images_for_plan as gamma_materialize_generated_images,
+    submit_generated_images_for_plan as gamma_submit_generated_images,
 )
 from app.image_generator import (
+    AsyncImagePrefetcher,
+    ImagePrefetcher,
     materialize_generated_images_for_plan as openai_materialize_generated_images,
 )
+from app.hashing import combine_fingerprints, package_sha256, sha256_file
+from app.image_fit import FIT_VERSION
 from app.pptx_renderer import load_plan, render_from_plan
-from app.slide import validate_plan
+from app.render_pool import RenderPool
+from app.slide import validate_plan, validate_slide
+from app.template_mapping import map_path_for_template
 from app.logging_utils import log_step
 
 
 log = logging.getLogger(__name__)
 
 
-def process_nucleus_dir(
-    api_key_override: str | None,
-    image_workers: int | None,
+@dataclass
+class NucleusJob:
+    """Estado de um núcleo ao longo das etapas tag -> JSON -> imagens -> render."""
+
+    nucleus_dir: Path
+    course_dir: Path
+    content_docx: Path
+    roteiro_docx: Path
+    tagged_docx: Path
+    plan_json: Path
+    output_pptx: Path
+    force: bool = False
+    plan: dict[str, Any] | None = None
+    gamma_deducted: int = 0
+    images_inputs: str | None = None
+    image_prefetch: ImagePrefetcher | None = None
+
+    @property
+    def name(self) -> str:
+        return self.nucleus_dir.name
+
+    @property
+    def manifest(self) -> BuildManifest:
+        return BuildManifest(self.nucleus_dir)
+
+
+def prepare_nucleus(
     nucleus_dir: Path,
     course_dir: Path,
-    prompt_md: str,
-    model: str,
-    image_model: str,
-    image_size: str,
-    image_quality: str | None,
-    template_path: Path,
     force: bool,
-    use_code_interpreter: bool = False,
-    generate_images: bool = True,
-    image_provider: str = "openai",
-):
-    """Processa um núcleo: tag -> JSON -> render."""
+    tagged_in_split: bool = False,
+) -> NucleusJob | None:
+    """
+    Localiza os DOCX do núcleo e gera o DOCX tagueado (etapa CPU).
+
+    tagged_in_split: o split fundido já gerou o DOCX tagueado nesta execução;
+    vale o manifesto mesmo com force.
+    """
     content_docx = find_content_docx(nucleus_dir)
     roteiro_docx = find_roteiro_docx(nucleus_dir)
 
@@ -48,13 +82,25 @@ def process_nucleus_dir(
             "process_nucleus_dir",
             "Documentos de conteudo/roteiro nao encontrados",
         )
-        return
+        return None
 
-    tagged_docx = nucleus_dir / f"{nucleus_dir.name}_tagged.docx"
+    job = NucleusJob(
+        nucleus_dir=nucleus_dir,
+        course_dir=course_dir,
+        content_docx=content_docx,
+        roteiro_docx=roteiro_docx,
+        tagged_docx=nucleus_dir / f"{nucleus_dir.name}_tagged.docx",
+        plan_json=nucleus_dir / PLAN_JSON_NAME,
+        output_pptx=nucleus_dir / f"{nucleus_dir.name}.pptx",
+        force=force,
+    )
     assets_dir = course_dir / ASSETS_DIRNAME / nucleus_dir.name
     tag_prefix = f"{ASSETS_DIRNAME}/{nucleus_dir.name}"
+    tag_inputs = combine_fingerprints(package_sha256(content_docx), tag_prefix)
 
-    if tagged_docx.exists() and not force:
+    if (not force or tagged_in_split) and job.manifest.up_to_date(
+        "tag", tag_inputs, [job.tagged_docx], adopt_existing=True
+    ):
         log_step(
             log,
             nucleus_dir.name,
@@ -64,10 +110,11 @@ def process_nucleus_dir(
     else:
         created = create_tagged_docx(
             source_docx=content_docx,
-            tagged_docx=tagged_docx,
+            tagged_docx=job.tagged_docx,
             assets_dir=assets_dir,
             tag_prefix=tag_prefix,
         )
+        job.manifest.record("tag", tag_inputs, [job.tagged_docx])
         log_step(
             log,
             nucleus_dir.name,
@@ -81,86 +128,206 @@ def process_nucleus_dir(
             f"Tagged DOCX gerado com {created} imagem(ns)",
             level=logging.DEBUG,
         )
+    return job
 
-    plan_json = nucleus_dir / PLAN_JSON_NAME
-    plan = generate_plan_for_dir(
-        api_key_override=api_key_override,
-        content_docx=tagged_docx,
-        roteiro_docx=roteiro_docx,
-        prompt_md=prompt_md,
-        model=model,
-        output_json=plan_json,
-        force=force,
-        strict_json=True,
-        use_code_interpreter=use_code_interpreter,
-    )
-    if plan is None and plan_json.exists():
-        plan = load_plan(plan_json)
+
+def accept_plan(job: NucleusJob, plan: dict[str, Any] | None) -> bool:
+    """
+    Registra o plano no job (carregando o JSON existente se plan=None) e valida.
+
+    Retorna False quando não há plano para seguir.
+    """
+    if plan is None and job.plan_json.exists():
+        plan = load_plan(job.plan_json)
 
     if plan is None:
         log_step(
             log,
-            nucleus_dir.name,
+            job.name,
             "generate_plan_for_dir",
             "Plano nao gerado",
         )
-        return {"gamma_deducted": 0}
+        return False
 
-    errors = validate_plan(plan, assets_base=course_dir)
+    errors = validate_plan(plan, assets_base=job.course_dir)
     if errors:
         for err in errors:
-            log.error(f"[{nucleus_dir.name}] {err}")
+            log.error(f"[{job.name}] {err}")
         raise SystemExit("Validação do plano falhou.")
 
-    log_step(
-        log,
-        nucleus_dir.name,
-        "materialize_generated_images_for_plan",
-        "Gerando imagens",
+    job.plan = plan
+    return True
+
+
+def image_prefetcher(
+    job: NucleusJob,
+    *,
+    stream_plan: bool,
+    generate_images: bool,
+    image_provider: str,
+    image_model: str,
+    image_size: str,
+    image_quality: str | None,
+    image_workers: int | None = None,
+    image_executor: Executor | None = None,
+    api_key_override: str | None = None,
+) -> ImagePrefetcher | None:
+    """Pré-gerador de imagens para o plano em streaming (só OpenAI)."""
+    if not stream_plan or not generate_images or image_provider != "openai":
+        return None
+    return ImagePrefetcher(
+        course_dir=job.course_dir,
+        nucleus_name=job.name,
+        assets_dirname=ASSETS_DIRNAME,
+        model=image_model,
+        size=image_size,
+        quality=image_quality,
+        max_workers=image_workers,
+        executor=image_executor,
+        api_key_override=api_key_override,
     )
-    created_gamma = 0
-    gamma_deducted = 0
-    if image_provider == "gamma":
-        created_gamma, gamma_deducted = gamma_materialize_generated_images(
-            plan,
-            course_dir=course_dir,
-            nucleus_name=nucleus_dir.name,
-            assets_dirname=ASSETS_DIRNAME,
-            generate_images=generate_images,
-        )
-        if generate_images:
-            log_step(
-                log,
-                nucleus_dir.name,
-                "materialize_generated_images_for_plan",
-                f"Imagens Gamma: {created_gamma} (creditos: {gamma_deducted})",
-                level=logging.DEBUG,
-            )
-        else:
+
+
+def streamed_slide_handler(
+    job: NucleusJob, prefetcher: ImagePrefetcher | AsyncImagePrefetcher
+) -> SlideCallback:
+    """Valida cada slide que chega no stream do plano e agenda a imagem dele."""
+
+    def _on_slide(idx: int, slide: dict[str, Any]) -> None:
+        errors = validate_slide(slide, job.course_dir, idx)
+        if errors:
             log_step(
                 log,
-                nucleus_dir.name,
-                "materialize_generated_images_for_plan",
-                f"Imagens Gamma reaproveitadas: {created_gamma}",
+                job.name,
+                "generate_plan_for_dir",
+                f"Slide {idx} do stream sem pre-geracao: {errors[0]}",
                 level=logging.DEBUG,
             )
+            return
+        prefetcher.submit(slide)
 
-    created_openai = openai_materialize_generated_images(
-        plan,
-        course_dir=course_dir,
-        nucleus_name=nucleus_dir.name,
+    return _on_slide
+
+
+def finish_image_prefetch(job: NucleusJob) -> None:
+    """Aguarda as imagens pré-geradas durante o streaming do plano."""
+    prefetcher, job.image_prefetch = job.image_prefetch, None
+    if prefetcher is None:
+        return
+    done = prefetcher.wait()
+    log_step(
+        log,
+        job.name,
+        "materialize_generated_images_for_plan",
+        f"Imagens pre-geradas durante o plano: {done}",
+        level=logging.DEBUG,
+    )
+
+
+def plan_nucleus(
+    job: NucleusJob,
+    *,
+    api_key_override: str | None,
+    prompt_md: str,
+    model: str,
+    force: bool,
+    use_code_interpreter: bool = False,
+    plan_mode: str = "files",
+    prefetcher: ImagePrefetcher | None = None,
+) -> bool:
+    """
+    Gera (ou reaproveita) e valida o plano de slides do núcleo.
+
+    Com prefetcher, o plano vem em streaming e as imagens dos primeiros slides
+    começam a ser geradas antes do fim da resposta (ver finish_image_prefetch).
+    """
+    job.image_prefetch = prefetcher
+    try:
+        plan = generate_plan_for_dir(
+            api_key_override=api_key_override,
+            content_docx=job.tagged_docx,
+            roteiro_docx=job.roteiro_docx,
+            prompt_md=prompt_md,
+            model=model,
+            output_json=job.plan_json,
+            force=force,
+            strict_json=True,
+            use_code_interpreter=use_code_interpreter,
+            plan_mode=plan_mode,
+            on_slide=streamed_slide_handler(job, prefetcher) if prefetcher else None,
+        )
+        accepted = accept_plan(job, plan)
+    except BaseException:
+        finish_image_prefetch(job)
+        raise
+    if not accepted:
+        finish_image_prefetch(job)
+    return accepted
+
+
+def materialize_gamma_images(
+    job: NucleusJob,
+    *,
+    generate_images: bool,
+    gamma_batcher: GammaBatcher | None = None,
+) -> None:
+    """Gera as imagens do plano via Gamma."""
+    submit_gamma_images(
+        job, generate_images=generate_images, gamma_batcher=gamma_batcher
+    ).result()
+
+
+def submit_gamma_images(
+    job: NucleusJob,
+    *,
+    generate_images: bool,
+    gamma_batcher: GammaBatcher | None = None,
+) -> Future:
+    """
+    Envia os cards do núcleo ao Gamma e devolve um Future concluído quando as
+    imagens estão extraídas (a espera fica com o poller compartilhado).
+    """
+    submitted = gamma_submit_generated_images(
+        job.plan,
+        course_dir=job.course_dir,
+        nucleus_name=job.name,
         assets_dirname=ASSETS_DIRNAME,
-        model=image_model,
-        size=image_size,
-        quality=image_quality,
         generate_images=generate_images,
-        api_key_override=api_key_override,
-        max_workers=image_workers,
+        batcher=gamma_batcher,
+    )
+    return get_export_poller().then(
+        submitted,
+        lambda result: _record_gamma_images(job, result, generate_images),
     )
+
+
+def _record_gamma_images(
+    job: NucleusJob, result: tuple[int, int], generate_images: bool
+) -> None:
+    created_gamma, job.gamma_deducted = result
     if generate_images:
         log_step(
             log,
-            nucleus_dir.name,
+            job.name,
+            "materialize_generated_images_for_plan",
+            f"Imagens Gamma: {created_gamma} (creditos: {job.gamma_deducted})",
+            level=logging.DEBUG,
+        )
+    else:
+        log_step(
+            log,
+            job.name,
+            "materialize_generated_images_for_plan",
+            f"Imagens Gamma reaproveitadas: {created_gamma}",
+            level=logging.DEBUG,
+        )
+
+
+def log_openai_images(job: NucleusJob, created_openai: Any, generate_images: bool) -> None:
+    if generate_images:
+        log_step(
+            log,
+            job.name,
             "materialize_generated_images_for_plan",
             f"Imagens OpenAI: {created_openai}",
             level=logging.DEBUG,
@@ -168,33 +335,231 @@ def process_nucleus_dir(
     else:
         log_step(
             log,
-            nucleus_dir.name,
+            job.name,
             "materialize_generated_images_for_plan",
             f"Imagens OpenAI reaproveitadas: {created_openai}",
             level=logging.DEBUG,
         )
-    plan_json.write_text(
-        json.dumps(plan, ensure_ascii=False, indent=2), encoding="utf-8"
+
+
+def _image_outputs(job: NucleusJob) -> list[Path]:
+    """Saídas da etapa de imagens: o plano com os paths e as imagens geradas."""
+    outputs = [job.plan_json]
+    for slide in (job.plan or {}).get("slides") or []:
+        image = slide.get("image") if isinstance(slide, dict) else None
+        if not isinstance(image, dict) or image.get("source") != "generated":
+            continue
+        rel_path = image.get("path")
+        if isinstance(rel_path, str) and rel_path.strip():
+            outputs.append(job.course_dir / rel_path)
+    return outputs
+
+
+def images_up_to_date(
+    job: NucleusJob,
+    *,
+    image_provider: str,
+    image_model: str,
+    image_size: str,
+    image_quality: str | None,
+    generate_images: bool,
+) -> bool:
+    """
+    Indica se as imagens do plano atual já foram materializadas.
+
+    Também fixa no job o fingerprint da etapa, registrado depois por save_plan.
+    """
+    job.images_inputs = combine_fingerprints(
+        job.manifest.inputs("plan") or "",
+        image_provider,
+        image_model,
+        image_size,
+        image_quality or "",
+        str(generate_images),
     )
+    if job.force:
+        return False
+    if not job.manifest.up_to_date("images", job.images_inputs, _image_outputs(job)):
+        return False
+    log_step(
+        log,
+        job.name,
+        "materialize_generated_images_for_plan",
+        "Imagens atualizadas (reaproveitadas)",
+    )
+    return True
+
+
+def save_plan(job: NucleusJob) -> None:
+    """Persiste o plano (com os paths das imagens geradas) no núcleo."""
+    job.plan_json.write_text(
+        json.dumps(job.plan, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    if job.images_inputs is not None:
+        job.manifest.record("images", job.images_inputs, _image_outputs(job))
+
+
+def materialize_images(
+    job: NucleusJob,
+    *,
+    api_key_override: str | None,
+    image_workers: int | None,
+    image_model: str,
+    image_size: str,
+    image_quality: str | None,
+    generate_images: bool,
+    image_provider: str,
+    gamma_batcher: GammaBatcher | None = None,
+) -> None:
+    """Gera as imagens pendentes do plano e salva o JSON atualizado."""
+    finish_image_prefetch(job)
+    if images_up_to_date(
+        job,
+        image_provider=image_provider,
+        image_model=image_model,
+        image_size=image_size,
+        image_quality=image_quality,
+        generate_images=generate_images,
+    ):
+        return
 
-    output_pptx = nucleus_dir / f"{nucleus_dir.name}.pptx"
     log_step(
         log,
-        nucleus_dir.name,
+        job.name,
+        "materialize_generated_images_for_plan",
+        "Gerando imagens",
+    )
+    if image_provider == "gamma":
+        materialize_gamma_images(
+            job, generate_images=generate_images, gamma_batcher=gamma_batcher
+        )
+
+    created_openai = openai_materialize_generated_images(
+        job.plan,
+        course_dir=job.course_dir,
+        nucleus_name=job.name,
+        assets_dirname=ASSETS_DIRNAME,
+        model=image_model,
+        size=image_size,
+        quality=image_quality,
+        generate_images=generate_images,
+        api_key_override=api_key_override,
+        max_workers=image_workers,
+    )
+    log_openai_images(job, created_openai, generate_images)
+    save_plan(job)
+
+
+def render_nucleus(
+    job: NucleusJob, template_path: Path, render_pool: RenderPool | None = None
+) -> None:
+    """
+    Renderiza o PPTX do núcleo a partir do plano (etapa CPU).
+
+    Com render_pool, o render roda num processo worker (fora do GIL).
+    """
+    map_path = map_path_for_template(template_path)
+    render_inputs = combine_fingerprints(
+        job.manifest.outputs_fingerprint("images") or sha256_file(job.plan_json),
+        sha256_file(template_path),
+        sha256_file(map_path) if map_path.exists() else "",
+        f"fit=v{FIT_VERSION}:{RENDER_IMAGE_DPI}:{RENDER_IMAGE_JPEG_QUALITY}",
+    )
+    if not job.force and job.manifest.up_to_date(
+        "render", render_inputs, [job.output_pptx]
+    ):
+        log_step(
+            log,
+            job.name,
+            "render_from_plan",
+            "Apresentacao atualizada (reaproveitada)",
+        )
+        return
+
+    log_step(
+        log,
+        job.name,
         "render_from_plan",
         "Gerando apresentacao baseada no template",
     )
-    render_from_plan(
-        plan=plan,
-        template_path=template_path,
-        output_path=output_pptx,
-        assets_base=course_dir,
-        title=None,
-    )
+    if render_pool is not None:
+        render_pool.render(job.plan, job.output_pptx, job.course_dir)
+    else:
+        render_from_plan(
+            plan=job.plan,
+            template_path=template_path,
+            output_path=job.output_pptx,
+            assets_base=job.course_dir,
+            title=None,
+        )
+    job.manifest.record("render", render_inputs, [job.output_pptx])
     log_step(
         log,
-        nucleus_dir.name,
+        job.name,
         "render_from_plan",
-        f"PPTX gerado: {output_pptx}",
+        f"PPTX gerado: {job.output_pptx}",
         level=logging.DEBUG,
     )
+
+
+def process_nucleus_dir(
+    api_key_override: str | None,
+    image_workers: int | None,
+    nucleus_dir: Path,
+    course_dir: Path,
+    prompt_md: str,
+    model: str,
+    image_model: str,
+    image_size: str,
+    image_quality: str | None,
+    template_path: Path,
+    force: bool,
+    use_code_interpreter: bool = False,
+    generate_images: bool = True,
+    image_provider: str = "openai",
+    render_pool: RenderPool | None = None,
+    tagged_in_split: bool = False,
+    plan_mode: str = "files",
+    stream_plan: bool = False,
+    gamma_batcher: GammaBatcher | None = None,
+):
+    """Processa um núcleo: tag -> JSON -> render."""
+    job = prepare_nucleus(nucleus_dir, course_dir, force, tagged_in_split)
+    if job is None:
+        return
+
+    has_plan = plan_nucleus(
+        job,
+        api_key_override=api_key_override,
+        prompt_md=prompt_md,
+        model=model,
+        force=force,
+        use_code_interpreter=use_code_interpreter,
+        plan_mode=plan_mode,
+        prefetcher=image_prefetcher(
+            job,
+            stream_plan=stream_plan,
+            generate_images=generate_images,
+            image_provider=image_provider,
+            image_model=image_model,
+            image_size=image_size,
+            image_quality=image_quality,
+            image_workers=image_workers,
+            api_key_override=api_key_override,
+        ),
+    )
+    if not has_plan:
+        return {"gamma_deducted": 0}
+
+    materialize_images(
+        job,
+        api_key_override=api_key_override,
+        image_workers=image_workers,
+        image_model=image_model,
+        image_size=image_size,
+        image_quality=image_quality,
+        generate_images=generate_images,
+        image_provider=image_provider,
+        gamma_batcher=gamma_batcher,
+    )
+    render_nucleus(job, template_path, render_pool)
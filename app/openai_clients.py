@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import importlib.util
+import logging
+import threading
+from typing import Any
+
+from openai import (
+    DEFAULT_CONNECTION_LIMITS,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+    OpenAI,
+)
+
+from app.config.paths import APP_DIR, OPENAI_KEY_PATH
+from app.config.pipeline import (
+    OPENAI_HTTP_KEEPALIVE_SECONDS,
+    OPENAI_HTTP_MAX_CONNECTIONS,
+    OPENAI_HTTP_MAX_KEEPALIVE,
+)
+from app.hashing import sha256_text
+
+log = logging.getLogger(__name__)
+
+# HTTP/2 só é habilitado se o pacote h2 estiver instalado (httpx[http2]).
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_CLIENTS: dict[str, OpenAI] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def resolve_openai_api_key(api_key_override: str | None = None) -> str:
+    """Retorna a chave informada ou a lida de app/prompts/openai_api_key."""
+    if api_key_override:
+        return api_key_override.strip()
+    return (APP_DIR / OPENAI_KEY_PATH).read_text(encoding="utf-8").strip()
+
+
+def _http_limits() -> Any:
+    """
+    Limites do pool no tipo Limits do cliente HTTP do próprio SDK, sem
+    depender de importar o httpx diretamente.
+    """
+    return type(DEFAULT_CONNECTION_LIMITS)(
+        max_connections=OPENAI_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=OPENAI_HTTP_KEEPALIVE_SECONDS,
+    )
+
+
+def get_openai_client(api_key_override: str | None = None) -> OpenAI:
+    """
+    Retorna o cliente OpenAI compartilhado para a chave (um por chave/processo).
+
+    O cliente é thread-safe; reaproveitá-lo mantém conexões keep-alive (e TLS)
+    entre planos, uploads e imagens de todos os núcleos.
+    """
+    api_key = resolve_openai_api_key(api_key_override)
+    cache_key = sha256_text(api_key)
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(cache_key)
+        if client is None:
+            client = OpenAI(
+                api_key=api_key,
+                max_retries=0,
+                http_client=DefaultHttpxClient(
+                    http2=HTTP2_AVAILABLE,
+                    limits=_http_limits(),
+                ),
+            )
+            _CLIENTS[cache_key] = client
+            log.debug(f"[openai_clients] Cliente criado (http2={HTTP2_AVAILABLE})")
+        return client
+
+
+def create_async_openai_client(api_key_override: str | None = None) -> AsyncOpenAI:
+    """
+    Cria um AsyncOpenAI com o mesmo pool HTTP ajustado.
+
+    Não é cacheado: o cliente assíncrono fica preso ao event loop em que foi
+    usado, então cada execução do engine async cria e fecha o seu.
+    """
+    return AsyncOpenAI(
+        api_key=resolve_openai_api_key(api_key_override),
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(
+            http2=HTTP2_AVAILABLE,
+            limits=_http_limits(),
+        ),
+    )
+
+
+def close_openai_clients() -> None:
+    """Fecha e descarta os clientes compartilhados (ex.: fim do processo)."""
+    with _CLIENTS_LOCK:
+        clients = list(_CLIENTS.values())
+        _CLIENTS.clear()
+    for client in clients:
+        client.close()
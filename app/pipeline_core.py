@@ -1,18 +1,15 @@
 import logging
-import time
 from pathlib import Path
 
 from app.browser import open_document
 from app.gamma_api import (
-    generate_content_from_template,
+    GammaSession,
     get_gamma_url,
-    get_generation_id,
-    get_generation_status,
-    get_status,
-    parse_json,
     write_document_urls,
     write_last_response,
 )
+from app.gamma.ledger import get_generation_ledger
+from app.gamma_engine import GenerationEngine
 from app.gpt_cards import generate_cards_for_root
 
 
@@ -24,48 +21,10 @@ logging.basicConfig(
 log = logging.getLogger(__name__)
 
 
-def poll_generations(
-    app_dir: Path,
-    generation_map: dict[str, Path],
-    max_wait_minutes: int,
-):
-    if not generation_map:
-        log.info("Nenhuma geração para consultar.")
-        return
-
-    start = time.time()
-    pending = set(generation_map.keys())
-
-    while pending:
-        completed = set()
-        for generation_id in list(pending):
-            response = get_generation_status(app_dir, generation_id)
-            payload = parse_json(response)
-            status = get_status(payload)
-            status_lower = status.lower()
-            log.info(f"Status {generation_id}: {status}")
-
-            if status_lower == "completed":
-                url = get_gamma_url(payload)
-                material_dir = generation_map[generation_id]
-                write_document_urls(material_dir, generation_id, url)
-                open_document(url)
-                completed.add(generation_id)
-            elif status_lower in {"failed", "error", "canceled", "cancelled"}:
-                raise RuntimeError(f"Falha na geração {generation_id}: {status}")
-
-        pending -= completed
-        if not pending:
-            break
-
-        if max_wait_minutes > 0:
-            elapsed = time.time() - start
-            if elapsed > max_wait_minutes * 60:
-                raise TimeoutError("Tempo máximo de espera excedido.")
-
-        time.sleep(2)
-
-    log.info("Todas as gerações estão concluídas.")
+def _document_ready(generation_id: str, material_dir: Path, payload: dict) -> None:
+    url = get_gamma_url(payload)
+    write_document_urls(material_dir, generation_id, url)
+    open_document(url)
 
 
 def resolve_path(base_dir: Path, value: str) -> Path:
@@ -107,25 +66,32 @@ def run_pipeline(args):
         log.info("Nenhum arquivo de cards encontrado.")
         return
 
-    generation_map: dict[str, Path] = {}
+    jobs: list[tuple[Path, Path]] = []
     for card_path in cards_files:
-        log.info(f"Enviando cards para Gamma: {card_path.name}")
         material_name = card_path.stem.replace("_card", "")
         material_dir = course_dir / material_name
         url_marker = material_dir / "gamma_urls.txt"
         if url_marker.exists() and not args.force:
             log.info(f"Pulando Gamma (já existe gamma_urls.txt): {material_dir.name}")
             continue
-        response = generate_content_from_template(app_dir, card_path, args.folder_id)
-        payload = parse_json(response)
-        generation_id = get_generation_id(payload)
-        write_last_response(
-            app_dir / "output" / course_dir.name, response, generation_id
+        jobs.append((card_path, material_dir))
+
+    if not jobs:
+        log.info("Nenhuma geração para consultar.")
+        return
+
+    # Envios em paralelo; cada generationId é consultado assim que é criado.
+    output_dir = app_dir / "output" / course_dir.name
+    with GammaSession(app_dir) as gamma:
+        engine = GenerationEngine(
+            gamma,
+            on_completed=_document_ready,
+            on_submitted=lambda generation_id, response: write_last_response(
+                output_dir, response, generation_id
+            ),
+            max_wait_minutes=args.max_wait_minutes,
+            ledger=get_generation_ledger(),
         )
-        generation_map[generation_id] = material_dir
+        engine.run(jobs, args.folder_id)
 
-    poll_generations(
-        app_dir=app_dir,
-        generation_map=generation_map,
-        max_wait_minutes=args.max_wait_minutes,
-    )
+    log.info("Todas as gerações estão concluídas.")
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+from app.build_manifest import BuildManifest
+from app.config.paths import (
+    APP_DIR,
+    PLAN_CACHE_DIR,
+    PLAN_SCHEMA,
+    USER_INPUT_SLIDES,
+    USER_INPUT_SLIDES_INLINE,
+)
+from app.hashing import combine_fingerprints, package_sha256, sha256_file, sha256_text
+
+log = logging.getLogger(__name__)
+
+# Incrementar quando o formato do plano (ou a forma de gerá-lo) mudar.
+PLAN_CACHE_VERSION = "1"
+
+
+def plan_fingerprint(
+    content_docx: Path,
+    roteiro_docx: Path,
+    prompt_md: str,
+    model: str,
+    mode: str = "files",
+) -> str:
+    """
+    Fingerprint de todas as entradas que determinam o plano do LLM.
+
+    Inclui o conteúdo (tagueado) e o roteiro, o prompt, o schema de saída, o
+    template do input do usuário e o modelo. Qualquer mudança gera outro hash.
+    O modo "inline" (texto no input) entra no hash com o seu template; o modo
+    "files" mantém o hash dos planos já em cache.
+    """
+    inline_parts = (
+        ("mode=inline", sha256_file(APP_DIR / USER_INPUT_SLIDES_INLINE))
+        if mode == "inline"
+        else ()
+    )
+    return combine_fingerprints(
+        f"v{PLAN_CACHE_VERSION}",
+        package_sha256(content_docx),
+        package_sha256(roteiro_docx),
+        sha256_text(prompt_md or ""),
+        sha256_file(APP_DIR / PLAN_SCHEMA),
+        sha256_file(APP_DIR / USER_INPUT_SLIDES),
+        model,
+        *inline_parts,
+    )
+
+
+def read_plan_fingerprint(output_json: Path) -> str | None:
+    """Fingerprint das entradas que geraram o plano salvo no núcleo."""
+    return BuildManifest(output_json.parent).inputs("plan")
+
+
+def write_plan_fingerprint(output_json: Path, fingerprint: str) -> None:
+    # O JSON do plano é reescrito depois com os paths das imagens, então a
+    # etapa "plan" registra só as entradas; a saída fica na etapa "images".
+    BuildManifest(output_json.parent).record("plan", fingerprint)
+
+
+class PlanCache:
+    """Planos do LLM indexados pelo fingerprint das entradas (um JSON por plano)."""
+
+    def __init__(self, root: Path = PLAN_CACHE_DIR) -> None:
+        self.root = root
+
+    def _path(self, fingerprint: str) -> Path:
+        return self.root / f"{fingerprint}.json"
+
+    def get(self, fingerprint: str) -> dict[str, Any] | None:
+        path = self._path(fingerprint)
+        if not path.exists():
+            return None
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            log.warning(f"[plan_cache] Entrada ilegivel, ignorando: {path.name}")
+            return None
+        return data if isinstance(data, dict) else None
+
+    def put(self, fingerprint: str, plan: dict[str, Any]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self._path(fingerprint)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(plan, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+_CACHE = PlanCache()
+
+
+def get_plan_cache() -> PlanCache:
+    return _CACHE
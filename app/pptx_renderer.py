@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import io
 import json
+import threading
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
 from pptx import Presentation
 
+from app.hashing import combine_fingerprints, sha256_file
 from app.slide import get_slide_class
 from app.template_mapping import load_mapping, map_path_for_template
 
@@ -24,6 +28,97 @@ def load_plan(plan_path: Path) -> dict[str, Any]:
     return json.loads(plan_path.read_text(encoding="utf-8"))
 
 
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """
+    Template pronto para renderizar: pacote já sem slides sentinela (em bytes),
+    mapping carregado e índices de layout por nome pré-calculados.
+    """
+
+    digest: str
+    data: bytes
+    mapping: dict[str, Any]
+    layouts: dict[str, tuple[int, int]] = field(default_factory=dict)
+
+    def open(self) -> Presentation:
+        """Cria uma cópia independente do template para um novo deck."""
+        return Presentation(io.BytesIO(self.data))
+
+    def layout(self, prs: Presentation, name: str):
+        """Equivalente a find_layout_by_name, usando o índice pré-calculado."""
+        position = self.layouts.get(name.strip())
+        if position is None:
+            return None
+        master_idx, layout_idx = position
+        return prs.slide_masters[master_idx].slide_layouts[layout_idx]
+
+    def layout_name(self, key: str) -> str:
+        return self.mapping.get("layouts", {}).get(key, key)
+
+    def placeholders(self, layout_name: str) -> dict[str, int]:
+        return self.mapping.get("idx", {}).get(layout_name, {})
+
+
+def compile_template(template_path: Path, map_path: Path, digest: str) -> CompiledTemplate:
+    """Abre o template uma vez, remove os sentinelas e indexa os layouts."""
+    prs = Presentation(str(template_path))
+    mapping = load_mapping(map_path)
+
+    sentinel_layouts = set(mapping.get("layouts", {}).values())
+    if sentinel_layouts:
+        delete_sentinel_slides(prs, sentinel_layouts)
+
+    layouts: dict[str, tuple[int, int]] = {}
+    for master_idx, master in enumerate(prs.slide_masters):
+        for layout_idx, layout in enumerate(master.slide_layouts):
+            layouts.setdefault(layout.name.strip(), (master_idx, layout_idx))
+
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    return CompiledTemplate(
+        digest=digest, data=buffer.getvalue(), mapping=mapping, layouts=layouts
+    )
+
+
+_COMPILED: dict[str, CompiledTemplate] = {}
+_COMPILED_LOCK = threading.Lock()
+# (caminho, tamanho, mtime_ns) -> sha256: evita reler o template a cada render.
+_FILE_DIGESTS: dict[tuple[str, int, int], str] = {}
+
+
+def _file_digest(path: Path) -> str:
+    stat = path.stat()
+    memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+    with _COMPILED_LOCK:
+        digest = _FILE_DIGESTS.get(memo_key)
+    if digest is None:
+        digest = sha256_file(path)
+        with _COMPILED_LOCK:
+            _FILE_DIGESTS[memo_key] = digest
+    return digest
+
+
+def get_compiled_template(template_path: Path) -> CompiledTemplate:
+    """
+    Retorna o template compilado (cache por processo).
+
+    A chave é o hash do template + mapping: editar qualquer um dos dois gera
+    uma nova compilação.
+    """
+    map_path = map_path_for_template(template_path)
+    if not map_path.exists():
+        raise SystemExit(
+            f"Mapping não encontrado: {map_path.name}. Gere o mapping antes de renderizar."
+        )
+    digest = combine_fingerprints(_file_digest(template_path), _file_digest(map_path))
+    with _COMPILED_LOCK:
+        compiled = _COMPILED.get(digest)
+        if compiled is None:
+            compiled = compile_template(template_path, map_path, digest)
+            _COMPILED[digest] = compiled
+        return compiled
+
+
 def render_from_plan(
     plan: dict[str, Any],
     template_path: Path,
@@ -32,32 +127,23 @@ def render_from_plan(
     title: str | None = None,
 ) -> None:
     """Renderiza o PPTX final a partir do JSON e do template."""
-    prs = Presentation(str(template_path))
-    map_path = map_path_for_template(template_path)
-    if not map_path.exists():
-        raise SystemExit(
-            f"Mapping não encontrado: {map_path.name}. Gere o mapping antes de renderizar."
-        )
-    mapping = load_mapping(map_path)
+    compiled = get_compiled_template(template_path)
+    prs = compiled.open()
 
     default_layout = prs.slide_layouts[0]
-    layout_title_name = mapping.get("layouts", {}).get("title", "title")
-    layout_standard_name = mapping.get("layouts", {}).get("standard", "standard")
-    layout_code_name = mapping.get("layouts", {}).get("code", "code")
-
-    layout_title = find_layout_by_name(prs, layout_title_name) or default_layout
-    layout_standard = find_layout_by_name(prs, layout_standard_name) or default_layout
-    layout_code = find_layout_by_name(prs, layout_code_name) or layout_standard
+    layout_title_name = compiled.layout_name("title")
+    layout_standard_name = compiled.layout_name("standard")
+    layout_code_name = compiled.layout_name("code")
 
-    sentinel_layouts = set(mapping.get("layouts", {}).values())
-    if sentinel_layouts:
-        delete_sentinel_slides(prs, sentinel_layouts)
+    layout_title = compiled.layout(prs, layout_title_name) or default_layout
+    layout_standard = compiled.layout(prs, layout_standard_name) or default_layout
+    layout_code = compiled.layout(prs, layout_code_name) or layout_standard
 
     if title:
         title_cls = get_slide_class("title")
         slide_capa = prs.slides.add_slide(layout_title)
         if title_cls:
-            ph_map = mapping.get("idx", {}).get("title", {})
+            ph_map = compiled.placeholders("title")
             title_cls.render({"title": title}, slide_capa, assets_base, ph_map)
 
     for slide in plan.get("slides", []):
@@ -74,14 +160,12 @@ def render_from_plan(
         elif layout_name == "standard":
             layout = layout_standard
         elif layout_name:
-            layout = find_layout_by_name(
-                prs, mapping.get("layouts", {}).get(layout_name, layout_name)
-            ) or layout_standard
+            layout = compiled.layout(prs, compiled.layout_name(layout_name)) or layout_standard
         else:
             layout = layout_standard
 
         dst_slide = prs.slides.add_slide(layout)
-        ph_map = mapping.get("idx", {}).get(layout_name, {})
+        ph_map = compiled.placeholders(layout_name)
         slide_cls.render(slide, dst_slide, assets_base, ph_map)
 
     output_path.parent.mkdir(parents=True, exist_ok=True)
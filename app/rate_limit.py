@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Mapping
+
+from app.config.pipeline import RATE_LIMITS
+
+log = logging.getLogger(__name__)
+
+# Estimativa usada para dimensionar pedidos (tokens ~ caracteres / 4).
+CHARS_PER_TOKEN = 4
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: str | None) -> float | None:
+    """Converte durações no formato OpenAI ("20ms", "1s", "6m0s") em segundos."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(num) * _DURATION_UNITS[unit] for num, unit in parts)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Interpreta Retry-After em segundos ou como data HTTP."""
+    if not value:
+        return None
+    seconds = parse_duration(value)
+    if seconds is not None:
+        return max(0.0, seconds)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def estimate_tokens(*texts: str | None) -> int:
+    """Estimativa grosseira de tokens (~4 caracteres por token)."""
+    return sum(len(t or "") for t in texts) // CHARS_PER_TOKEN
+
+
+class TokenBucket:
+    """
+    Balde de tokens por reserva: cada pedido desconta do saldo (que pode ficar
+    negativo) e recebe o tempo que precisa esperar até o saldo ser reposto.
+    """
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        self.updated = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+
+    def reserve(self, amount: float, now: float) -> float:
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def set_limit(self, per_minute: float, now: float) -> None:
+        self._refill(now)
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self.tokens = min(self.tokens, self.capacity)
+
+    def cap_remaining(self, remaining: float, now: float) -> None:
+        self._refill(now)
+        self.tokens = min(self.tokens, float(remaining))
+
+
+class RateLimiter:
+    """Limite de requisições (RPM) e tokens (TPM) de um provedor/modelo."""
+
+    def __init__(self, name: str, rpm: float | None = None, tpm: float | None = None) -> None:
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            wait = max(0.0, self.blocked_until - now)
+            if self.requests:
+                wait = max(wait, self.requests.reserve(1, now))
+            if self.tokens and tokens > 0:
+                wait = max(wait, self.tokens.reserve(tokens, now))
+        return wait
+
+    def acquire(self, tokens: int = 0) -> None:
+        """Bloqueia até haver saldo para uma requisição com `tokens` tokens."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            log.debug(f"[rate_limit] {self.name}: aguardando {wait:.2f}s")
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int = 0) -> None:
+        """Versão assíncrona de acquire (não bloqueia o event loop)."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            log.debug(f"[rate_limit] {self.name}: aguardando {wait:.2f}s")
+            await asyncio.sleep(wait)
+
+    def observe(self, headers: Mapping[str, str] | None, status_code: int | None = None) -> None:
+        """Ajusta os baldes com Retry-After e os headers x-ratelimit-* da resposta."""
+        if not headers:
+            return
+        now = time.monotonic()
+        with self._lock:
+            retry_after = parse_retry_after(headers.get("retry-after"))
+            if retry_after is None and status_code == 429:
+                retry_after = parse_duration(headers.get("x-ratelimit-reset-requests"))
+            if retry_after is not None and (status_code in (None, 429, 503)):
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+                log.warning(
+                    f"[rate_limit] {self.name}: limite atingido, pausando {retry_after:.1f}s"
+                )
+
+            for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+                limit = _as_float(headers.get(f"x-ratelimit-limit-{kind}"))
+                remaining = _as_float(headers.get(f"x-ratelimit-remaining-{kind}"))
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if bucket is None and limit:
+                    bucket = TokenBucket(limit)
+                    setattr(self, kind, bucket)
+                if bucket is None:
+                    continue
+                if limit and limit != bucket.capacity:
+                    bucket.set_limit(limit, now)
+                if remaining is not None:
+                    bucket.cap_remaining(remaining, now)
+                    if remaining <= 0 and reset:
+                        self.blocked_until = max(self.blocked_until, now + reset)
+
+
+def _as_float(value: str | None) -> float | None:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+_LIMITERS: dict[str, RateLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(provider: str, model: str | None = None) -> RateLimiter:
+    """
+    Retorna o limitador compartilhado (por processo) do provedor/modelo.
+
+    A configuração vem de RATE_LIMITS, procurando "provedor:modelo" e depois
+    "provedor".
+    """
+    key = f"{provider}:{model}" if model else provider
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(key)
+        if limiter is None:
+            cfg = RATE_LIMITS.get(key) or RATE_LIMITS.get(provider) or {}
+            limiter = RateLimiter(key, rpm=cfg.get("rpm"), tpm=cfg.get("tpm"))
+            _LIMITERS[key] = limiter
+        return limiter
+
+
+def _error_response(exc: BaseException) -> tuple[Mapping[str, str] | None, int | None]:
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None, None
+    return getattr(response, "headers", None), getattr(response, "status_code", None)
+
+
+def call_with_limits(
+    provider: str,
+    model: str | None,
+    raw_fn: Callable[..., Any],
+    /,
+    *args: Any,
+    tokens: int = 0,
+    **kwargs: Any,
+) -> Any:
+    """
+    Chama um endpoint OpenAI via `with_raw_response`, respeitando o limitador.
+
+    Os headers da resposta (ou do erro) realimentam o limitador e o objeto
+    parseado é retornado.
+    """
+    limiter = get_rate_limiter(provider, model)
+    limiter.acquire(tokens)
+    try:
+        raw = raw_fn(*args, **kwargs)
+    except Exception as exc:
+        limiter.observe(*_error_response(exc))
+        raise
+    limiter.observe(raw.headers)
+    return raw.parse()
+
+
+async def acall_with_limits(
+    provider: str,
+    model: str | None,
+    raw_fn: Callable[..., Any],
+    /,
+    *args: Any,
+    tokens: int = 0,
+    **kwargs: Any,
+) -> Any:
+    """Versão assíncrona de call_with_limits."""
+    limiter = get_rate_limiter(provider, model)
+    await limiter.aacquire(tokens)
+    try:
+        raw = await raw_fn(*args, **kwargs)
+    except Exception as exc:
+        limiter.observe(*_error_response(exc))
+        raise
+    limiter.observe(raw.headers)
+    return raw.parse()
+
+
+def request_with_limits(
+    provider: str, send: Callable[..., Any], /, *args: Any, **kwargs: Any
+) -> Any:
+    """Executa uma chamada `requests` (ex.: Gamma) respeitando o limitador."""
+    limiter = get_rate_limiter(provider)
+    limiter.acquire()
+    resp = send(*args, **kwargs)
+    limiter.observe(resp.headers, resp.status_code)
+    return resp
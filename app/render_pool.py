@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from app.config.pipeline import RENDER_PROCESS_WORKERS
+from app.logging_utils import setup_logging
+from app.pptx_renderer import get_compiled_template, render_from_plan
+
+log = logging.getLogger(__name__)
+
+RENDER_BACKENDS = ("threads", "processes")
+
+
+def _init_worker(template_path: str, verbose: bool) -> None:
+    """Aquece o worker: o template já fica compilado antes do primeiro deck."""
+    setup_logging(verbose)
+    get_compiled_template(Path(template_path))
+
+
+def _render_in_worker(
+    plan: dict[str, Any],
+    template_path: str,
+    template_digest: str,
+    output_path: str,
+    assets_base: str,
+) -> str:
+    compiled = get_compiled_template(Path(template_path))
+    if compiled.digest != template_digest:
+        raise RuntimeError(
+            f"Template mudou durante a execucao: {Path(template_path).name}"
+        )
+    render_from_plan(
+        plan=plan,
+        template_path=Path(template_path),
+        output_path=Path(output_path),
+        assets_base=Path(assets_base),
+        title=None,
+    )
+    return output_path
+
+
+class RenderPool:
+    """
+    Backend de render em processos (fora do GIL).
+
+    Cada worker compila o template ao iniciar e o mantém em memória; o processo
+    principal envia só o plano, o fingerprint do template e os caminhos.
+    Usa "spawn" porque o processo pai tem threads de rede ativas.
+    """
+
+    def __init__(
+        self,
+        template_path: Path,
+        *,
+        workers: int = RENDER_PROCESS_WORKERS,
+        verbose: bool = False,
+    ) -> None:
+        self.template_path = template_path
+        self.template_digest = get_compiled_template(template_path).digest
+        self._executor = ProcessPoolExecutor(
+            max_workers=max(1, workers),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(str(template_path), verbose),
+        )
+        log.debug(f"[render_pool] {max(1, workers)} worker(s) de render")
+
+    def render(self, plan: dict[str, Any], output_path: Path, assets_base: Path) -> None:
+        """Renderiza um deck num worker e bloqueia até terminar."""
+        future = self._executor.submit(
+            _render_in_worker,
+            plan,
+            str(self.template_path),
+            self.template_digest,
+            str(output_path),
+            str(assets_base),
+        )
+        future.result()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "RenderPool":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
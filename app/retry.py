@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, TypeVar
+
+import openai
+import requests
+
+from app.config.pipeline import (
+    RETRY_BASE_DELAY_SECONDS,
+    RETRY_BUDGETS,
+    RETRY_DEFAULT_BUDGET,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_MAX_DELAY_SECONDS,
+)
+from app.rate_limit import parse_retry_after, request_with_limits
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Status HTTP que valem nova tentativa (o resto de 4xx é erro do pedido).
+RETRYABLE_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+# Recusas explícitas do servidor: seguras de repetir mesmo em POST não idempotente.
+REFUSED_STATUSES = {429, 503}
+# Códigos de erro da OpenAI que chegam como 429 mas não passam com o tempo.
+FATAL_ERROR_CODES = {"insufficient_quota", "billing_hard_limit_reached"}
+# Códigos de erro em eventos de streaming (error/response.failed) que passam
+# com o tempo; os demais (pedido inválido, política, modelo, auth) são fatais.
+RETRYABLE_ERROR_CODES = {
+    "server_error",
+    "internal_error",
+    "rate_limit_exceeded",
+    "timeout",
+    "overloaded",
+    "service_unavailable",
+}
+# Motivos de response.incomplete que valem nova tentativa.
+RETRYABLE_INCOMPLETE_REASONS = {"max_output_tokens", "timeout"}
+# Erros do cliente HTTP do SDK (causa do APIConnectionError) em que a conexão
+# nem chegou a ser aberta. Comparados pelo nome para não importar o httpx.
+CONNECT_ERROR_NAMES = {"ConnectError", "ConnectTimeout"}
+
+
+class TransientError(RuntimeError):
+    """Falha passageira detectada pelo próprio código (ex.: stream interrompido)."""
+
+
+class FatalError(RuntimeError):
+    """Falha definitiva detectada pelo próprio código; nunca é repetida."""
+
+
+def error_for_code(code: str | None, message: str) -> RuntimeError:
+    """
+    Erro reportado só por código (ex.: evento de streaming): TransientError
+    para códigos passageiros ou ausentes, FatalError para os demais.
+    """
+    if code is None or code in RETRYABLE_ERROR_CODES:
+        return TransientError(message)
+    return FatalError(message)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = RETRY_MAX_ATTEMPTS
+    base_delay: float = RETRY_BASE_DELAY_SECONDS
+    max_delay: float = RETRY_MAX_DELAY_SECONDS
+    # False para POSTs que criam recursos (ex.: geração no Gamma): só repete o
+    # que o servidor comprovadamente não processou.
+    idempotent: bool = True
+
+
+DEFAULT_POLICY = RetryPolicy()
+NON_IDEMPOTENT_POLICY = RetryPolicy(idempotent=False)
+
+
+@dataclass(frozen=True)
+class Decision:
+    retryable: bool
+    retry_after: float | None = None
+    reason: str = ""
+
+
+def _status_and_headers(exc: BaseException) -> tuple[int | None, Any]:
+    response = getattr(exc, "response", None)
+    if response is None:
+        return getattr(exc, "status_code", None), None
+    return getattr(response, "status_code", None), getattr(response, "headers", None)
+
+
+def _retry_after(headers: Any) -> float | None:
+    if not headers:
+        return None
+    millis = headers.get("retry-after-ms")
+    if millis:
+        try:
+            return max(0.0, float(millis) / 1000)
+        except ValueError:
+            pass
+    return parse_retry_after(headers.get("retry-after"))
+
+
+def classify(exc: BaseException, policy: RetryPolicy = DEFAULT_POLICY) -> Decision:
+    """Separa falhas passageiras (rede, 429, 5xx) de erros definitivos."""
+    if isinstance(exc, TransientError):
+        return Decision(True, reason="transient")
+    if isinstance(exc, FatalError):
+        return Decision(False, reason="fatal")
+
+    # Falhas de conexão antes de qualquer resposta.
+    if isinstance(exc, requests.ConnectTimeout) or (
+        isinstance(exc, openai.APIConnectionError)
+        and type(exc.__cause__).__name__ in CONNECT_ERROR_NAMES
+    ):
+        return Decision(True, reason="connect")
+    if isinstance(
+        exc,
+        (
+            openai.APIConnectionError,
+            requests.ConnectionError,
+            requests.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+            ConnectionError,
+            TimeoutError,
+        ),
+    ):
+        return Decision(policy.idempotent, reason="network")
+
+    status, headers = _status_and_headers(exc)
+    if isinstance(exc, (openai.APIStatusError, requests.HTTPError)) and status:
+        code = getattr(exc, "code", None)
+        if code in FATAL_ERROR_CODES:
+            return Decision(False, reason=str(code))
+        retryable = status in (RETRYABLE_STATUSES if policy.idempotent else REFUSED_STATUSES)
+        return Decision(retryable, _retry_after(headers), reason=f"http {status}")
+    return Decision(False, reason=type(exc).__name__)
+
+
+@dataclass
+class RetryStats:
+    calls: int = 0
+    retries: int = 0
+    fatal: int = 0
+    exhausted: int = 0
+    budget_denied: int = 0
+    slept_seconds: float = 0.0
+
+
+@dataclass
+class _RetryState:
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    stats: dict[str, RetryStats] = field(default_factory=dict)
+    spent: dict[str, int] = field(default_factory=dict)
+
+    def _stats(self, provider: str) -> RetryStats:
+        return self.stats.setdefault(provider, RetryStats())
+
+    def count(self, provider: str, attr: str, amount: float = 1) -> None:
+        with self.lock:
+            stats = self._stats(provider)
+            setattr(stats, attr, getattr(stats, attr) + amount)
+
+    def take_budget(self, provider: str) -> bool:
+        """Consome uma nova tentativa do orçamento da execução."""
+        budget = RETRY_BUDGETS.get(provider, RETRY_DEFAULT_BUDGET)
+        with self.lock:
+            spent = self.spent.get(provider, 0)
+            if spent >= budget:
+                self._stats(provider).budget_denied += 1
+                return False
+            self.spent[provider] = spent + 1
+            self._stats(provider).retries += 1
+            return True
+
+
+_STATE = _RetryState()
+
+
+def reset_retry_state() -> None:
+    """Zera orçamentos e contadores (início de uma execução)."""
+    with _STATE.lock:
+        _STATE.stats.clear()
+        _STATE.spent.clear()
+
+
+def retry_counters() -> dict[str, RetryStats]:
+    """Cópia dos contadores por provedor desde o último reset."""
+    with _STATE.lock:
+        return {name: RetryStats(**vars(stats)) for name, stats in _STATE.stats.items()}
+
+
+def _next_delay(previous: float, policy: RetryPolicy) -> float:
+    """Decorrelated jitter: sorteio entre a base e 3x o atraso anterior."""
+    return min(policy.max_delay, random.uniform(policy.base_delay, previous * 3))
+
+
+def _should_retry(
+    provider: str,
+    exc: BaseException,
+    attempt: int,
+    previous: float,
+    policy: RetryPolicy,
+    name: str,
+) -> float | None:
+    """Atraso até a próxima tentativa, ou None para propagar o erro."""
+    decision = classify(exc, policy)
+    if not decision.retryable:
+        _STATE.count(provider, "fatal")
+        return None
+    if attempt >= policy.max_attempts:
+        _STATE.count(provider, "exhausted")
+        return None
+    if not _STATE.take_budget(provider):
+        log.warning(f"[retry] {provider}: orcamento de retentativas esgotado ({name})")
+        return None
+
+    delay = _next_delay(previous, policy)
+    if decision.retry_after is not None:
+        delay = max(delay, min(decision.retry_after, policy.max_delay * 4))
+    _STATE.count(provider, "slept_seconds", delay)
+    log.warning(
+        f"[retry] {provider}: {name} falhou ({decision.reason}; "
+        f"tentativa {attempt}/{policy.max_attempts}): {exc}. "
+        f"Nova tentativa em {delay:.1f}s"
+    )
+    return delay
+
+
+def _name(fn: Callable[..., Any]) -> str:
+    return getattr(fn, "__qualname__", None) or repr(fn)
+
+
+def retry_call(
+    provider: str,
+    fn: Callable[..., T],
+    /,
+    *args: Any,
+    policy: RetryPolicy = DEFAULT_POLICY,
+    **kwargs: Any,
+) -> T:
+    """Chama fn repetindo só falhas passageiras, dentro do orçamento do provedor."""
+    _STATE.count(provider, "calls")
+    delay = policy.base_delay
+    for attempt in range(1, policy.max_attempts + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as exc:
+            next_delay = _should_retry(provider, exc, attempt, delay, policy, _name(fn))
+            if next_delay is None:
+                raise
+            delay = next_delay
+            time.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+async def aretry_call(
+    provider: str,
+    fn: Callable[..., Awaitable[T]],
+    /,
+    *args: Any,
+    policy: RetryPolicy = DEFAULT_POLICY,
+    **kwargs: Any,
+) -> T:
+    """Versão assíncrona de retry_call (aguarda sem bloquear o event loop)."""
+    _STATE.count(provider, "calls")
+    delay = policy.base_delay
+    for attempt in range(1, policy.max_attempts + 1):
+        try:
+            return await fn(*args, **kwargs)
+        except Exception as exc:
+            next_delay = _should_retry(provider, exc, attempt, delay, policy, _name(fn))
+            if next_delay is None:
+                raise
+            delay = next_delay
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+def _checked_request(provider: str, send: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    resp = request_with_limits(provider, send, *args, **kwargs)
+    if resp.status_code in RETRYABLE_STATUSES:
+        resp.raise_for_status()
+    return resp
+
+
+def request_with_retry(
+    provider: str,
+    send: Callable[..., Any],
+    /,
+    *args: Any,
+    policy: RetryPolicy = DEFAULT_POLICY,
+    **kwargs: Any,
+) -> Any:
+    """
+    request_with_limits com retentativas: respostas 429/5xx e falhas de rede
+    passam pela mesma classificação das chamadas OpenAI.
+
+    Esgotadas as tentativas de uma resposta de erro, ela é devolvida como
+    veio (o chamador segue tratando com raise_for_status).
+    """
+    try:
+        return retry_call(
+            provider, _checked_request, provider, send, *args, policy=policy, **kwargs
+        )
+    except requests.HTTPError as exc:
+        if exc.response is None:
+            raise
+        return exc.response
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
 import shutil
@@ -8,7 +9,6 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Callable
-from openai import OpenAI
 
 from app.config.paths import (
     APP_DIR,
@@ -19,17 +19,27 @@ from app.config.paths import (
 from app.config.pipeline import (
     DEFAULT_MODEL,
     EXCLUDE_DIRS,
+    GAMMA_COST_BRL_PER_CREDIT,
     NUCLEUS_WORKERS,
     OPENAI_IMAGE_MODEL,
     OPENAI_IMAGE_QUALITY,
     OPENAI_IMAGE_SIZE,
 )
+from app.async_engine import run_nuclei_async
 from app.content_splitter import split_course_content
+from app.gamma.batcher import GammaBatcher
+from app.gamma.cache import get_gamma_cache
+from app.gpt_planner import PLAN_MODES
 from app.logging_utils import log_step, setup_logging
 from app.nucleus_processor import process_nucleus_dir
+from app.openai_clients import close_openai_clients, get_openai_client
 from app.path_utils import resolve_prompt_path, resolve_template_id
+from app.render_pool import RENDER_BACKENDS, RenderPool
+from app.retry import reset_retry_state, retry_counters
 from app.roteiro_zip import distribute_roteiros, extract_roteiros_zip
+from app.stage_scheduler import run_nuclei_staged
 from app.template_mapping import ensure_template_mapping, validate_template_layouts
+from app.upload_cache import collect_expired_uploads
 
 log = logging.getLogger(__name__)
 
@@ -49,6 +59,15 @@ class RunConfig:
     reuse_assets: bool = False
     verbose: bool = False
     openai_api_key: str | None = None
+    engine: str = "threads"
+    render_backend: str = "threads"
+    fused_split: bool = False
+    plan_mode: str = "files"
+    stream_plan: bool = False
+    gamma_batch: bool = False
+
+
+ENGINES = ("threads", "async", "stages")
 
 
 def _resolve_image_size(template_id: str) -> str:
@@ -65,9 +84,23 @@ def run_pipeline(
     progress_cb: Callable[[int, int, str], None] | None = None,
     log_cb: Callable[[str], None] | None = None,
     cancel_event=None,
+) -> None:
+    try:
+        _run_pipeline(config, progress_cb, log_cb, cancel_event)
+    finally:
+        # Fecha o pool HTTP (keep-alive/HTTP2) dos clientes compartilhados.
+        close_openai_clients()
+
+
+def _run_pipeline(
+    config: RunConfig,
+    progress_cb: Callable[[int, int, str], None] | None,
+    log_cb: Callable[[str], None] | None,
+    cancel_event,
 ) -> None:
     setup_logging(config.verbose)
     sys.path.insert(0, str(PROJECT_ROOT))
+    reset_retry_state()
 
     course_dir = config.course_dir.resolve()
     os.environ.setdefault("COURSE_DIR", str(course_dir))
@@ -97,6 +130,20 @@ def run_pipeline(
     if nucleus_workers <= 0:
         raise SystemExit("--nucleus-workers deve ser >= 1.")
     image_workers = nucleus_workers
+    if config.engine not in ENGINES:
+        raise SystemExit(
+            f"Engine inválido: {config.engine}. Válidos: {', '.join(ENGINES)}"
+        )
+    if config.render_backend not in RENDER_BACKENDS:
+        raise SystemExit(
+            f"Backend de render inválido: {config.render_backend}. "
+            f"Válidos: {', '.join(RENDER_BACKENDS)}"
+        )
+    if config.plan_mode not in PLAN_MODES:
+        raise SystemExit(
+            f"Modo de plano inválido: {config.plan_mode}. "
+            f"Válidos: {', '.join(PLAN_MODES)}"
+        )
 
     log_step(
         log,
@@ -106,7 +153,10 @@ def run_pipeline(
             "workers: "
             f"cpu={os.cpu_count() or 1} "
             f"NUCLEUS_WORKERS={nucleus_workers} "
-            f"IMAGE_WORKERS={image_workers}"
+            f"IMAGE_WORKERS={image_workers} "
+            f"engine={config.engine} "
+            f"render={config.render_backend} "
+            f"plan={config.plan_mode}"
         ),
     )
 
@@ -114,7 +164,7 @@ def run_pipeline(
         log, course_dir.name, "split_course_content", "Extraindo nucleos conceituais"
     )
     _log("Extraindo núcleos conceituais...")
-    split_course_content(course_dir, force=config.force)
+    split_course_content(course_dir, force=config.force, tag=config.fused_split)
     log_step(log, course_dir.name, "extract_roteiros_zip", "Importando roteiros")
     _log("Importando roteiros...")
     extract_roteiros_zip(course_dir, force=config.force)
@@ -135,6 +185,141 @@ def run_pipeline(
             continue
         nuclei.append(entry)
 
+    render_pool = (
+        RenderPool(template_path, verbose=config.verbose)
+        if config.render_backend == "processes"
+        else None
+    )
+    gamma_cache = get_gamma_cache()
+    cache_hits, credits_saved = gamma_cache.hits, gamma_cache.credits_saved
+    gamma_batcher = (
+        GammaBatcher(course_dir)
+        if config.gamma_batch and config.image_provider == "gamma"
+        else None
+    )
+    nucleus_kwargs = dict(
+        course_dir=course_dir,
+        prompt_md=prompt_md,
+        model=config.model,
+        image_model=config.image_model,
+        image_size=image_size,
+        image_quality=config.image_quality,
+        template_path=template_path,
+        force=config.force,
+        generate_images=not config.reuse_assets,
+        image_provider=config.image_provider,
+        render_pool=render_pool,
+        tagged_in_split=config.fused_split,
+        plan_mode=config.plan_mode,
+        stream_plan=config.stream_plan,
+        gamma_batcher=gamma_batcher,
+    )
+
+    try:
+        if config.engine == "async":
+            asyncio.run(
+                run_nuclei_async(
+                    nuclei,
+                    api_key_override=config.openai_api_key,
+                    nucleus_kwargs=nucleus_kwargs,
+                    progress_cb=progress_cb,
+                    log_cb=log_cb,
+                    cancel_event=cancel_event,
+                )
+            )
+        elif config.engine == "stages":
+            run_nuclei_staged(
+                nuclei,
+                nucleus_kwargs=nucleus_kwargs,
+                api_key_override=config.openai_api_key,
+                plan_workers=nucleus_workers,
+                progress_cb=progress_cb,
+                log_cb=log_cb,
+                cancel_event=cancel_event,
+            )
+        else:
+            _run_nuclei_threads(
+                nuclei,
+                nucleus_workers=nucleus_workers,
+                image_workers=image_workers,
+                api_key_override=config.openai_api_key,
+                nucleus_kwargs=nucleus_kwargs,
+                progress_cb=progress_cb,
+                log_msg=_log,
+                cancel_event=cancel_event,
+            )
+    finally:
+        if gamma_batcher is not None:
+            gamma_batcher.close()
+        if render_pool is not None:
+            render_pool.close()
+
+    dist_dir = course_dir / "dist"
+    dist_dir.mkdir(parents=True, exist_ok=True)
+
+    for item in dist_dir.glob("*.pptx"):
+        item.unlink()
+
+    copied = 0
+    for entry in nuclei:
+        pptx_path = entry / f"{entry.name}.pptx"
+        if not pptx_path.exists():
+            continue
+        shutil.copy2(pptx_path, dist_dir / pptx_path.name)
+        copied += 1
+
+    log_step(log, course_dir.name, "copy_dist", f"Apresentacoes prontas ({copied})")
+    _log(f"Apresentações prontas ({copied}).")
+
+    for provider, stats in retry_counters().items():
+        if stats.retries or stats.fatal or stats.budget_denied:
+            log_step(
+                log,
+                course_dir.name,
+                "retry",
+                f"{provider}: chamadas={stats.calls} retentativas={stats.retries} "
+                f"fatais={stats.fatal} esgotadas={stats.exhausted} "
+                f"sem_orcamento={stats.budget_denied} "
+                f"espera={stats.slept_seconds:.1f}s",
+            )
+
+    if gamma_cache.hits > cache_hits:
+        saved = gamma_cache.credits_saved - credits_saved
+        log_step(
+            log,
+            course_dir.name,
+            "gamma_cache",
+            f"Gamma: {gamma_cache.hits - cache_hits} export(s) do cache, "
+            f"creditos economizados: {saved} "
+            f"(R$ {saved * GAMMA_COST_BRL_PER_CREDIT:.2f})",
+        )
+
+    client = get_openai_client(config.openai_api_key)
+
+    _log("Removendo uploads expirados da nuvem OpenAI")
+
+    def _on_delete(filename: str) -> None:
+        _log(f"Deletando arquivo: {filename}")
+        log_step(
+            log, course_dir.name, "deleta_arquivos", f"Deletando arquivo {filename}"
+        )
+
+    deleted = collect_expired_uploads(client, on_delete=_on_delete)
+    _log(f"{deleted} Arquivos deletados")
+
+
+def _run_nuclei_threads(
+    nuclei: list[Path],
+    *,
+    nucleus_workers: int,
+    image_workers: int,
+    api_key_override: str | None,
+    nucleus_kwargs: dict,
+    progress_cb: Callable[[int, int, str], None] | None,
+    log_msg: Callable[[str], None],
+    cancel_event,
+) -> None:
+    """Executor padrão: um thread por núcleo, cada um com seu pool de imagens."""
     total = len(nuclei)
     completed = 0
 
@@ -142,23 +327,14 @@ def run_pipeline(
         future_map = {}
         for entry in nuclei:
             if cancel_event is not None and cancel_event.is_set():
-                _log("Cancelamento solicitado. Parando envio de novos núcleos.")
+                log_msg("Cancelamento solicitado. Parando envio de novos núcleos.")
                 break
             future = executor.submit(
                 process_nucleus_dir,
                 image_workers=image_workers,
                 nucleus_dir=entry,
-                course_dir=course_dir,
-                prompt_md=prompt_md,
-                model=config.model,
-                image_model=config.image_model,
-                image_size=image_size,
-                image_quality=config.image_quality,
-                template_path=template_path,
-                force=config.force,
-                generate_images=not config.reuse_assets,
-                image_provider=config.image_provider,
-                api_key_override=config.openai_api_key,
+                api_key_override=api_key_override,
+                **nucleus_kwargs,
             )
             future_map[future] = entry.name
 
@@ -166,48 +342,14 @@ def run_pipeline(
             name = future_map[future]
             try:
                 future.result()
-                _log(f"[{name}] concluído")
+                log_msg(f"[{name}] concluído")
             except Exception:
                 log.exception("[%s] Falha no processamento", name)
-                _log(f"[{name}] falha no processamento")
+                log_msg(f"[{name}] falha no processamento")
                 raise
             completed += 1
             if progress_cb:
                 progress_cb(completed, total, name)
 
             if cancel_event is not None and cancel_event.is_set():
-                _log("Cancelamento solicitado. Aguardando tarefas em andamento.")
-
-    dist_dir = course_dir / "dist"
-    dist_dir.mkdir(parents=True, exist_ok=True)
-
-    for item in dist_dir.glob("*.pptx"):
-        item.unlink()
-
-    copied = 0
-    for entry in nuclei:
-        pptx_path = entry / f"{entry.name}.pptx"
-        if not pptx_path.exists():
-            continue
-        shutil.copy2(pptx_path, dist_dir / pptx_path.name)
-        copied += 1
-
-    log_step(log, course_dir.name, "copy_dist", f"Apresentacoes prontas ({copied})")
-    _log(f"Apresentações prontas ({copied}).")
-
-    if config.openai_api_key is None:
-        with open("app/prompts/openai_api_key") as key_file:
-            api_key = key_file.read().strip()
-            client = OpenAI(api_key=api_key)
-    else:
-        client = OpenAI(api_key=config.openai_api_key)
-
-    files = client.files.list()
-    _log("Deletando arquivos da nuvem OpenAi")
-    for f in files:
-        _log(f"Deletando arquivo: {f.filename}")
-        log_step(
-            log, course_dir.name, "deleta_arquivos", f"Deletando arquivo {f.filename}"
-        )
-        client.files.delete(f.id)
-    _log(f"{len(list(files))} Arquivos deletados")
+                log_msg("Cancelamento solicitado. Aguardando tarefas em andamento.")
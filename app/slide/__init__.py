@@ -3,6 +3,7 @@ from app.slide.base_slide import (
     get_slide_class,
     register_slide,
     validate_plan,
+    validate_slide,
 )
 from app.slide.code_slide import CodeSlide
 from app.slide.standard_slide import StandardSlide
@@ -12,6 +13,7 @@ __all__ = [
     "BaseSlide",
     "register_slide",
     "validate_plan",
+    "validate_slide",
     "get_slide_class",
     "TitleSlide",
     "StandardSlide",
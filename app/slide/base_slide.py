@@ -159,6 +159,22 @@ def get_slide_class(kind: str) -> type["BaseSlide"] | None:
     return SLIDE_REGISTRY.get(kind)
 
 
+def validate_slide(slide: Any, assets_base: Path, idx: int) -> list[str]:
+    """Valida um slide isolado (regras do kind)."""
+    if not isinstance(slide, dict):
+        return [f"Slide {idx}: item não é objeto."]
+
+    # Garante que os tipos padrão estão registrados (import side effects).
+    if not SLIDE_REGISTRY:
+        load_default_slides()
+
+    kind = slide.get("kind", "standard")
+    slide_cls = SLIDE_REGISTRY.get(kind)
+    if not slide_cls:
+        return [f"Slide {idx}: kind inválido ({kind})."]
+    return slide_cls.validate(slide, assets_base, idx)
+
+
 def validate_plan(plan: dict, assets_base: Path) -> list[str]:
     """Valida o JSON completo (contrato + regras por slide)."""
     errors: list[str] = []
@@ -175,21 +191,7 @@ def validate_plan(plan: dict, assets_base: Path) -> list[str]:
         errors.append("Campo slides deve ser uma lista não vazia.")
         return errors
 
-    # Garante que os tipos padrão estão registrados (import side effects).
-    if not SLIDE_REGISTRY:
-        load_default_slides()
-
     for idx, slide in enumerate(slides, 1):
-        if not isinstance(slide, dict):
-            errors.append(f"Slide {idx}: item não é objeto.")
-            continue
-
-        kind = slide.get("kind", "standard")
-        slide_cls = SLIDE_REGISTRY.get(kind)
-        if not slide_cls:
-            errors.append(f"Slide {idx}: kind inválido ({kind}).")
-            continue
-
-        errors.extend(slide_cls.validate(slide, assets_base, idx))
+        errors.extend(validate_slide(slide, assets_base, idx))
 
     return errors
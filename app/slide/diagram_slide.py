@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from app.slide import BaseSlide, register_slide
 from app.slide.render_utils import (
+    add_picture_in_box,
     get_placeholder_by_idx,
     resolve_image_path,
     set_bullets,
@@ -63,10 +64,4 @@ class DiagramSlide(BaseSlide):
             if image_box:
                 img_path = resolve_image_path(assets_base, image_path)
                 if img_path.exists():
-                    dst_slide.shapes.add_picture(
-                        str(img_path),
-                        image_box.left,
-                        image_box.top,
-                        image_box.width,
-                        image_box.height,
-                    )
+                    add_picture_in_box(dst_slide, img_path, image_box)
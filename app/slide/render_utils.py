@@ -4,6 +4,8 @@ from pathlib import Path
 
 from pptx.util import Pt
 
+from app.image_fit import fit_image_to_box
+
 
 def get_placeholder_by_idx(slide, idx: int | None):
     """Busca placeholder pelo idx; retorna None se não existir."""
@@ -92,3 +94,20 @@ def resolve_image_path(base_dir: Path, image_path: str) -> Path:
     if path.is_absolute():
         return path
     return base_dir / path
+
+
+def add_picture_in_box(dst_slide, img_path: Path, box) -> None:
+    """
+    Insere a imagem ocupando a caixa do placeholder.
+
+    A imagem é reduzida/recodificada para o tamanho da caixa antes de ser
+    embutida, evitando guardar no PPTX pixels que nunca são exibidos.
+    """
+    fitted = fit_image_to_box(img_path, int(box.width), int(box.height))
+    dst_slide.shapes.add_picture(
+        str(fitted),
+        box.left,
+        box.top,
+        box.width,
+        box.height,
+    )
@@ -0,0 +1,417 @@
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from app.config.paths import ASSETS_DIRNAME
+from app.config.pipeline import (
+    STAGE_DOCX_WORKERS,
+    STAGE_GAMMA_WORKERS,
+    STAGE_IMAGE_WORKERS,
+    STAGE_PLAN_WORKERS,
+    STAGE_RENDER_WORKERS,
+)
+from app.gamma.batcher import GammaBatcher
+from app.image_generator import (
+    build_image_jobs,
+    materialize_generated_images_for_plan,
+)
+from app.logging_utils import log_step
+from app.render_pool import RenderPool
+from app.nucleus_processor import (
+    NucleusJob,
+    finish_image_prefetch,
+    image_prefetcher,
+    images_up_to_date,
+    log_openai_images,
+    plan_nucleus,
+    prepare_nucleus,
+    render_nucleus,
+    save_plan,
+    submit_gamma_images,
+)
+
+log = logging.getLogger(__name__)
+
+StageOutcome = bool | list[Callable[[], None]] | Future
+
+
+@dataclass
+class NucleusFlow:
+    """Um núcleo percorrendo as etapas do DAG."""
+
+    nucleus_dir: Path
+    job: NucleusJob | None = None
+    stage_idx: int = 0
+    pending: int = 0
+    failed: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    # Pools do scheduler, para etapas que repassam trabalho a outro recurso.
+    pools: dict[str, Executor] = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        return self.nucleus_dir.name
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    Etapa tipada do pipeline, executada no pool nomeado em `pool`.
+
+    `run` recebe o NucleusFlow e retorna:
+      - True: segue para a próxima etapa;
+      - False: encerra o núcleo (nada mais a fazer);
+      - lista de chamadas: fan-out no mesmo pool; a etapa `finish` (opcional)
+        roda quando todas terminarem e o núcleo segue adiante;
+      - Future: espera externa (ex.: poller do Gamma); o worker do pool fica
+        livre e o núcleo segue quando o Future concluir.
+    """
+
+    name: str
+    pool: str
+    run: Callable[[NucleusFlow], StageOutcome]
+    finish: Callable[[NucleusFlow], None] | None = None
+
+
+class StageScheduler:
+    """
+    Agenda núcleos por etapas, cada uma no seu pool de recursos.
+
+    Cada núcleo avança de forma independente: ao terminar uma etapa, a próxima
+    é submetida ao pool correspondente. Assim o render (CPU) não espera atrás de
+    chamadas de plano de outros núcleos e as imagens compartilham um único pool,
+    sem o aninhamento NUCLEUS_WORKERS x IMAGE_WORKERS.
+    """
+
+    def __init__(self, stages: list[Stage], pool_sizes: dict[str, int]) -> None:
+        missing = {stage.pool for stage in stages} - set(pool_sizes)
+        if missing:
+            raise ValueError(f"Pools sem tamanho definido: {sorted(missing)}")
+        self.stages = stages
+        self.pool_sizes = pool_sizes
+        self._pools: dict[str, ThreadPoolExecutor] = {}
+        self._cond = threading.Condition()
+        self._remaining = 0
+        self._completed = 0
+        self._error: BaseException | None = None
+
+    def run(
+        self,
+        nuclei: list[Path],
+        *,
+        progress_cb: Callable[[int, int, str], None] | None = None,
+        log_cb: Callable[[str], None] | None = None,
+        cancel_event=None,
+    ) -> None:
+        self._log_cb = log_cb
+        self._progress_cb = progress_cb
+        self._cancel_event = cancel_event
+        self._cancel_logged = False
+        self._total = len(nuclei)
+        self._remaining = len(nuclei)
+
+        self._pools = {
+            name: ThreadPoolExecutor(max_workers=max(1, size), thread_name_prefix=name)
+            for name, size in self.pool_sizes.items()
+        }
+        try:
+            for entry in nuclei:
+                self._submit_stage(NucleusFlow(nucleus_dir=entry, pools=self._pools))
+            with self._cond:
+                while self._remaining > 0:
+                    self._cond.wait()
+        finally:
+            for pool in self._pools.values():
+                pool.shutdown(wait=True)
+
+        if self._error is not None:
+            raise self._error
+
+    def _log(self, msg: str) -> None:
+        if self._log_cb:
+            self._log_cb(msg)
+
+    def _cancelled(self) -> bool:
+        return self._cancel_event is not None and self._cancel_event.is_set()
+
+    def _submit_stage(self, flow: NucleusFlow) -> None:
+        stage = self.stages[flow.stage_idx]
+        self._pools[stage.pool].submit(self._run_stage, flow, stage)
+
+    def _run_stage(self, flow: NucleusFlow, stage: Stage) -> None:
+        if self._error is not None:
+            self._finish(flow, processed=False)
+            return
+        if flow.stage_idx == 0 and self._cancelled():
+            if not self._cancel_logged:
+                self._cancel_logged = True
+                self._log("Cancelamento solicitado. Parando envio de novos núcleos.")
+            self._finish(flow, processed=False)
+            return
+
+        try:
+            outcome = stage.run(flow)
+        except BaseException as exc:  # noqa: BLE001
+            self._fail(flow, exc)
+            return
+
+        if isinstance(outcome, Future):
+            outcome.add_done_callback(lambda done: self._resume(flow, done))
+            return
+
+        if isinstance(outcome, list):
+            if not outcome:
+                self._finish_fan_out(flow, stage)
+                return
+            flow.pending = len(outcome)
+            pool = self._pools[stage.pool]
+            for call in outcome:
+                pool.submit(self._run_part, flow, stage, call)
+            return
+
+        if outcome:
+            self._advance(flow)
+        else:
+            self._finish(flow, processed=True)
+
+    def _resume(self, flow: NucleusFlow, done: Future) -> None:
+        exc = done.exception()
+        if exc is not None:
+            self._fail(flow, exc)
+            return
+        if self._error is not None:
+            self._finish(flow, processed=False)
+            return
+        self._advance(flow)
+
+    def _run_part(self, flow: NucleusFlow, stage: Stage, call: Callable[[], None]) -> None:
+        error: BaseException | None = None
+        try:
+            if self._error is None:
+                call()
+        except BaseException as exc:  # noqa: BLE001
+            error = exc
+
+        with flow.lock:
+            first_failure = error is not None and not flow.failed
+            flow.failed = flow.failed or error is not None
+            flow.pending -= 1
+            last = flow.pending == 0
+            failed = flow.failed
+
+        if first_failure:
+            self._fail(flow, error, finish=False)
+        if not last:
+            return
+        if failed or self._error is not None:
+            self._finish(flow, processed=False)
+            return
+        self._finish_fan_out(flow, stage)
+
+    def _finish_fan_out(self, flow: NucleusFlow, stage: Stage) -> None:
+        try:
+            if stage.finish is not None:
+                stage.finish(flow)
+        except BaseException as exc:  # noqa: BLE001
+            self._fail(flow, exc)
+            return
+        self._advance(flow)
+
+    def _advance(self, flow: NucleusFlow) -> None:
+        flow.stage_idx += 1
+        if flow.stage_idx >= len(self.stages):
+            self._finish(flow, processed=True)
+            return
+        self._submit_stage(flow)
+
+    def _fail(self, flow: NucleusFlow, exc: BaseException, *, finish: bool = True) -> None:
+        log.error("[%s] Falha no processamento", flow.name, exc_info=exc)
+        self._log(f"[{flow.name}] falha no processamento")
+        with self._cond:
+            if self._error is None:
+                self._error = exc
+        if finish:
+            self._finish(flow, processed=False)
+
+    def _finish(self, flow: NucleusFlow, *, processed: bool) -> None:
+        with self._cond:
+            self._remaining -= 1
+            if processed:
+                self._completed += 1
+                completed = self._completed
+            self._cond.notify_all()
+        if not processed:
+            return
+        self._log(f"[{flow.name}] concluído")
+        if self._progress_cb:
+            self._progress_cb(completed, self._total, flow.name)
+        if self._cancelled():
+            self._log("Cancelamento solicitado. Aguardando tarefas em andamento.")
+
+
+def build_nucleus_stages(
+    *,
+    course_dir: Path,
+    prompt_md: str,
+    model: str,
+    image_model: str,
+    image_size: str,
+    image_quality: str | None,
+    template_path: Path,
+    force: bool,
+    generate_images: bool = True,
+    image_provider: str = "openai",
+    render_pool: RenderPool | None = None,
+    api_key_override: str | None = None,
+    tagged_in_split: bool = False,
+    plan_mode: str = "files",
+    stream_plan: bool = False,
+    gamma_batcher: GammaBatcher | None = None,
+) -> list[Stage]:
+    """Monta o DAG padrão: docx -> plan -> [gamma] -> images -> render."""
+
+    def _prepare(flow: NucleusFlow) -> bool:
+        flow.job = prepare_nucleus(
+            flow.nucleus_dir, course_dir, force, tagged_in_split
+        )
+        return flow.job is not None
+
+    def _plan(flow: NucleusFlow) -> StageOutcome:
+        accepted = plan_nucleus(
+            flow.job,
+            api_key_override=api_key_override,
+            prompt_md=prompt_md,
+            model=model,
+            force=force,
+            plan_mode=plan_mode,
+            prefetcher=image_prefetcher(
+                flow.job,
+                stream_plan=stream_plan,
+                generate_images=generate_images,
+                image_provider=image_provider,
+                image_model=image_model,
+                image_size=image_size,
+                image_quality=image_quality,
+                image_executor=flow.pools.get("images"),
+                api_key_override=api_key_override,
+            ),
+        )
+        prefetcher = flow.job.image_prefetch
+        if not accepted or prefetcher is None:
+            return accepted
+        # As imagens pré-geradas rodam no pool "images"; o núcleo segue quando
+        # terminarem, sem prender um worker do plano nem do pool de imagens.
+        return prefetcher.when_done()
+
+    def _images_fresh(flow: NucleusFlow) -> bool:
+        return images_up_to_date(
+            flow.job,
+            image_provider=image_provider,
+            image_model=image_model,
+            image_size=image_size,
+            image_quality=image_quality,
+            generate_images=generate_images,
+        )
+
+    def _gamma(flow: NucleusFlow) -> StageOutcome:
+        if _images_fresh(flow):
+            return True
+        log_step(
+            log,
+            flow.name,
+            "materialize_generated_images_for_plan",
+            "Gerando imagens",
+        )
+        return submit_gamma_images(
+            flow.job, generate_images=generate_images, gamma_batcher=gamma_batcher
+        )
+
+    def _images(flow: NucleusFlow) -> StageOutcome:
+        finish_image_prefetch(flow.job)
+        if _images_fresh(flow):
+            return []
+        if image_provider != "gamma":
+            log_step(
+                log,
+                flow.name,
+                "materialize_generated_images_for_plan",
+                "Gerando imagens",
+            )
+        if not generate_images:
+            reused = materialize_generated_images_for_plan(
+                flow.job.plan,
+                course_dir=course_dir,
+                nucleus_name=flow.name,
+                assets_dirname=ASSETS_DIRNAME,
+                model=image_model,
+                size=image_size,
+                quality=image_quality,
+                generate_images=False,
+            )
+            log_openai_images(flow.job, reused, generate_images)
+            return []
+        return build_image_jobs(
+            flow.job.plan,
+            course_dir=course_dir,
+            nucleus_name=flow.name,
+            assets_dirname=ASSETS_DIRNAME,
+            model=image_model,
+            size=image_size,
+            quality=image_quality,
+            api_key_override=api_key_override,
+        )
+
+    def _images_done(flow: NucleusFlow) -> None:
+        save_plan(flow.job)
+
+    def _render(flow: NucleusFlow) -> bool:
+        render_nucleus(flow.job, template_path, render_pool)
+        return True
+
+    stages = [
+        Stage("tag_docx", "docx", _prepare),
+        Stage("plan", "plan", _plan),
+    ]
+    if image_provider == "gamma":
+        stages.append(Stage("gamma_images", "gamma", _gamma))
+    stages += [
+        Stage("images", "images", _images, finish=_images_done),
+        Stage("render", "render", _render),
+    ]
+    return stages
+
+
+def default_pool_sizes(plan_workers: int | None = None) -> dict[str, int]:
+    return {
+        "docx": STAGE_DOCX_WORKERS,
+        "plan": plan_workers or STAGE_PLAN_WORKERS,
+        "gamma": STAGE_GAMMA_WORKERS,
+        "images": STAGE_IMAGE_WORKERS,
+        "render": STAGE_RENDER_WORKERS,
+    }
+
+
+def run_nuclei_staged(
+    nuclei: list[Path],
+    *,
+    nucleus_kwargs: dict[str, Any],
+    api_key_override: str | None,
+    plan_workers: int | None = None,
+    progress_cb: Callable[[int, int, str], None] | None = None,
+    log_cb: Callable[[str], None] | None = None,
+    cancel_event=None,
+) -> None:
+    """Processa os núcleos pelo DAG de etapas com pools separados."""
+    stages = build_nucleus_stages(api_key_override=api_key_override, **nucleus_kwargs)
+    scheduler = StageScheduler(stages, default_pool_sizes(plan_workers))
+    scheduler.run(
+        nuclei,
+        progress_cb=progress_cb,
+        log_cb=log_cb,
+        cancel_event=cancel_event,
+    )
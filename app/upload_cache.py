@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from openai import AsyncOpenAI, NotFoundError, OpenAI
+
+from app.config.paths import UPLOAD_LEDGER_PATH
+from app.config.pipeline import OPENAI_UPLOAD_TTL_SECONDS
+from app.hashing import sha256_file, sha256_text
+from app.logging_utils import log_step
+
+log = logging.getLogger(__name__)
+
+
+class UploadLedger:
+    """
+    Registro persistente dos uploads feitos na API de arquivos da OpenAI.
+
+    Cada entrada é indexada por (fingerprint da chave, SHA-256 do arquivo) e
+    guarda o file_id remoto. A chave da API nunca é gravada, apenas seu hash.
+
+    Uploads simultâneos da mesma chave (ex.: núcleos que compartilham o
+    roteiro) são coalescidos: só o primeiro envia, os demais aguardam o
+    file_id dele (claim/settle).
+    """
+
+    def __init__(
+        self,
+        path: Path = UPLOAD_LEDGER_PATH,
+        ttl_seconds: int = OPENAI_UPLOAD_TTL_SECONDS,
+    ) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Future] = {}
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        if not self.path.exists():
+            return {}
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            log.warning(f"[upload_cache] Ledger ilegivel, recriando: {self.path}")
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _save(self, data: dict[str, dict[str, Any]]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def key_for(api_key: str, digest: str) -> str:
+        return f"{sha256_text(api_key)[:16]}:{digest}"
+
+    def _is_live(self, entry: dict[str, Any], now: float) -> bool:
+        last_used = float(entry.get("last_used_at") or entry.get("uploaded_at") or 0)
+        return now - last_used < self.ttl_seconds
+
+    def get(self, key: str) -> str | None:
+        """Retorna o file_id vivo para a chave (e renova last_used_at)."""
+        with self._lock:
+            data = self._load()
+            entry = data.get(key)
+            now = time.time()
+            if not entry or not self._is_live(entry, now):
+                return None
+            entry["last_used_at"] = now
+            self._save(data)
+            return str(entry.get("file_id") or "") or None
+
+    def put(self, key: str, file_id: str, filename: str, size: int) -> None:
+        with self._lock:
+            data = self._load()
+            now = time.time()
+            data[key] = {
+                "file_id": file_id,
+                "filename": filename,
+                "size_bytes": size,
+                "uploaded_at": now,
+                "last_used_at": now,
+            }
+            self._save(data)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            data = self._load()
+            if data.pop(key, None) is not None:
+                self._save(data)
+
+    def claim(self, key: str) -> Future | None:
+        """
+        Reserva o upload da chave. Retorna None se coube a quem chamou fazê-lo
+        (e depois chamar settle), ou o Future do upload já em andamento.
+        """
+        with self._lock:
+            pending = self._inflight.get(key)
+            if pending is not None:
+                return pending
+            self._inflight[key] = Future()
+            return None
+
+    def settle(
+        self,
+        key: str,
+        file_id: str | None = None,
+        exc: BaseException | None = None,
+    ) -> None:
+        """Libera a reserva da chave, entregando o resultado a quem aguarda."""
+        with self._lock:
+            pending = self._inflight.pop(key)
+        if exc is not None:
+            pending.set_exception(exc)
+        else:
+            pending.set_result(file_id)
+
+    def expired(self, api_key: str) -> list[tuple[str, dict[str, Any]]]:
+        """Lista as entradas expiradas pertencentes à chave informada."""
+        prefix = f"{sha256_text(api_key)[:16]}:"
+        now = time.time()
+        with self._lock:
+            data = self._load()
+        return [
+            (key, entry)
+            for key, entry in data.items()
+            if key.startswith(prefix) and not self._is_live(entry, now)
+        ]
+
+
+_LEDGER = UploadLedger()
+
+
+def get_upload_ledger() -> UploadLedger:
+    return _LEDGER
+
+
+def _confirm_hit(
+    ledger: UploadLedger, key: str, path: Path, file_id: str, found: bool
+) -> str | None:
+    """Confirma o file_id (found) ou o descarta se foi removido remotamente."""
+    if not found:
+        ledger.discard(key)
+        return None
+    log_step(
+        log,
+        path.parent.name,
+        "upload_file",
+        f"cache hit: file={path.name} file_id={file_id}",
+        level=logging.DEBUG,
+    )
+    return file_id
+
+
+def _record_upload(ledger: UploadLedger, key: str, path: Path, file_id: str) -> str:
+    ledger.put(key, file_id, path.name, path.stat().st_size)
+    return file_id
+
+
+def upload_file_cached(
+    client: OpenAI,
+    path: Path,
+    upload_fn: Callable[[OpenAI, Path], str],
+    *,
+    ledger: UploadLedger | None = None,
+) -> str:
+    """
+    Reaproveita o file_id de um upload anterior com os mesmos bytes.
+
+    Se o arquivo não estiver no ledger (ou tiver sido removido remotamente),
+    delega para upload_fn e registra o novo file_id.
+    """
+    ledger = ledger or _LEDGER
+    key = ledger.key_for(client.api_key, sha256_file(path))
+    pending = ledger.claim(key)
+    if pending is not None:
+        return pending.result()
+
+    try:
+        file_id = ledger.get(key)
+        if file_id:
+            try:
+                client.files.retrieve(file_id)
+                found = True
+            except NotFoundError:
+                found = False
+            file_id = _confirm_hit(ledger, key, path, file_id, found)
+        if not file_id:
+            file_id = _record_upload(ledger, key, path, upload_fn(client, path))
+    except BaseException as exc:
+        ledger.settle(key, exc=exc)
+        raise
+    ledger.settle(key, file_id)
+    return file_id
+
+
+async def aupload_file_cached(
+    client: AsyncOpenAI,
+    path: Path,
+    upload_fn: Callable[[AsyncOpenAI, Path], Awaitable[str]],
+    *,
+    ledger: UploadLedger | None = None,
+) -> str:
+    """Versão assíncrona de upload_file_cached (mesmo ledger)."""
+    ledger = ledger or _LEDGER
+    key = ledger.key_for(client.api_key, await asyncio.to_thread(sha256_file, path))
+    pending = ledger.claim(key)
+    if pending is not None:
+        return await asyncio.wrap_future(pending)
+
+    try:
+        file_id = ledger.get(key)
+        if file_id:
+            try:
+                await client.files.retrieve(file_id)
+                found = True
+            except NotFoundError:
+                found = False
+            file_id = _confirm_hit(ledger, key, path, file_id, found)
+        if not file_id:
+            file_id = _record_upload(ledger, key, path, await upload_fn(client, path))
+    except BaseException as exc:
+        ledger.settle(key, exc=exc)
+        raise
+    ledger.settle(key, file_id)
+    return file_id
+
+
+def collect_expired_uploads(
+    client: OpenAI,
+    *,
+    ledger: UploadLedger | None = None,
+    on_delete: Callable[[str], None] | None = None,
+) -> int:
+    """Remove da nuvem apenas os arquivos do ledger que passaram do TTL."""
+    ledger = ledger or _LEDGER
+    deleted = 0
+    for key, entry in ledger.expired(client.api_key):
+        file_id = str(entry.get("file_id") or "")
+        if file_id:
+            try:
+                client.files.delete(file_id)
+            except NotFoundError:
+                pass
+            if on_delete:
+                on_delete(str(entry.get("filename") or file_id))
+        ledger.discard(key)
+        deleted += 1
+    return deleted
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import io
+import sys
+from pathlib import Path
+
+import pytest
+from docx import Document
+from docx.shared import Inches
+from PIL import Image
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def png_bytes(color: str, size: tuple[int, int] = (16, 16)) -> io.BytesIO:
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, "PNG")
+    buf.seek(0)
+    return buf
+
+
+@pytest.fixture
+def course_docx(tmp_path: Path) -> Path:
+    """
+    DOCX de curso com dois módulos e três núcleos, imagens no corpo, uma
+    tabela e uma imagem no cabeçalho (que não deve ir para os núcleos).
+    """
+    doc = Document()
+    header = doc.sections[0].header
+    header.paragraphs[0].add_run("Cabeçalho").add_picture(png_bytes("black"), width=Inches(0.2))
+    doc.sections[0].footer.paragraphs[0].text = "Rodapé"
+
+    doc.add_paragraph("Apresentação do curso")
+    doc.add_heading("Módulo 1", 1)
+    doc.add_heading("Núcleo Conceitual 1", 2)
+    doc.add_paragraph("Texto do primeiro núcleo.")
+    doc.add_picture(png_bytes("red"), width=Inches(0.5))
+    table = doc.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "a"
+    table.cell(0, 1).text = "b"
+    doc.add_heading("Núcleo Conceitual 2", 2)
+    para = doc.add_paragraph("Figura: ")
+    para.add_run().add_picture(png_bytes("blue", (20, 10)), width=Inches(0.5))
+    doc.add_heading("Módulo 2", 1)
+    doc.add_heading("Núcleo Prático 1", 2)
+    doc.add_paragraph("Exercício.")
+
+    path = tmp_path / "curso.docx"
+    doc.save(str(path))
+    return path
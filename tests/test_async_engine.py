@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from app import async_engine
+
+NUCLEUS_KWARGS = dict(
+    course_dir=Path("."),
+    prompt_md="",
+    model="modelo",
+    image_model="imagem",
+    image_size="1024x1024",
+    image_quality=None,
+    template_path=Path("template.pptx"),
+    force=False,
+)
+
+
+class _FakeClient:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    """
+    async_engine com um núcleo por vez na etapa de CPU e prepare_nucleus
+    falso (só registra o início; retornar None encerra o núcleo).
+    """
+    started: list[str] = []
+    hooks: dict = {"on_start": lambda name: None}
+
+    def prepare(nucleus_dir, *args):
+        started.append(nucleus_dir.name)
+        hooks["on_start"](nucleus_dir.name)
+        time.sleep(0.01)
+        return None
+
+    create = async_engine.ProviderSemaphores.create.__func__
+    monkeypatch.setattr(async_engine, "prepare_nucleus", prepare)
+    monkeypatch.setattr(
+        async_engine.ProviderSemaphores, "create", classmethod(lambda cls: create(cls, cpu=1))
+    )
+    monkeypatch.setattr(async_engine, "create_async_openai_client", lambda key: _FakeClient())
+    return started, hooks
+
+
+def _run(nuclei: list[Path], cancel_event=None) -> tuple[list[str], list[str]]:
+    progress: list[str] = []
+    logs: list[str] = []
+    asyncio.run(
+        async_engine.run_nuclei_async(
+            nuclei,
+            api_key_override=None,
+            nucleus_kwargs=NUCLEUS_KWARGS,
+            progress_cb=lambda done, total, name: progress.append(name),
+            log_cb=logs.append,
+            cancel_event=cancel_event,
+        )
+    )
+    return progress, logs
+
+
+def _nuclei(count: int) -> list[Path]:
+    return [Path(f"mod1_nc{i}") for i in range(1, count + 1)]
+
+
+def test_all_nuclei_run_without_cancel(engine):
+    started, _ = engine
+    progress, _ = _run(_nuclei(4), threading.Event())
+    assert sorted(started) == [n.name for n in _nuclei(4)]
+    assert sorted(progress) == sorted(started)
+
+
+def test_cancel_before_start_runs_nothing(engine):
+    started, _ = engine
+    cancel = threading.Event()
+    cancel.set()
+    progress, logs = _run(_nuclei(4), cancel)
+    assert started == []
+    assert progress == []
+    assert logs.count("Cancelamento solicitado. Parando envio de novos núcleos.") == 1
+
+
+def test_cancel_stops_nuclei_waiting_for_a_slot(engine):
+    started, hooks = engine
+    cancel = threading.Event()
+
+    def on_start(name: str) -> None:
+        if len(started) == 2:
+            cancel.set()
+
+    hooks["on_start"] = on_start
+    progress, _ = _run(_nuclei(6), cancel)
+
+    # Todas as corrotinas já existem; só as que obtiveram o semáforo antes do
+    # cancelamento rodam.
+    assert started == ["mod1_nc1", "mod1_nc2"]
+    assert sorted(progress) == started
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import shutil
+from pathlib import Path
+
+from docx import Document
+
+from app.build_manifest import BuildManifest
+from app.plan_cache import (
+    PlanCache,
+    plan_fingerprint,
+    read_plan_fingerprint,
+    write_plan_fingerprint,
+)
+
+
+def _docx(path: Path, text: str) -> Path:
+    doc = Document()
+    doc.add_paragraph(text)
+    doc.save(str(path))
+    return path
+
+
+def test_plan_cache_roundtrip(tmp_path):
+    cache = PlanCache(tmp_path / "plans")
+    assert cache.get("abc") is None
+    cache.put("abc", {"slides": [{"titulo": "Introdução"}]})
+    assert cache.get("abc") == {"slides": [{"titulo": "Introdução"}]}
+    assert list((tmp_path / "plans").glob("*.tmp")) == []
+
+
+def test_plan_cache_ignores_unreadable_entries(tmp_path):
+    cache = PlanCache(tmp_path)
+    (tmp_path / "ruim.json").write_text("{nao e json", encoding="utf-8")
+    (tmp_path / "lista.json").write_text("[1, 2]", encoding="utf-8")
+    assert cache.get("ruim") is None
+    assert cache.get("lista") is None
+
+
+def test_plan_fingerprint_changes_with_every_input(tmp_path):
+    content = _docx(tmp_path / "conteudo.docx", "conteúdo")
+    roteiro = _docx(tmp_path / "ROT.docx", "roteiro")
+    base = plan_fingerprint(content, roteiro, "prompt", "modelo")
+
+    # O fingerprint depende do conteúdo, não do caminho do arquivo.
+    copy = tmp_path / "copia.docx"
+    shutil.copyfile(content, copy)
+    assert plan_fingerprint(copy, roteiro, "prompt", "modelo") == base
+    assert plan_fingerprint(content, roteiro, "prompt", "modelo", "files") == base
+
+    variants = {
+        plan_fingerprint(_docx(tmp_path / "c2.docx", "outro"), roteiro, "prompt", "modelo"),
+        plan_fingerprint(content, _docx(tmp_path / "r2.docx", "outro"), "prompt", "modelo"),
+        plan_fingerprint(content, roteiro, "outro prompt", "modelo"),
+        plan_fingerprint(content, roteiro, "prompt", "outro modelo"),
+        plan_fingerprint(content, roteiro, "prompt", "modelo", "inline"),
+    }
+    assert base not in variants
+    assert len(variants) == 5
+
+
+def test_plan_fingerprint_is_stored_in_manifest(tmp_path):
+    output_json = tmp_path / "mod1_nc1.json"
+    assert read_plan_fingerprint(output_json) is None
+    write_plan_fingerprint(output_json, "fp1")
+    assert read_plan_fingerprint(output_json) == "fp1"
+    write_plan_fingerprint(output_json, "fp2")
+    assert read_plan_fingerprint(output_json) == "fp2"
+
+
+def test_manifest_up_to_date_until_inputs_or_outputs_change(tmp_path):
+    out = tmp_path / "saida.pptx"
+    out.write_bytes(b"v1")
+    manifest = BuildManifest(tmp_path)
+    assert not manifest.up_to_date("render", "in1", [out])
+
+    manifest.record("render", "in1", [out])
+    assert manifest.up_to_date("render", "in1", [out])
+    # Outra instância lê o mesmo arquivo.
+    assert BuildManifest(tmp_path).up_to_date("render", "in1", [out])
+
+    assert not manifest.up_to_date("render", "in2", [out])
+    assert not manifest.up_to_date("render", "in1", [out, tmp_path / "outra.pptx"])
+
+    out.write_bytes(b"v2 editado")
+    assert not manifest.up_to_date("render", "in1", [out])
+
+    manifest.record("render", "in1", [out])
+    out.unlink()
+    assert not manifest.up_to_date("render", "in1", [out])
+
+
+def test_manifest_outputs_fingerprint_chains_stages(tmp_path):
+    out = tmp_path / "plano.json"
+    out.write_text("{}", encoding="utf-8")
+    manifest = BuildManifest(tmp_path)
+    assert manifest.outputs_fingerprint("images") is None
+
+    manifest.record("images", "in", [out])
+    first = manifest.outputs_fingerprint("images")
+    out.write_text('{"slides": []}', encoding="utf-8")
+    manifest.record("images", "in", [out])
+    assert manifest.outputs_fingerprint("images") != first
+
+
+def test_manifest_adopts_existing_outputs(tmp_path):
+    out = tmp_path / "mod1_nc1.docx"
+    manifest = BuildManifest(tmp_path)
+    assert not manifest.up_to_date("split", "in", [out], adopt_existing=True)
+
+    out.write_bytes(b"docx")
+    assert manifest.up_to_date("split", "in", [out], adopt_existing=True)
+    assert manifest.inputs("split") == "in"
+    assert not manifest.up_to_date("split", "outro", [out], adopt_existing=True)
+
+
+def test_manifest_recovers_from_corrupt_file(tmp_path):
+    manifest = BuildManifest(tmp_path)
+    manifest.path.write_text("{corrompido", encoding="utf-8")
+    assert manifest.stage("split") is None
+    manifest.record("split", "in")
+    assert manifest.inputs("split") == "in"
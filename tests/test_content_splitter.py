@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import shutil
+import zipfile
+from pathlib import Path
+
+from docx import Document
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+
+from app.content_splitter import (
+    VIDINT_NAME,
+    find_segments,
+    iter_block_items,
+    split_docx_to_nuclei,
+)
+from app.docx_tagger import create_tagged_docx
+
+NUCLEI = ["mod1_nc1", "mod1_nc2", "mod2_np1"]
+
+
+def _baseline_split(docx_path: Path, out: Path, start: int, end: int | None) -> Path:
+    """Splitter original: copia o DOCX, limpa cabeçalho/rodapé e apaga os blocos fora do trecho."""
+    shutil.copyfile(docx_path, out)
+    doc = Document(str(out))
+    for section in doc.sections:
+        for part in (section.header, section.footer):
+            for paragraph in list(part.paragraphs):
+                paragraph._element.getparent().remove(paragraph._element)
+            for table in list(part.tables):
+                table._element.getparent().remove(table._element)
+    blocks = list(iter_block_items(doc))
+    for idx in range(len(blocks) - 1, -1, -1):
+        if idx < start or (end is not None and idx >= end):
+            blocks[idx]._element.getparent().remove(blocks[idx]._element)
+    doc.save(str(out))
+    return out
+
+
+def _summary(docx_path: Path) -> dict:
+    doc = Document(str(docx_path))
+    blocks = [
+        ("p", block.style.name, block.text)
+        if isinstance(block, Paragraph)
+        else ("tbl", [[cell.text for cell in row.cells] for row in block.rows])
+        for block in iter_block_items(doc)
+    ]
+    images = sorted(
+        doc.part.related_parts[blip.get(qn("r:embed"))].blob
+        for blip in doc.element.body.xpath(".//a:blip")
+    )
+    header_footer = [
+        p.text
+        for section in doc.sections
+        for part in (section.header, section.footer)
+        for p in part.paragraphs
+    ]
+    return {"blocks": blocks, "images": images, "header_footer": header_footer}
+
+
+def _media(docx_path: Path) -> list[str]:
+    with zipfile.ZipFile(docx_path) as zf:
+        return [name for name in zf.namelist() if name.startswith("word/media/")]
+
+
+def test_segments(course_docx):
+    segments = find_segments(Document(str(course_docx)))
+    assert [seg.name for seg in segments] == NUCLEI
+
+
+def test_split_matches_baseline_splitter(course_docx, tmp_path):
+    out_root = tmp_path / "curso"
+    outputs = split_docx_to_nuclei(course_docx, out_root, force=True, include_vidint=True)
+    assert sorted(p.parent.name for p in outputs) == sorted([VIDINT_NAME, *NUCLEI])
+
+    segments = {seg.name: (seg.start, seg.end) for seg in find_segments(Document(str(course_docx)))}
+    segments[VIDINT_NAME] = (0, None)
+    for name, (start, end) in segments.items():
+        split = out_root / name / f"{name}.docx"
+        baseline = _baseline_split(course_docx, tmp_path / f"{name}_baseline.docx", start, end)
+        assert _summary(split) == _summary(baseline), name
+
+
+def test_split_drops_unreferenced_media(course_docx, tmp_path):
+    out_root = tmp_path / "curso"
+    split_docx_to_nuclei(course_docx, out_root, force=True)
+
+    # A imagem do cabeçalho (limpo) e as dos outros núcleos ficam de fora.
+    assert len(_media(out_root / "mod1_nc1" / "mod1_nc1.docx")) == 1
+    assert len(_media(out_root / "mod1_nc2" / "mod1_nc2.docx")) == 1
+    assert _media(out_root / "mod2_np1" / "mod2_np1.docx") == []
+
+
+def test_fused_tagging_matches_separate_pass(course_docx, tmp_path):
+    fused_root = tmp_path / "fused"
+    split_root = tmp_path / "split"
+    split_docx_to_nuclei(course_docx, fused_root, force=True, tag=True)
+    split_docx_to_nuclei(course_docx, split_root, force=True)
+
+    for name in NUCLEI:
+        fused = fused_root / name / f"{name}_tagged.docx"
+        separate = split_root / name / f"{name}_tagged.docx"
+        created = create_tagged_docx(
+            split_root / name / f"{name}.docx",
+            separate,
+            split_root / "assets" / name,
+            f"assets/{name}",
+        )
+        summary = _summary(fused)
+        assert summary == _summary(separate), name
+        assert any("[[IMG:" in str(block) for block in summary["blocks"]) == (name != "mod2_np1")
+        assert _media(fused) == []
+
+        fused_assets = sorted((fused_root / "assets" / name).glob("img_*"))
+        separate_assets = sorted((split_root / "assets" / name).glob("img_*"))
+        assert [p.name for p in fused_assets] == [p.name for p in separate_assets]
+        assert [p.read_bytes() for p in fused_assets] == [p.read_bytes() for p in separate_assets]
+        assert len(fused_assets) == created
+
+
+def test_unchanged_nuclei_are_kept(course_docx, tmp_path):
+    out_root = tmp_path / "curso"
+    assert len(split_docx_to_nuclei(course_docx, out_root, force=False)) == len(NUCLEI)
+    assert split_docx_to_nuclei(course_docx, out_root, force=False) == []
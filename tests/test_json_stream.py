@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import json
+import random
+
+import pytest
+
+from app.json_stream import JsonArrayStream
+
+DOC = {
+    "titulo": 'chave com "aspas" e [colchetes]',
+    "slides": [
+        {"titulo": 'escape \\" ]} {[', "itens": [1, 2, {"x": "}"}]},
+        {"titulo": "acentuação é ã", "vazio": []},
+        {"aninhado": {"slides": [{"nao": "conta"}]}},
+    ],
+    "outros": [{"nao": "conta"}],
+}
+TEXT = json.dumps(DOC, ensure_ascii=False)
+
+
+def _feed_in_chunks(text: str, sizes) -> tuple[JsonArrayStream, list]:
+    parser = JsonArrayStream("slides")
+    items: list = []
+    pos = 0
+    for size in sizes:
+        if pos >= len(text):
+            break
+        items += parser.feed(text[pos : pos + size])
+        pos += size
+    items += parser.feed(text[pos:])
+    return parser, items
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_items_independent_of_chunk_boundaries(seed):
+    rng = random.Random(seed)
+    parser, items = _feed_in_chunks(TEXT, (rng.randint(1, 9) for _ in range(len(TEXT))))
+    assert items == DOC["slides"]
+    assert parser.items_seen == len(DOC["slides"])
+    assert json.loads(parser.text) == DOC
+
+
+def test_one_character_at_a_time():
+    parser, items = _feed_in_chunks(TEXT, [1] * len(TEXT))
+    assert items == DOC["slides"]
+    assert parser.text == TEXT
+
+
+def test_item_emitted_as_soon_as_it_closes():
+    parser = JsonArrayStream("slides")
+    assert parser.feed('{"slides": [{"a": 1}, {"b"') == [{"a": 1}]
+    assert parser.feed(": 2}") == [{"b": 2}]
+    assert parser.feed("]}") == []
+
+
+def test_invalid_item_is_skipped_but_counted():
+    parser = JsonArrayStream("slides")
+    assert parser.feed('{"slides": [{"a": 1,}, {"b": 2}]}') == [{"b": 2}]
+    assert parser.items_seen == 2
+
+
+def test_other_keys_are_ignored():
+    parser = JsonArrayStream("slides")
+    assert parser.feed('{"outros": [{"a": 1}], "slide": [{"b": 2}]}') == []
+    assert parser.items_seen == 0
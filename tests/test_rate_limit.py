@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from app.rate_limit import RateLimiter, TokenBucket, parse_duration, parse_retry_after
+
+
+@pytest.mark.parametrize(
+    ("value", "seconds"),
+    [("20ms", 0.02), ("1s", 1.0), ("6m0s", 360.0), ("1h2m", 3720.0), ("1.5", 1.5)],
+)
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == pytest.approx(seconds)
+
+
+def test_parse_duration_rejects_garbage():
+    assert parse_duration(None) is None
+    assert parse_duration("amanha") is None
+
+
+def test_parse_retry_after_http_date_in_the_past():
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_token_bucket_reserves_and_refills():
+    bucket = TokenBucket(60)  # 1 por segundo
+    t0 = bucket.updated
+    assert bucket.reserve(60, t0) == 0.0
+    assert bucket.reserve(1, t0) == pytest.approx(1.0)
+    assert bucket.reserve(1, t0) == pytest.approx(2.0)
+    # Depois de 3s o saldo (-2) volta a 1.
+    assert bucket.reserve(1, t0 + 3) == 0.0
+
+
+def test_token_bucket_caps_request_at_capacity():
+    bucket = TokenBucket(60)
+    t0 = bucket.updated
+    # Pedido maior que a capacidade desconta só a capacidade (nunca trava).
+    assert bucket.reserve(1000, t0) == 0.0
+    assert bucket.reserve(1, t0) == pytest.approx(1.0)
+
+
+def test_observe_creates_bucket_from_headers_and_blocks_until_reset():
+    limiter = RateLimiter("teste")
+    before = time.monotonic()
+    limiter.observe(
+        {
+            "x-ratelimit-limit-requests": "120",
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "2s",
+        }
+    )
+    assert limiter.requests is not None
+    assert limiter.requests.capacity == 120
+    assert limiter.requests.tokens <= 0
+    assert limiter.blocked_until >= before + 2
+
+
+def test_observe_adjusts_limit_and_remaining():
+    limiter = RateLimiter("teste", tpm=1000)
+    limiter.observe(
+        {"x-ratelimit-limit-tokens": "2000", "x-ratelimit-remaining-tokens": "500"}
+    )
+    assert limiter.tokens.capacity == 2000
+    assert limiter.tokens.rate == pytest.approx(2000 / 60)
+    assert limiter.tokens.tokens <= 500
+    assert limiter.blocked_until == 0.0
+
+
+def test_observe_retry_after_only_for_refusals():
+    limiter = RateLimiter("teste")
+    limiter.observe({"retry-after": "30"}, status_code=200)
+    assert limiter.blocked_until == 0.0
+
+    before = time.monotonic()
+    limiter.observe({"retry-after": "30"}, status_code=429)
+    assert limiter.blocked_until >= before + 30
+
+
+def test_observe_429_falls_back_to_reset_header():
+    limiter = RateLimiter("teste")
+    before = time.monotonic()
+    limiter.observe({"x-ratelimit-reset-requests": "1m"}, status_code=429)
+    assert limiter.blocked_until >= before + 60
+
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import pytest
+import requests
+
+from app import retry
+from app.retry import (
+    NON_IDEMPOTENT_POLICY,
+    FatalError,
+    RetryPolicy,
+    TransientError,
+    classify,
+    error_for_code,
+    reset_retry_state,
+    retry_call,
+    retry_counters,
+)
+
+# Sem espera entre tentativas (random.uniform(0, 0) == 0).
+FAST = RetryPolicy(max_attempts=4, base_delay=0.0, max_delay=0.0)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_state():
+    reset_retry_state()
+    yield
+    reset_retry_state()
+
+
+def _http_error(status: int, headers: dict[str, str] | None = None) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.HTTPError(f"{status}", response=response)
+
+
+@pytest.mark.parametrize(
+    ("status", "idempotent", "expected"),
+    [
+        (429, True, True),
+        (503, True, True),
+        (500, True, True),
+        (409, True, True),
+        (400, True, False),
+        (404, True, False),
+        (429, False, True),
+        (503, False, True),
+        (500, False, False),
+        (409, False, False),
+    ],
+)
+def test_classify_http_status(status, idempotent, expected):
+    policy = RetryPolicy(idempotent=idempotent)
+    assert classify(_http_error(status), policy).retryable is expected
+
+
+def test_classify_reads_retry_after_headers():
+    assert classify(_http_error(429, {"retry-after": "7"})).retry_after == 7.0
+    assert classify(_http_error(429, {"retry-after-ms": "1500"})).retry_after == 1.5
+    assert classify(_http_error(503)).retry_after is None
+
+
+def test_classify_network_errors_respect_idempotency():
+    assert classify(requests.ConnectionError()).retryable
+    assert not classify(requests.ConnectionError(), NON_IDEMPOTENT_POLICY).retryable
+    # Sem conexão aberta o pedido nunca chegou ao servidor.
+    assert classify(requests.ConnectTimeout(), NON_IDEMPOTENT_POLICY).retryable
+
+
+def test_classify_own_errors():
+    assert classify(TransientError("x"), NON_IDEMPOTENT_POLICY).retryable
+    assert not classify(FatalError("x")).retryable
+    assert not classify(ValueError("x")).retryable
+
+
+@pytest.mark.parametrize(
+    ("code", "cls"),
+    [
+        (None, TransientError),
+        ("server_error", TransientError),
+        ("rate_limit_exceeded", TransientError),
+        ("invalid_prompt", FatalError),
+        ("content_policy_violation", FatalError),
+    ],
+)
+def test_error_for_code(code, cls):
+    assert type(error_for_code(code, "msg")) is cls
+
+
+def test_retry_call_retries_transient_until_success():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise TransientError("stream interrompido")
+        return "ok"
+
+    assert retry_call("teste", flaky, policy=FAST) == "ok"
+    stats = retry_counters()["teste"]
+    assert (stats.calls, stats.retries, stats.fatal) == (1, 2, 0)
+
+
+def test_retry_call_does_not_retry_fatal():
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise FatalError("pedido invalido")
+
+    with pytest.raises(FatalError):
+        retry_call("teste", broken, policy=FAST)
+    assert len(calls) == 1
+    assert retry_counters()["teste"].fatal == 1
+
+
+def test_retry_call_stops_after_max_attempts():
+    calls = []
+
+    def always_down():
+        calls.append(1)
+        raise TransientError("fora do ar")
+
+    with pytest.raises(TransientError):
+        retry_call("teste", always_down, policy=FAST)
+    assert len(calls) == FAST.max_attempts
+    assert retry_counters()["teste"].exhausted == 1
+
+
+def test_retry_budget_is_shared_by_the_run(monkeypatch):
+    monkeypatch.setitem(retry.RETRY_BUDGETS, "teste", 3)
+
+    attempts = []
+
+    def always_down():
+        attempts[-1] += 1
+        raise TransientError("fora do ar")
+
+    for _ in range(3):
+        attempts.append(0)
+        with pytest.raises(TransientError):
+            retry_call("teste", always_down, policy=FAST)
+
+    # A primeira chamada gasta o orçamento; as seguintes não repetem mais.
+    assert attempts == [FAST.max_attempts, 1, 1]
+    stats = retry_counters()["teste"]
+    assert (stats.retries, stats.exhausted, stats.budget_denied) == (3, 1, 2)
+
+    reset_retry_state()
+    calls = []
+
+    def once_down():
+        calls.append(1)
+        if len(calls) == 1:
+            raise TransientError("fora do ar")
+        return "ok"
+
+    assert retry_call("teste", once_down, policy=FAST) == "ok"
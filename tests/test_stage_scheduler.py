@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+
+import pytest
+
+from app.stage_scheduler import NucleusFlow, Stage, StageScheduler
+
+POOLS = {"a": 2, "b": 2, "c": 1}
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.events: list[tuple[str, str]] = []
+        self._lock = threading.Lock()
+
+    def add(self, flow: NucleusFlow, event: str) -> None:
+        with self._lock:
+            self.events.append((flow.name, event))
+
+    def of(self, name: str) -> list[str]:
+        return [event for nucleus, event in self.events if nucleus == name]
+
+
+def _nuclei(count: int) -> list[Path]:
+    return [Path(f"mod1_nc{i}") for i in range(1, count + 1)]
+
+
+def _step(rec: Recorder, name: str, outcome=True):
+    def run(flow: NucleusFlow):
+        rec.add(flow, name)
+        return outcome
+
+    return run
+
+
+def test_each_nucleus_runs_stages_in_order():
+    rec = Recorder()
+    stages = [
+        Stage("prepare", "a", _step(rec, "prepare")),
+        Stage("plan", "b", _step(rec, "plan")),
+        Stage("render", "c", _step(rec, "render")),
+    ]
+    progress: list[tuple[int, int, str]] = []
+    StageScheduler(stages, POOLS).run(
+        _nuclei(4), progress_cb=lambda done, total, name: progress.append((done, total, name))
+    )
+
+    for nucleus in _nuclei(4):
+        assert rec.of(nucleus.name) == ["prepare", "plan", "render"]
+    assert [done for done, _, _ in progress] == [1, 2, 3, 4]
+    assert {name for _, _, name in progress} == {n.name for n in _nuclei(4)}
+
+
+def test_fan_out_finishes_before_next_stage():
+    rec = Recorder()
+
+    def images(flow: NucleusFlow):
+        return [lambda i=i: rec.add(flow, f"img{i}") for i in range(3)]
+
+    stages = [
+        Stage("images", "a", images, finish=lambda flow: rec.add(flow, "finish")),
+        Stage("render", "c", _step(rec, "render")),
+    ]
+    StageScheduler(stages, POOLS).run(_nuclei(2))
+
+    for nucleus in _nuclei(2):
+        events = rec.of(nucleus.name)
+        assert sorted(events[:3]) == ["img0", "img1", "img2"]
+        assert events[3:] == ["finish", "render"]
+
+
+def test_future_outcome_resumes_when_done():
+    rec = Recorder()
+    pending: list[Future] = []
+
+    def external(flow: NucleusFlow) -> Future:
+        rec.add(flow, "submitted")
+        future: Future = Future()
+        pending.append(future)
+        if len(pending) == 2:
+            # Completa fora dos pools, como o poller do Gamma.
+            threading.Timer(0.05, lambda: [f.set_result(None) for f in pending]).start()
+        return future
+
+    stages = [
+        Stage("gamma", "a", external),
+        Stage("render", "c", _step(rec, "render")),
+    ]
+    StageScheduler(stages, POOLS).run(_nuclei(2))
+    for nucleus in _nuclei(2):
+        assert rec.of(nucleus.name) == ["submitted", "render"]
+
+
+def test_false_outcome_ends_nucleus_without_error():
+    rec = Recorder()
+    stages = [
+        Stage("prepare", "a", lambda flow: flow.name != "mod1_nc1"),
+        Stage("render", "c", _step(rec, "render")),
+    ]
+    progress: list[str] = []
+    StageScheduler(stages, POOLS).run(
+        _nuclei(2), progress_cb=lambda done, total, name: progress.append(name)
+    )
+    assert rec.of("mod1_nc1") == []
+    assert rec.of("mod1_nc2") == ["render"]
+    assert sorted(progress) == ["mod1_nc1", "mod1_nc2"]
+
+
+def test_stage_error_is_raised_after_pools_drain():
+    rec = Recorder()
+
+    def plan(flow: NucleusFlow) -> bool:
+        if flow.name == "mod1_nc2":
+            raise RuntimeError("falha no plano")
+        rec.add(flow, "plan")
+        return True
+
+    stages = [Stage("plan", "a", plan), Stage("render", "c", _step(rec, "render"))]
+    with pytest.raises(RuntimeError, match="falha no plano"):
+        StageScheduler(stages, POOLS).run(_nuclei(2))
+    assert rec.of("mod1_nc2") == []
+
+
+def test_fan_out_error_skips_finish():
+    rec = Recorder()
+
+    def images(flow: NucleusFlow):
+        def boom() -> None:
+            raise ValueError("imagem")
+
+        return [boom, lambda: rec.add(flow, "img")]
+
+    stages = [
+        Stage("images", "a", images, finish=lambda flow: rec.add(flow, "finish")),
+        Stage("render", "c", _step(rec, "render")),
+    ]
+    with pytest.raises(ValueError, match="imagem"):
+        StageScheduler(stages, {"a": 1, "c": 1}).run(_nuclei(1))
+    assert "finish" not in rec.of("mod1_nc1")
+    assert "render" not in rec.of("mod1_nc1")
+
+
+def test_missing_pool_size_is_rejected():
+    with pytest.raises(ValueError):
+        StageScheduler([Stage("x", "nao_existe", lambda flow: True)], POOLS)
+
+
+def test_cancel_before_start_runs_nothing():
+    rec = Recorder()
+    cancel = threading.Event()
+    cancel.set()
+    logs: list[str] = []
+    StageScheduler([Stage("prepare", "a", _step(rec, "prepare"))], POOLS).run(
+        _nuclei(3), log_cb=logs.append, cancel_event=cancel
+    )
+    assert rec.events == []
+    assert logs.count("Cancelamento solicitado. Parando envio de novos núcleos.") == 1
+
+
+def test_cancel_stops_new_nuclei_but_finishes_started_ones():
+    rec = Recorder()
+    cancel = threading.Event()
+
+    def prepare(flow: NucleusFlow) -> bool:
+        rec.add(flow, "prepare")
+        cancel.set()
+        return True
+
+    stages = [
+        Stage("prepare", "c", prepare),
+        Stage("render", "b", _step(rec, "render")),
+    ]
+    StageScheduler(stages, POOLS).run(_nuclei(5), cancel_event=cancel)
+
+    started = [name for name, event in rec.events if event == "prepare"]
+    assert started == ["mod1_nc1"]
+    assert rec.of("mod1_nc1") == ["prepare", "render"]